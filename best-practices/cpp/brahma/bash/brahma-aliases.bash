@@ -26,6 +26,11 @@ function brahma_catkin() {
     verb=$1
     shift
     eval 'catkin $verb --workspace $(brahma info catkin_dir) $@'
+    # Report the hit rate of the compiler cache of this build
+    if [ "$verb" = "build" ] && [ "$(brahma info compiler_cache)" != "none" ]
+    then
+      brahma cache stats --quiet
+    fi
     return 0
 }
 
@@ -27,62 +27,70 @@ _brahma_verb()
 }
 
 
+# completion data written by brahma, see brahma/completion.py
+_brahma_cache_dir=~/.cache/brahma/completion
+
+_brahma_workspace()
+{
+  # search parent directories for the .brahma folder
+  local dir=${PWD}
+  while [[ -n ${dir} ]]; do
+    if [[ -d ${dir}/.brahma ]]; then
+      echo ${dir}
+      return
+    fi
+    dir=${dir%/*}
+  done
+}
+
+_brahma_options()
+{
+  # long options of brahma or a verb, read from the completion data
+  local file=${_brahma_cache_dir}/${1:-brahma}.options
+  if [[ -r ${file} ]]; then
+    echo $(<${file})
+  else
+    # filter for long options (from bash_completion)
+    local OPTS_FILTER='s/.*\(--[-A-Za-z0-9]\{1,\}=\{0,1\}\).*/\1/p'
+    brahma ${1} --help 2>&1 | sed -ne $OPTS_FILTER | sort -u
+  fi
+}
+
+_brahma_packages()
+{
+  # package names of the workspace, if the last option takes package names
+  local option=$(_brahma_last_option)
+  local file=${_brahma_cache_dir}/${1}.package_options
+  if [[ -z ${option} || ! -r ${file} || " $(<${file}) " != *" ${option} "* ]]; then
+    return
+  fi
+  local workspace=$(_brahma_workspace)
+  if [[ -n ${workspace} && -r ${workspace}/.brahma/package_names ]]; then
+    echo $(<${workspace}/.brahma/package_names)
+  fi
+}
+
 _brahma()
 {
-  local cur prev words cword brahma_verbs brahma_opts
+  local cur prev words cword brahma_verbs
   _init_completion || return # this handles default completion (variables, redirection)
 
   # complete to the following verbs
-  local brahma_verbs="create init config update setup info"
-
-  # filter for long options (from bash_completion)
-  local OPTS_FILTER='s/.*\(--[-A-Za-z0-9]\{1,\}=\{0,1\}\).*/\1/p'
-
-  # complete to verbs ifany of these are the previous word
-  local brahma_opts=$(brahma --help 2>&1 | sed -ne $OPTS_FILTER | sort -u)
+  local brahma_verbs="create init config update setup info clean gc serve watch cache"
+  if [[ -r ${_brahma_cache_dir}/verbs ]]; then
+    brahma_verbs=$(<${_brahma_cache_dir}/verbs)
+  fi
 
   local verb=$(_brahma_verb)
-  case ${verb} in
-    "")
-      if [[ ${cur} == -* ]]; then
-        COMPREPLY=($(compgen -W "${brahma_opts}" -- ${cur}))
-      else
-        COMPREPLY=($(compgen -W "${brahma_verbs}" -- ${cur}))
-      fi
-      ;;
-    create)
-      if [[ ${cur} == -* ]]; then
-        local brahma_create_opts=$(brahma create --help 2>&1 | sed -ne $OPTS_FILTER | sort -u)
-        COMPREPLY=($(compgen -W "${brahma_create_opts}" -- ${cur}))
-      fi
-      ;;
-    init)
-      if [[ ${cur} == -* ]]; then
-        local brahma_init_opts=$(brahma init --help 2>&1 | sed -ne $OPTS_FILTER | sort -u)
-        COMPREPLY=($(compgen -W "${brahma_init_opts}" -- ${cur}))
-      fi
-      ;;
-    config)
-      if [[ ${cur} == -* ]]; then
-        local brahma_config_opts=$(brahma config --help 2>&1 | sed -ne $OPTS_FILTER | sort -u)
-        COMPREPLY=($(compgen -W "${brahma_config_opts}" -- ${cur}))
-      fi
-      ;;
-    update)
-      if [[ ${cur} == -* ]]; then
-        local brahma_update_opts=$(brahma update --help 2>&1 | sed -ne $OPTS_FILTER | sort -u)
-        COMPREPLY=($(compgen -W "${brahma_update_opts}" -- ${cur}))
-      fi
-      ;;
-    info)
-      if [[ ${cur} == -* ]]; then
-        local brahma_info_opts=$(brahma info --help 2>&1 | sed -ne $OPTS_FILTER | sort -u)
-        COMPREPLY=($(compgen -W "${brahma_info_opts}" -- ${cur}))
-      fi
-      ;;
-  esac
+  if [[ ${cur} == -* ]]; then
+    COMPREPLY=($(compgen -W "$(_brahma_options ${verb})" -- ${cur}))
+  elif [[ -z ${verb} ]]; then
+    COMPREPLY=($(compgen -W "${brahma_verbs}" -- ${cur}))
+  else
+    COMPREPLY=($(compgen -W "$(_brahma_packages ${verb})" -- ${cur}))
+  fi
 
   return 0
 }
 
-complete -F _brahma brahma
\ No newline at end of file
+complete -F _brahma brahma
@@ -4,9 +4,21 @@
 # Affiliation:  ANYbotics
 
 import os
-import yaml
+
+from brahma.workspace_info import WORKSPACE_INFO_FILE
 
 WORKSPACE_PATHS_FILE = "paths.yaml"
+PACKAGE_CACHE_FILE = "package_cache.pickle"
+INCLUDE_CACHE_FILE = "include_cache.pickle"
+UPDATE_STATE_FILE = "update_state.yaml"
+TRACE_DIRECTORY = "trace"
+TRASH_DIRECTORY = "trash"
+PACKAGE_NAMES_FILE = "package_names"
+LINK_MANIFEST_FILE = "links.json"
+BUILD_COSTS_FILE = "build_costs.json"
+COMPILER_CACHE_STATS_FILE = "compiler_cache_stats.json"
+SERVER_SOCKET_FILE = "serve.sock"
+SERVER_LOCK_FILE = "serve.lock"
 
 
 class BrahmaWorkspacePaths:
@@ -49,6 +61,90 @@ class BrahmaWorkspacePaths:
         '''
         return self.configurationDirectory() + WORKSPACE_PATHS_FILE
 
+    def packageCacheFile(self):
+        '''
+        :returns: Path of the package manifest cache
+        :rtype: str
+        '''
+        return self.configurationDirectory() + PACKAGE_CACHE_FILE
+
+    def includeCacheFile(self):
+        '''
+        :returns: Path of the include directive cache
+        :rtype: str
+        '''
+        return self.configurationDirectory() + INCLUDE_CACHE_FILE
+
+    def updateStateFile(self):
+        '''
+        :returns: Path of the fingerprint of the last update
+        :rtype: str
+        '''
+        return self.configurationDirectory() + UPDATE_STATE_FILE
+
+    def traceDirectory(self):
+        '''
+        :returns: Directory of the timing traces
+        :rtype: str
+        '''
+        return self.configurationDirectory() + TRACE_DIRECTORY
+
+    def trashDirectory(self):
+        '''
+        :returns: Directory of the build spaces that are deleted in the background
+        :rtype: str
+        '''
+        return self.configurationDirectory() + TRASH_DIRECTORY
+
+    def infoFile(self):
+        '''
+        :returns: Path of the precomputed answers of 'brahma info'
+        :rtype: str
+        '''
+        return self.configurationDirectory() + WORKSPACE_INFO_FILE
+
+    def packageNamesFile(self):
+        '''
+        :returns: Path of the package names read by the shell completion
+        :rtype: str
+        '''
+        return self.configurationDirectory() + PACKAGE_NAMES_FILE
+
+    def linkManifestFile(self):
+        '''
+        :returns: Path of the manifest of the symbolic links in the catkin source directory
+        :rtype: str
+        '''
+        return self.configurationDirectory() + LINK_MANIFEST_FILE
+
+    def buildCostsFile(self):
+        '''
+        :returns: Path of the build durations of the packages
+        :rtype: str
+        '''
+        return self.configurationDirectory() + BUILD_COSTS_FILE
+
+    def compilerCacheStatsFile(self):
+        '''
+        :returns: Path of the compiler cache statistics of the last report
+        :rtype: str
+        '''
+        return self.configurationDirectory() + COMPILER_CACHE_STATS_FILE
+
+    def serverSocket(self):
+        '''
+        :returns: Path of the Unix socket of 'brahma serve'
+        :rtype: str
+        '''
+        return self.configurationDirectory() + SERVER_SOCKET_FILE
+
+    def serverLockFile(self):
+        '''
+        :returns: Path of the lock file, which is locked while 'brahma serve' is running
+        :rtype: str
+        '''
+        return self.configurationDirectory() + SERVER_LOCK_FILE
+
     def log(self):
         '''
         :returns: Log file directory
@@ -60,6 +156,7 @@ class BrahmaWorkspacePaths:
         '''
         Save the workspace paths to a yaml file.
         '''
+        import yaml
         self.catkin = os.path.relpath(self.catkin, self.workspace)
         self.source = os.path.relpath(self.source, self.workspace)
         with open(self.configurationFile(), 'w') as f:
@@ -69,6 +166,7 @@ class BrahmaWorkspacePaths:
         '''
         Load the workspace paths from a yaml file.
         '''
+        import yaml
         self.catkin = os.path.abspath(os.path.realpath(os.path.join(self.workspace, self.catkin)))
         self.source = os.path.abspath(os.path.realpath(os.path.join(self.workspace, self.source)))
         with open(self.configurationFile(), 'r') as f:
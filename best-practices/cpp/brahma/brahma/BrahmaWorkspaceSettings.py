@@ -4,9 +4,7 @@
 # Affiliation:  ANYbotics
 
 import os
-import yaml
 
-import brahma.git_helpers as git_helpers
 import brahma.log as log
 import brahma.summary as summary
 
@@ -25,6 +23,14 @@ class BrahmaWorkspaceSettings:
     :type include_downstream_dependencies: bool
     :ivar include_missing_dependencies: Flag to include missing dependencies
     :type include_missing_dependencies: bool
+    :ivar diff_ignore_patterns: Glob patterns of changed files that do not mark their package as changed, extended by
+                                the '.brahmaignore' file of a package
+    :vartype diff_ignore_patterns: list(str)
+    :ivar header_aware_downstream: Only include downstream dependencies including a changed header (or depending on
+                                   a package with other than C/C++ source changes)
+    :vartype header_aware_downstream: bool
+    :ivar downstream_build_budget: Maximum estimated build time of the downstream dependencies in minutes (0 for all)
+    :vartype downstream_build_budget: float
     :ivar filter_packages: Add only packages in the package tree that are part of branches that end up in on of these packages.
     :vartype filter_packages: list(str)
     :ivar only_filter_downstream_packages: Only apply the filter packages to downstream packages.
@@ -39,6 +45,23 @@ class BrahmaWorkspaceSettings:
     :vartype complete_overlay: bool
     :ivar ros_distro: Deduced ROS distribution
     :vartype ros_distro: str
+    :ivar underlays: Workspaces providing the installed packages, the first one is extended ('/opt/ros/<ros_distro>' if
+                     empty)
+    :vartype underlays: list(str)
+    :ivar git_jobs: Number of repositories that are processed in parallel
+    :vartype git_jobs: int
+    :ivar clone_options: Shallow and partial clone options per repository ('depth', 'filter' and 'single_branch')
+    :vartype clone_options: dict(str, dict)
+    :ivar repository_prune_patterns: Glob patterns of directory names that are not searched for git repositories
+    :vartype repository_prune_patterns: list(str)
+    :ivar compiler_cache: Compiler cache the compilers are launched with ('none', 'ccache' or 'sccache')
+    :vartype compiler_cache: str
+    :ivar compiler_cache_dir: Directory of the compiler cache ('~/.cache/brahma/<compiler_cache>' shared by all
+                              workspaces if empty)
+    :vartype compiler_cache_dir: str
+    :ivar compiler_cache_max_size: Size limit of the compiler cache (e.g. '20G'), shared by the workspaces using the
+                                   same cache directory
+    :vartype compiler_cache_max_size: str
     """
 
     def __init__(self):
@@ -49,6 +72,9 @@ class BrahmaWorkspaceSettings:
 
         self.include_upstream_dependencies = False
         self.include_downstream_dependencies = True
+        self.downstream_build_budget = 0
+        self.header_aware_downstream = False
+        self.diff_ignore_patterns = []
         self.include_missing_dependencies = False
         self.complete_overlay = False
 
@@ -56,6 +82,15 @@ class BrahmaWorkspaceSettings:
 
         self.ide = "clion"
         self.ros_distro = ""
+        self.underlays = []
+
+        self.git_jobs = 4
+        self.clone_options = {}
+        self.repository_prune_patterns = ['.*']
+
+        self.compiler_cache = 'none'
+        self.compiler_cache_dir = ''
+        self.compiler_cache_max_size = '20G'
 
         # Load ros version
         ros_env = os.environ.get('ROS_DISTRO')
@@ -101,12 +136,21 @@ class BrahmaWorkspaceSettings:
         :type rel_path: str
         """
         self.git_repositories.pop(rel_path, None)
+        self.clone_options.pop(rel_path, None)
 
     def clearRepositories(self):
         """
         Remove all repositories
         """
         self.git_repositories.clear()
+        self.clone_options.clear()
+
+    def underlayPaths(self):
+        """
+        :returns: Workspaces providing the installed packages
+        :rtype: list(str)
+        """
+        return self.underlays or [os.path.join("/opt/ros", self.ros_distro)]
 
     def createDefaultConfiguration(self, force):
         """
@@ -115,6 +159,7 @@ class BrahmaWorkspaceSettings:
         :param force: Force if existing.
         :type force: str
         """
+        import yaml
         existing = os.path.exists(WORKSPACE_CONFIGURATION_DEFAULTS)
         if not existing:
             if not os.path.exists(WORKSPACE_CONFIGURATION_DIR):
@@ -130,6 +175,7 @@ class BrahmaWorkspaceSettings:
         :param configuration: Name of the configuration (has to be placed in WORKSPACE_CONFIGURATION_DIR)
         :type configuration: str
         """
+        import yaml
         configurationFile = WORKSPACE_CONFIGURATION_DIR + "/" + configuration + ".yaml"
         with open(configurationFile, 'r') as f:
             self.__dict__.update(yaml.full_load(f))
@@ -147,6 +193,7 @@ class BrahmaWorkspaceSettings:
         """
         Load the workspace settings from a yaml file
         """
+        import yaml
         with open(self.settingsFile(workpace_dir), 'r') as f:
             self.__dict__.update(yaml.full_load(f))
 
@@ -156,13 +203,15 @@ class BrahmaWorkspaceSettings:
         :param workpace_dir: Workspace directory.
         :type workpace_dir: str
         """
+        import yaml
         # Make sure lists are alphabetical
         if self.filter_packages:
             self.filter_packages.sort(key=str.lower)
         if self.explicit_packages:
             self.explicit_packages.sort(key=str.lower)
-        with open(self.settingsFile(workpace_dir), 'w') as f:
-            yaml.dump(self.__dict__, f)
+        # An unchanged file is not rewritten, such that watching brahma processes are not triggered
+        import brahma.utils as utils
+        utils.writeFileIfChanged(self.settingsFile(workpace_dir), yaml.dump(self.__dict__))
 
     def summary(self):
         """
@@ -181,6 +230,10 @@ class BrahmaWorkspaceSettings:
                         summary.entry("", "- " + k + " :")
                         for i in v:
                             summary.entry("", '    ' + i)
+                    elif isinstance(v, dict):
+                        summary.entry("", "- " + k + " :")
+                        for ik, iv in sorted(v.items()):
+                            summary.entry("", '    {} : {}'.format(ik, iv))
                     else:
                         summary.entry("", "- " + k + " : " + v)
             else:
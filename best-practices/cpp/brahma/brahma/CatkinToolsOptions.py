@@ -9,15 +9,15 @@ import os
 class CatkinToolsOptions:
     """
     The CatkinToolsOptions object contains the configuration for the catkin workspace.
-    Per default extend opt/ros and use release mode to build.
+    Per default extend /opt/ros and use release mode to build.
     See catkin-tools python package for more information.
     """
 
-    def __init__(self, workspace, ros_distro):
+    def __init__(self, workspace, ros_distro, extend_path=None):
         self.workspace = workspace
         self.reset = False
         self.profile = None
-        self.extend_path = "/opt/ros/" + ros_distro
+        self.extend_path = extend_path or "/opt/ros/" + ros_distro
         self.source_space = None
         self.log_space = None
         self.build_space = None
@@ -3,28 +3,25 @@
 # Author:       Gabriel Hottiger
 # Affiliation:  ANYbotics
 
-import fnmatch
 import os
 import shutil
-
-from catkin_tools.context import Context
-from catkin_tools.verbs.catkin_clean.clean import clean_packages
-from catkin_tools.metadata import init_metadata_root
-import catkin_tools.execution.job_server as job_server
-from catkin_pkg.packages import find_packages
+from concurrent.futures import ThreadPoolExecutor
 
 import brahma.log as log
+import brahma.timing as timing
+import brahma.trash as trash
 
 
 class CatkinWorkspace:
     """
     The CatkinTools object handles the configuration of the catkin workspace.
-    See catkin-tools python package for more information.
+    See catkin-tools python package for more information. catkin-tools is imported on first use.
     """
 
     def __init__(self):
         self.context = None
 
+    @timing.timed()
     def load(self, catkin_options):
         """
         Load current catkin context.
@@ -32,6 +29,8 @@ class CatkinWorkspace:
         :param catkin_options: Options with which the catkin workspace should be initialized
         :type catkin_options: CatkinToolsOptions
         """
+        import catkin_tools.execution.job_server as job_server
+        from catkin_tools.context import Context
         job_server.initialize(
             max_jobs=1,
             max_load=None,
@@ -45,6 +44,9 @@ class CatkinWorkspace:
         :param catkin_options: Options with which the catkin workspace should be initialized
         :type catkin_options: CatkinToolsOptions
         """
+        from catkin_tools.context import Context
+        from catkin_tools.metadata import init_metadata_root
+
         # Init catkin workspace
         self.context = Context.load(catkin_options.workspace, strict=True)
         if not self.context:
@@ -57,31 +59,51 @@ class CatkinWorkspace:
             Context.save(self.context)
             log.info(Context.summary(self.context))
 
-    def cleanPackages(self, package_names):
+    def replaceCMakeArgs(self, is_replaced, cmake_args):
+        """
+        Replace CMake arguments of the catkin profile.
+
+        :param is_replaced: Predicate selecting the arguments that are replaced
+        :type is_replaced: callable(str)
+        :param cmake_args: New arguments, appended to the ones that are kept
+        :type cmake_args: list(str)
+        :returns: True, if the profile changed
+        :rtype: bool
+        """
+        from catkin_tools.context import Context
+        new_cmake_args = [arg for arg in self.context.cmake_args if not is_replaced(arg)] + cmake_args
+        if new_cmake_args == self.context.cmake_args:
+            return False
+        self.context.cmake_args = new_cmake_args
+        Context.save(self.context)
+        return True
+
+    @timing.timed()
+    def cleanPackages(self, package_names, trash_dir=None):
         """
         Run 'catkin clean' for the given packages.
+        Build spaces are moved into 'trash_dir' and deleted by a background process.
 
         :param package_names: List of package names to clean.
         :type package_names: list(str)
+        :param trash_dir: Trash directory, 'None' to delete the build spaces immediately
+        :type trash_dir: str
         """
         if self.usingInstallSpace():
-            # Use the install manifest to clean the package.
+            # Use the install manifests to clean the packages.
+            self.cleanInstalledFiles(package_names)
+
+        # Move the build spaces out of the way, the install manifests are read above.
+        # A merged devel space is cleaned with 'make clean' in the build space, it can not be moved in advance.
+        trashed_packages = 0
+        if trash_dir and not self.context.merge_devel:
             for package in package_names:
-                install_manifest = os.path.join(self.buildSpace(), package, "install_manifest.txt")
-                if not os.path.isfile(install_manifest):
-                    log.warn("No install manifest found for package {}. Install space may be inconsistent.".format(package))
-                else:
-                    with open(install_manifest) as manifest:
-                        pattern = self.installSpace() + "/**/**"
-                        for file in manifest.readlines():
-                            real_file = os.path.realpath(file.rstrip())
-                            if fnmatch.fnmatch(real_file, pattern):
-                                if os.path.isfile(real_file):
-                                    os.remove(real_file)
-                                else:
-                                    log.warn("Can not remove file {}. Install space may be inconsistent.".format(real_file))
+                package_build_path = os.path.join(self.context.build_space_abs, package)
+                if os.path.isdir(package_build_path):
+                    trashed_packages += trash.moveToTrash(package_build_path, trash_dir)
 
         # Use catkin tools clean function. If not yet possible force-clean the build space.
+        from catkin_tools.verbs.catkin_clean.clean import clean_packages
         clean_packages(self.context, package_names, False, True, False)
 
         # Force clean the build space.
@@ -89,9 +111,65 @@ class CatkinWorkspace:
             package_build_path = os.path.join(self.context.build_space_abs, package)
             if os.path.isdir(package_build_path):
                 log.info("Force cleaning package {}".format(package))
-                shutil.rmtree(package_build_path)
+                if trash_dir:
+                    trashed_packages += trash.moveToTrash(package_build_path, trash_dir)
+                else:
+                    shutil.rmtree(package_build_path)
+
+        if trashed_packages:
+            log.info("Moved {} build spaces to the trash, deleting them in the background".format(trashed_packages))
+            trash.startReaper(trash_dir)
+
+    @timing.timed()
+    def cleanInstalledFiles(self, package_names, jobs=4):
+        """
+        Remove the installed files of the given packages listed in their install manifests. Only files in
+        subdirectories of the install space are removed. The packages are processed in parallel, directories that are
+        empty afterwards are removed.
+
+        :param package_names: List of package names to clean.
+        :type package_names: list(str)
+        :param jobs: Number of packages that are processed at the same time
+        :type jobs: int
+        """
+        install_prefix = os.path.realpath(self.installSpace()) + os.sep
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+            futures = [executor.submit(log.callBuffered, _removeInstalledFiles,
+                                       os.path.join(self.buildSpace(), package, "install_manifest.txt"),
+                                       install_prefix)
+                       for package in package_names]
+            results = [future.result() for future in futures]
+
+        removed_files = 0
+        removed_bytes = 0
+        parent_dirs = set()
+        for package, (records, result, exception) in zip(package_names, results):
+            log.replay(records)
+            if exception is not None:
+                raise exception
+            if result is None:
+                log.warn("No install manifest found for package {}. Install space may be inconsistent.".format(package))
+                continue
+            removed_files += result[0]
+            removed_bytes += result[1]
+            parent_dirs.update(result[2])
+
+        # Remove emptied directories bottom up, the top level directories of the install space are kept
+        removed_dirs = 0
+        for dir in sorted(parent_dirs, key=len, reverse=True):
+            while dir.startswith(install_prefix) and os.sep in dir[len(install_prefix):]:
+                try:
+                    os.rmdir(dir)
+                except OSError:
+                    break  # Not empty or already removed
+                removed_dirs += 1
+                dir = os.path.dirname(dir)
+
+        log.info("Removed {} installed files ({:.1f} MB) and {} empty directories of {} packages".format(
+            removed_files, removed_bytes / 1e6, removed_dirs, len(package_names)))
 
     def getBuiltPackages(self):
+        from catkin_pkg.packages import find_packages
         return find_packages(self.context.package_metadata_path(), exclude_subspaces=True, warnings=[])
 
     def workspace(self):
@@ -103,6 +181,12 @@ class CatkinWorkspace:
     def buildSpace(self):
         return self.context.build_space_abs
 
+    def cmakeArgs(self):
+        return self.context.cmake_args
+
+    def logSpace(self):
+        return self.context.log_space_abs
+
     def develSpace(self):
         return self.context.devel_space_abs
 
@@ -136,3 +220,40 @@ class CatkinWorkspace:
             source_file = os.path.join(source_file, 'setup.bash')
 
         return source_file
+
+
+def _removeInstalledFiles(install_manifest, install_prefix):
+    """
+    Remove the files of an install manifest. The manifest is read line by line, files outside of subdirectories of
+    'install_prefix' are skipped.
+
+    :param install_manifest: Path of the install manifest
+    :type install_manifest: str
+    :param install_prefix: Real path of the install space, ending with a separator
+    :type install_prefix: str
+    :returns: Number of removed files, removed bytes and parent directories of the removed files, 'None' if there is no
+              install manifest
+    :rtype: tuple(int,int,set(str))
+    """
+    if not os.path.isfile(install_manifest):
+        return None
+    removed_files = 0
+    removed_bytes = 0
+    parent_dirs = set()
+    with open(install_manifest) as manifest:
+        for line in manifest:
+            real_file = os.path.realpath(line.rstrip())
+            if not real_file.startswith(install_prefix) or os.sep not in real_file[len(install_prefix):]:
+                continue
+            try:
+                size = os.lstat(real_file).st_size
+                if not os.path.isfile(real_file):
+                    raise IsADirectoryError(real_file)
+                os.remove(real_file)
+            except OSError:
+                log.warn("Can not remove file {}. Install space may be inconsistent.".format(real_file))
+                continue
+            removed_files += 1
+            removed_bytes += size
+            parent_dirs.add(os.path.dirname(real_file))
+    return removed_files, removed_bytes, parent_dirs
@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import os
+from collections import deque
+
+import brahma.log as log
+
+
+class DependencyGraph:
+    """
+    The DependencyGraph object holds the build dependencies between a set of catkin packages.
+    Like catkin_tools' get_recursive_build_depends_in_workspace, build, buildtool, test and run dependencies are
+    followed. Forward and reverse adjacency are built once. Closures are computed with a single breadth first search
+    for all requested packages and memoized. Like catkin_pkg's topological_order, resolving a closure exits the process
+    if the packages have cyclic dependencies.
+
+    :param packages: Packages of the graph
+    :type packages: dict(str,catkin_pkg.Package)
+    """
+
+    def __init__(self, packages):
+        self._dependencies = dict((name, set()) for name in packages)
+        self._dependents = dict((name, set()) for name in packages)
+        self._upstream_closures = dict()
+        self._downstream_closures = dict()
+        self._topological_order = None
+
+        for name, package in packages.items():
+            package.evaluate_conditions(os.environ)
+            for dependency in (package.build_depends + package.buildtool_depends + package.test_depends +
+                               package.run_depends):
+                if dependency.evaluated_condition and dependency.name in packages:
+                    self._dependencies[name].add(dependency.name)
+                    self._dependents[dependency.name].add(name)
+
+    def dependencies(self, package_name):
+        """
+        :param package_name: Name of the package
+        :type package_name: str
+        :returns: Names of the direct dependencies of 'package_name'
+        :rtype: set(str)
+        """
+        return self._dependencies.get(package_name, set())
+
+    def dependents(self, package_name):
+        """
+        :param package_name: Name of the package
+        :type package_name: str
+        :returns: Names of the direct dependents of 'package_name'
+        :rtype: set(str)
+        """
+        return self._dependents.get(package_name, set())
+
+    def upstream(self, package_names):
+        """
+        Recursive dependencies of all 'package_names'. The packages themselves are only part of the result if another
+        package of 'package_names' depends on them.
+
+        :param package_names: Names of the packages, names not part of the graph are ignored
+        :type package_names: iterable(str)
+        :returns: Names of the recursive dependencies
+        :rtype: frozenset(str)
+        """
+        self.topologicalOrder()
+        return self._closure(package_names, self._dependencies, self._upstream_closures)
+
+    def downstream(self, package_names):
+        """
+        Recursive dependents of all 'package_names'. The packages themselves are only part of the result if they
+        depend on another package of 'package_names'.
+
+        :param package_names: Names of the packages, names not part of the graph are ignored
+        :type package_names: iterable(str)
+        :returns: Names of the recursive dependents
+        :rtype: frozenset(str)
+        """
+        self.topologicalOrder()
+        return self._closure(package_names, self._dependents, self._downstream_closures)
+
+    def topologicalOrder(self):
+        """
+        Packages ordered such that every package comes after its dependencies, ties are broken by name.
+        Computed on first use, exits the process on cyclic dependencies.
+
+        :returns: Names of the packages in topological order
+        :rtype: list(str)
+        """
+        if self._topological_order is None:
+            remaining_dependencies = dict((name, len(dependencies)) for name, dependencies in self._dependencies.items())
+            queue = deque(sorted(name for name, count in remaining_dependencies.items() if count == 0))
+            order = []
+            while queue:
+                name = queue.popleft()
+                order.append(name)
+                for dependent in sorted(self._dependents[name]):
+                    remaining_dependencies[dependent] -= 1
+                    if remaining_dependencies[dependent] == 0:
+                        queue.append(dependent)
+            if len(order) != len(self._dependencies):
+                # Packages on a cycle and the packages depending on them
+                log.error("Cyclic dependency detected. Involved packages: {}".format(
+                    ', '.join(sorted(set(self._dependencies) - set(order)))))
+            self._topological_order = order
+        return self._topological_order
+
+    @staticmethod
+    def _closure(package_names, adjacency, closures):
+        key = frozenset(package_names)
+        if key not in closures:
+            visited = set()
+            queue = deque(neighbour for name in key if name in adjacency for neighbour in adjacency[name])
+            while queue:
+                name = queue.popleft()
+                if name not in visited:
+                    visited.add(name)
+                    queue.extend(adjacency[name] - visited)
+            closures[key] = frozenset(visited)
+        return closures[key]
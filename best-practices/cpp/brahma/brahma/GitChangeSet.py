@@ -0,0 +1,143 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import os
+import subprocess
+import tempfile
+
+import brahma.log as log
+
+# Size of the blocks read from the output of git
+READ_BLOCK_SIZE = 1 << 16
+
+
+class GitChangeSet:
+    """
+    The GitChangeSet object holds the classified changes of a repository compared to a base branch.
+    Staged, unstaged and untracked changes are combined, such that every path is classified once by its state in the
+    working tree. The changes are read from the NUL-separated output of 'git diff --name-status -z' and
+    'git ls-files -o --exclude-standard -z', which is parsed while git is still running.
+    All paths are relative to the root of the repository.
+
+    :param repo_root: Root directory of the repository
+    :type repo_root: str
+    :param base_branch: Branch against which the current state is compared
+    :type base_branch: str
+    :ivar added: Files added compared to the base branch
+    :vartype added: set(str)
+    :ivar modified: Files modified compared to the base branch
+    :vartype modified: set(str)
+    :ivar deleted: Files deleted compared to the base branch
+    :vartype deleted: set(str)
+    :ivar renamed: Renamed files, maps the new path to the path in the base branch
+    :vartype renamed: dict(str,str)
+    :ivar untracked: Untracked files, files ignored by git are excluded
+    :vartype untracked: set(str)
+    """
+
+    def __init__(self, repo_root, base_branch):
+        self.repo_root = repo_root
+        self.base_branch = base_branch
+        self.added = set()
+        self.modified = set()
+        self.deleted = set()
+        self.renamed = dict()
+        self.untracked = set()
+
+        # Base branch to index
+        for status, paths in _parseNameStatus(self._git('diff', '--cached', '--name-status', '-z', '-M',
+                                                        '--no-color', base_branch, '--')):
+            self._addStaged(status, paths)
+        # Index to working tree
+        for status, paths in _parseNameStatus(self._git('diff', '--name-status', '-z', '--no-color', '--')):
+            self._addUnstaged(status, paths[-1])
+        # Untracked files
+        for path in self._git('ls-files', '-o', '--exclude-standard', '-z'):
+            self.untracked.add(path)
+
+    def files(self):
+        """
+        :returns: Absolute paths of all changed files, renamed files are contained with the old and the new path
+        :rtype: list(str)
+        """
+        paths = self.added | self.modified | self.deleted | self.untracked | set(self.renamed.keys()) | \
+                set(self.renamed.values())
+        return [os.path.join(self.repo_root, path) for path in sorted(paths)]
+
+    def removedFiles(self):
+        """
+        :returns: Paths of all files present in the base branch but missing in the working tree (deleted or renamed)
+        :rtype: list(str)
+        """
+        return sorted(self.deleted | set(self.renamed.values()))
+
+    def __len__(self):
+        return len(self.added) + len(self.modified) + len(self.deleted) + len(self.renamed) + len(self.untracked)
+
+    def _addStaged(self, status, paths):
+        if status == 'A' or status == 'C':
+            self.added.add(paths[-1])
+        elif status == 'D':
+            self.deleted.add(paths[0])
+        elif status == 'R':
+            self.renamed[paths[1]] = paths[0]
+        else:
+            self.modified.add(paths[0])
+
+    def _addUnstaged(self, status, path):
+        if status == 'D':
+            if path in self.added:
+                self.added.discard(path)
+            elif path in self.renamed:
+                self.deleted.add(self.renamed.pop(path))
+            else:
+                self.modified.discard(path)
+                self.deleted.add(path)
+        elif path not in self.added and path not in self.renamed:
+            self.modified.add(path)
+
+    def _git(self, *args):
+        """
+        Run a git command in the repository and stream its NUL-separated output. The error output is written to a
+        temporary file, such that git can not block on a full pipe while the output is read.
+
+        :param args: Arguments of the git command
+        :returns: Generator of the NUL-terminated records of the output
+        :rtype: generator(str)
+        """
+        with tempfile.TemporaryFile() as stderr:
+            process = subprocess.Popen(['git'] + list(args), cwd=self.repo_root, stdout=subprocess.PIPE, stderr=stderr)
+            with process:
+                remainder = b''
+                while True:
+                    block = process.stdout.read(READ_BLOCK_SIZE)
+                    if not block:
+                        break
+                    records = (remainder + block).split(b'\0')
+                    remainder = records.pop()
+                    for record in records:
+                        yield os.fsdecode(record)
+            if process.returncode != 0:
+                stderr.seek(0)
+                log.error("Could not resolve diff of repository {} to base branch {}: {}".format(
+                    self.repo_root, self.base_branch, os.fsdecode(stderr.read()).strip()))
+
+
+def _parseNameStatus(records):
+    """
+    Parse the records of 'git diff --name-status -z'.
+
+    :param records: NUL-terminated records of the git output
+    :type records: iterable(str)
+    :returns: Generator of status letter, paths tuples. Renames and copies have the old and the new path.
+    :rtype: generator(tuple(str,list(str)))
+    """
+    records = iter(records)
+    for status in records:
+        letter = status[:1]
+        paths = [next(records)]
+        if letter in ('R', 'C'):
+            paths.append(next(records))
+        yield letter, paths
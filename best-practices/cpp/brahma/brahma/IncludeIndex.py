@@ -0,0 +1,225 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import os
+import pickle
+import re
+from collections import deque
+
+import brahma.log as log
+import brahma.timing as timing
+
+# Bump if the layout of the cache file changes
+INCLUDE_CACHE_VERSION = 1
+
+# Extensions of C and C++ source and header files
+SOURCE_EXTENSIONS = {'.c', '.cc', '.cpp', '.cxx', '.cu'}
+HEADER_EXTENSIONS = {'.h', '.hh', '.hpp', '.hxx', '.tpp', '.ipp', '.inl', '.cuh'}
+
+_INCLUDE_DIRECTIVE = re.compile(rb'^[ \t]*#[ \t]*include[ \t]*([<"])([^>"\n]+)[>"]', re.MULTILINE)
+
+
+class IncludeIndex:
+    """
+    The IncludeIndex object holds the include directives of the C and C++ files of a set of packages.
+    A package exports the headers in its 'include' directory, they are included by their path relative to it.
+    Quoted includes are resolved relative to the including file first. Includes of installed or system headers are
+    not resolved. The include directives of every file are cached and only parsed again if the file changed.
+
+    :ivar parsed_files: Number of files parsed during the last load (not found in the cache)
+    :vartype parsed_files: int
+    """
+
+    def __init__(self):
+        self.parsed_files = 0
+        self._includes = dict()
+        self._owners = dict()
+        self._exported_headers = dict()
+
+    @timing.timed()
+    def load(self, package_index, package_names, cache_file=None):
+        """
+        Index the C and C++ files of the packages.
+
+        :param package_index: Index of the packages in the source directory
+        :type package_index: PackageIndex
+        :param package_names: Names of the indexed packages
+        :type package_names: iterable(str)
+        :param cache_file: Include cache. Unchanged files are not parsed again, 'None' to disable.
+        :type cache_file: str
+        """
+        self.parsed_files = 0
+        cached_files = loadIncludeCache(cache_file) if cache_file else dict()
+        self._includes = dict()
+        self._owners = dict()
+        self._exported_headers = dict()
+
+        for package_name in package_names:
+            package_path = package_index.packagePath(package_name)
+            if package_path is None:
+                continue
+            # Changed files are reported with the real path of their repository
+            package_path = os.path.realpath(package_path)
+            include_dir = os.path.join(package_path, 'include')
+            for file in listSourceFiles(package_path):
+                stat = os.stat(file)
+                signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+                cached_file = cached_files.get(file)
+                if cached_file and cached_file[0] == signature:
+                    includes = cached_file[1]
+                else:
+                    includes = parseIncludes(file)
+                    cached_files[file] = (signature, includes)
+                    self.parsed_files += 1
+                self._includes[file] = includes
+                self._owners[file] = package_name
+                if file.startswith(include_dir + os.sep):
+                    self._exported_headers[os.path.relpath(file, include_dir)] = file
+
+        if cache_file and self.parsed_files:
+            # Files of other packages stay in the cache, files that vanished are dropped
+            saveIncludeCache(cache_file, dict((file, entry) for file, entry in cached_files.items()
+                                              if file in self._includes or os.path.exists(file)))
+
+    def __len__(self):
+        return len(self._includes)
+
+    def includingFiles(self, headers):
+        """
+        :param headers: Absolute paths of the headers
+        :type headers: iterable(str)
+        :returns: Indexed files including one of 'headers' directly or through other indexed headers
+        :rtype: set(str)
+        """
+        included_by = dict()
+        for file, includes in self._includes.items():
+            for quoted, name in includes:
+                header = self.resolveInclude(file, quoted, name)
+                if header is not None:
+                    included_by.setdefault(header, set()).add(file)
+
+        including_files = set()
+        queue = deque(headers)
+        while queue:
+            for file in included_by.get(queue.popleft(), ()):
+                if file not in including_files:
+                    including_files.add(file)
+                    queue.append(file)
+        return including_files
+
+    def includingPackages(self, headers):
+        """
+        :param headers: Absolute paths of the headers
+        :type headers: iterable(str)
+        :returns: Names of the packages with a file including one of 'headers' directly or through other headers
+        :rtype: set(str)
+        """
+        return set(self._owners[file] for file in self.includingFiles(headers))
+
+    def resolveInclude(self, file, quoted, name):
+        """
+        :param file: Absolute path of the including file
+        :type file: str
+        :param quoted: True, if the include uses quotes instead of angle brackets
+        :type quoted: bool
+        :param name: Included path
+        :type name: str
+        :returns: Absolute path of the included file, 'None' if it is not part of the index
+        :rtype: str
+        """
+        if quoted:
+            local_file = os.path.normpath(os.path.join(os.path.dirname(file), name))
+            if local_file in self._includes:
+                return local_file
+        return self._exported_headers.get(os.path.normpath(name))
+
+
+def isSourceFile(file):
+    """
+    :param file: Path of the file
+    :type file: str
+    :returns: True, if 'file' is a C or C++ source or header file
+    :rtype: bool
+    """
+    return os.path.splitext(file)[1].lower() in SOURCE_EXTENSIONS | HEADER_EXTENSIONS
+
+
+def isHeaderFile(file):
+    """
+    :param file: Path of the file
+    :type file: str
+    :returns: True, if 'file' is a C or C++ header file
+    :rtype: bool
+    """
+    return os.path.splitext(file)[1].lower() in HEADER_EXTENSIONS
+
+
+def listSourceFiles(package_path):
+    """
+    List the C and C++ files of a package. Hidden directories and nested packages are skipped.
+
+    :param package_path: Directory of the package
+    :type package_path: str
+    :returns: Absolute paths of the files
+    :rtype: list(str)
+    """
+    files = []
+    for directory, directories, file_names in os.walk(package_path):
+        directories[:] = [name for name in directories if not name.startswith('.') and
+                          not os.path.isfile(os.path.join(directory, name, 'package.xml'))]
+        files.extend(os.path.join(directory, name) for name in file_names if isSourceFile(name))
+    return files
+
+
+def parseIncludes(file):
+    """
+    :param file: Path of a C or C++ file
+    :type file: str
+    :returns: Quoted flag and included path of every include directive, empty if the file can not be read
+    :rtype: list(tuple(bool,str))
+    """
+    try:
+        with open(file, 'rb') as f:
+            content = f.read()
+    except OSError:
+        return []
+    return [(delimiter == b'"', os.fsdecode(name.strip())) for delimiter, name in _INCLUDE_DIRECTIVE.findall(content)]
+
+
+def loadIncludeCache(cache_file):
+    """
+    Load the include directives from the cache file.
+
+    :param cache_file: Path of the cache file
+    :type cache_file: str
+    :returns: Dict of file paths to (stat signature, includes) tuples, empty if there is no valid cache
+    :rtype: dict(str,tuple(tuple(int,int,int),list(tuple(bool,str))))
+    """
+    try:
+        with open(cache_file, 'rb') as f:
+            cache = pickle.load(f)
+        if cache.get('version') == INCLUDE_CACHE_VERSION:
+            return cache['files']
+    except (OSError, EOFError, AttributeError, ImportError, pickle.UnpicklingError):
+        pass
+    return dict()
+
+
+def saveIncludeCache(cache_file, files):
+    """
+    Atomically replace the cache file with the include directives.
+
+    :param cache_file: Path of the cache file
+    :type cache_file: str
+    :param files: Dict of file paths to (stat signature, includes) tuples
+    :type files: dict(str,tuple(tuple(int,int,int),list(tuple(bool,str))))
+    """
+    tmp_file = cache_file + '.tmp'
+    try:
+        with open(tmp_file, 'wb') as f:
+            pickle.dump({'version': INCLUDE_CACHE_VERSION, 'files': files}, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        log.warn("Could not write include cache {}: {}".format(cache_file, e))
@@ -0,0 +1,102 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import ctypes
+import ctypes.util
+import os
+import struct
+
+# Event masks, see inotify(7)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+
+# Events of entries that appear, disappear or are rewritten in a directory
+IN_DIRECTORY_CHANGES = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+# Header of an event (watch descriptor, mask, cookie, length of the name)
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    """
+    The Inotify object watches directories for changes using the inotify API of the Linux kernel (through ctypes).
+    Its file descriptor is non-blocking and can be used with select.
+
+    :ivar watches: Watched paths by watch descriptor
+    :vartype watches: dict(int,str)
+    """
+
+    def __init__(self):
+        self.watches = dict()
+        try:
+            self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            raise OSError("inotify is not available on this system")
+        if self._fd < 0:
+            self._raiseError("inotify_init1")
+
+    def fileno(self):
+        return self._fd
+
+    def addWatch(self, path, mask):
+        """
+        Watch 'path' for the events in 'mask'. Watching an already watched path replaces its mask.
+
+        :param path: Path of the watched directory or file
+        :type path: str
+        :param mask: Events to watch
+        :type mask: int
+        :returns: Watch descriptor
+        :rtype: int
+        :raises OSError: If the path can not be watched, errno ENOSPC if the watch limit is reached
+        """
+        watch = self._libc.inotify_add_watch(self._fd, os.fsencode(path), ctypes.c_uint32(mask))
+        if watch < 0:
+            self._raiseError(path)
+        self.watches[watch] = path
+        return watch
+
+    def readEvents(self):
+        """
+        Read all pending events without blocking.
+
+        :returns: List of path, mask, name tuples. The path is 'None' for IN_Q_OVERFLOW, the name is empty if the
+                  event concerns the watched path itself.
+        :rtype: list(tuple(str,int,str))
+        """
+        events = list()
+        while True:
+            try:
+                buffer = os.read(self._fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset < len(buffer):
+                watch, mask, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+                offset += _EVENT_HEADER.size
+                name = os.fsdecode(buffer[offset:offset + length].rstrip(b'\0'))
+                offset += length
+                path = self.watches.get(watch)
+                if mask & IN_IGNORED:
+                    self.watches.pop(watch, None)
+                events.append((path, mask, name))
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self.watches.clear()
+
+    def _raiseError(self, what):
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error), what)
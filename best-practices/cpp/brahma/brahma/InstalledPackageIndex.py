@@ -0,0 +1,243 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import os
+import pickle
+import re
+
+import brahma.log as log
+import brahma.timing as timing
+
+INSTALLED_PACKAGES_CACHE_DIR = os.path.expanduser("~/.cache/brahma")
+INSTALLED_PACKAGES_CACHE_FILE = "installed_packages.pickle"
+# Rewritten by dpkg whenever debian packages are installed, upgraded or removed
+DPKG_STATUS_FILE = "/var/lib/dpkg/status"
+# Marker file of catkin devel and install spaces
+CATKIN_MARKER_FILE = ".catkin"
+
+# Bump if the layout of the cache file changes
+INSTALLED_PACKAGES_CACHE_VERSION = 1
+
+# Prefix path of the workspaces a catkin workspace was configured with, written to its '_setup_util.py'
+_SETUP_UTIL_PREFIX_PATH = re.compile(r"CMAKE_PREFIX_PATH = r?'([^']*)'\.split\(';'\)")
+
+
+class InstalledPackageIndex:
+    """
+    The InstalledPackageIndex object holds the names of all catkin packages installed in the underlays of a workspace.
+    Packages are detected by their directory in 'share', manifests are not parsed. The package names of every share
+    directory are cached and only listed again if the share directory or the dpkg status changed.
+
+    :ivar prefixes: Underlay workspaces including the workspaces they extend, in the order of precedence
+    :vartype prefixes: list(str)
+    :ivar listed_directories: Number of share directories listed during the last load (not found in the cache)
+    :vartype listed_directories: int
+    """
+
+    def __init__(self):
+        self.prefixes = []
+        self.listed_directories = 0
+        self._packages = dict()
+        self._signatures = dict()
+
+    @timing.timed()
+    def load(self, underlays, cache_file=None):
+        """
+        Index the packages installed in 'underlays' and in the workspaces they extend.
+
+        :param underlays: Underlay workspaces (e.g. /opt/ros/noetic or devel and install spaces)
+        :type underlays: list(str)
+        :param cache_file: Package name cache. Unchanged share directories are not listed again, 'None' to disable.
+        :type cache_file: str
+        """
+        self.prefixes = resolveUnderlays(underlays)
+        self.listed_directories = 0
+        cached_directories = loadInstalledPackageCache(cache_file) if cache_file else dict()
+        dpkg_status = _signature(DPKG_STATUS_FILE)
+        self._packages = dict()
+        self._signatures = dict()
+
+        for prefix in self.prefixes:
+            share_dir = os.path.join(prefix, 'share')
+            signature = (_signature(share_dir), dpkg_status)
+            cached_directory = cached_directories.get(share_dir)
+            if cached_directory and cached_directory[0] == signature:
+                package_names = cached_directory[1]
+            else:
+                package_names = listInstalledPackages(share_dir)
+                cached_directories[share_dir] = (signature, package_names)
+                self.listed_directories += 1
+            self._signatures[share_dir] = signature
+            for package_name in package_names:
+                # Packages of the first underlay shadow the ones it extends
+                self._packages.setdefault(package_name, prefix)
+
+        if cache_file and self.listed_directories:
+            saveInstalledPackageCache(cache_file, cached_directories)
+
+    def __contains__(self, package_name):
+        return package_name in self._packages
+
+    def __len__(self):
+        return len(self._packages)
+
+    def names(self):
+        """
+        :returns: Names of all installed packages
+        :rtype: set(str)
+        """
+        return set(self._packages)
+
+    def missing(self, package_names):
+        """
+        :param package_names: Names of the packages
+        :type package_names: iterable(str)
+        :returns: Names of the packages that are not installed in any underlay
+        :rtype: set(str)
+        """
+        return set(package_names) - self._packages.keys()
+
+    def prefix(self, package_name):
+        """
+        :param package_name: Name of the package
+        :type package_name: str
+        :returns: Underlay the package is installed in, 'None' if it is not installed
+        :rtype: str
+        """
+        return self._packages.get(package_name)
+
+    def fingerprint(self):
+        """
+        Cheap fingerprint of the underlays. It changes if packages are installed or removed.
+
+        :returns: Signatures of the share directories and the dpkg status
+        :rtype: str
+        """
+        return ';'.join('{}:{}:{}'.format(share_dir, *signature) for share_dir, signature in self._signatures.items())
+
+
+def resolveUnderlays(underlays):
+    """
+    Resolve the workspaces extended by 'underlays'. A catkin workspace extends the prefix path it was configured with,
+    which is read from its '_setup_util.py'. Workspaces that do not exist are skipped with a warning.
+
+    :param underlays: Underlay workspaces
+    :type underlays: list(str)
+    :returns: Underlays followed by the workspaces they extend, without duplicates
+    :rtype: list(str)
+    """
+    underlays = [os.path.normpath(underlay) for underlay in underlays]
+    prefixes = []
+    pending = list(underlays)
+    while pending:
+        prefix = os.path.normpath(pending.pop(0))
+        if prefix in prefixes:
+            continue
+        if not os.path.isdir(prefix):
+            if prefix in underlays:
+                log.warn("Underlay '{}' does not exist.".format(prefix))
+            continue
+        # Only catkin workspaces of the prefix path are underlays, e.g. '/usr' is not
+        if prefix not in underlays and not os.path.exists(os.path.join(prefix, CATKIN_MARKER_FILE)):
+            continue
+        prefixes.append(prefix)
+        pending.extend(getExtendedPrefixes(prefix))
+    return prefixes
+
+
+def getExtendedPrefixes(prefix):
+    """
+    :param prefix: Catkin devel or install space
+    :type prefix: str
+    :returns: Prefix path the workspace was configured with, empty if it is not a catkin workspace
+    :rtype: list(str)
+    """
+    try:
+        with open(os.path.join(prefix, '_setup_util.py'), 'r') as f:
+            match = _SETUP_UTIL_PREFIX_PATH.search(f.read())
+    except OSError:
+        return []
+    if match is None:
+        return []
+    return [path for path in match.group(1).split(';') if path]
+
+
+def listInstalledPackages(share_dir):
+    """
+    List the catkin packages in a share directory. Install spaces contain the manifest of every package, devel spaces
+    only the generated CMake configuration.
+
+    :param share_dir: Share directory of a workspace
+    :type share_dir: str
+    :returns: Names of the installed packages
+    :rtype: list(str)
+    """
+    try:
+        entries = os.listdir(share_dir)
+    except OSError:
+        return []
+    return sorted(name for name in entries
+                  if os.path.isfile(os.path.join(share_dir, name, 'package.xml')) or
+                  os.path.isfile(os.path.join(share_dir, name, 'cmake', name + 'Config.cmake')))
+
+
+def installedPackageCacheFile(ros_distro, cache_dir=INSTALLED_PACKAGES_CACHE_DIR):
+    """
+    :param ros_distro: ROS distribution of the workspace
+    :type ros_distro: str
+    :param cache_dir: Directory of the brahma caches
+    :type cache_dir: str
+    :returns: Path of the installed package cache shared by all workspaces of 'ros_distro'
+    :rtype: str
+    """
+    return os.path.join(cache_dir, ros_distro, INSTALLED_PACKAGES_CACHE_FILE)
+
+
+def loadInstalledPackageCache(cache_file):
+    """
+    Load the package names of the share directories from the cache file.
+
+    :param cache_file: Path of the cache file
+    :type cache_file: str
+    :returns: Dict of share directories to (signature, package names) tuples, empty if there is no valid cache
+    :rtype: dict(str,tuple(tuple,list(str)))
+    """
+    try:
+        with open(cache_file, 'rb') as f:
+            cache = pickle.load(f)
+        if cache.get('version') == INSTALLED_PACKAGES_CACHE_VERSION:
+            return cache['directories']
+    except (OSError, EOFError, AttributeError, ImportError, pickle.UnpicklingError):
+        pass
+    return dict()
+
+
+def saveInstalledPackageCache(cache_file, directories):
+    """
+    Atomically replace the cache file with the package names of the share directories.
+
+    :param cache_file: Path of the cache file
+    :type cache_file: str
+    :param directories: Dict of share directories to (signature, package names) tuples
+    :type directories: dict(str,tuple(tuple,list(str)))
+    """
+    tmp_file = cache_file + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(tmp_file, 'wb') as f:
+            pickle.dump({'version': INSTALLED_PACKAGES_CACHE_VERSION, 'directories': directories}, f,
+                        pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        log.warn("Could not write installed package cache {}: {}".format(cache_file, e))
+
+
+def _signature(path):
+    # Modification time and inode, 'None' if the path does not exist
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_ino
@@ -0,0 +1,101 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import json
+import os
+
+# Bump if the layout of the manifest file changes
+LINK_MANIFEST_VERSION = 1
+
+
+class LinkManifest:
+    """
+    The LinkManifest object records the symbolic links brahma created in the catkin source space.
+    It is only trusted while the modification time and inode of the source space are unchanged, i.e. no entry was added,
+    removed or replaced since it was saved. Otherwise the source space is scanned with readlink.
+
+    :ivar links: Relative link target per package name
+    :vartype links: dict(str,str)
+    :ivar other_entries: Entries of the source space that are not symbolic links
+    :vartype other_entries: list(str)
+    """
+
+    def __init__(self):
+        self.links = dict()
+        self.other_entries = []
+
+    def load(self, manifest_file, source_space):
+        """
+        Load the manifest if it matches the source space, scan the source space otherwise.
+
+        :param manifest_file: Path of the manifest file, 'None' to always scan
+        :type manifest_file: str
+        :param source_space: Catkin source space
+        :type source_space: str
+        :returns: True, if the links were read from the manifest
+        :rtype: bool
+        """
+        if manifest_file is not None:
+            try:
+                with open(manifest_file, 'r') as f:
+                    manifest = json.load(f)
+                if manifest.get('version') == LINK_MANIFEST_VERSION and \
+                        manifest.get('source_space') == source_space and \
+                        manifest.get('signature') == directorySignature(source_space):
+                    self.links = manifest['links']
+                    self.other_entries = manifest['other_entries']
+                    return True
+            except (OSError, ValueError, KeyError):
+                pass
+        self.scan(source_space)
+        return False
+
+    def scan(self, source_space):
+        """
+        Read the symbolic links of the source space.
+
+        :param source_space: Catkin source space
+        :type source_space: str
+        """
+        self.links = dict()
+        self.other_entries = []
+        with os.scandir(source_space) as entries:
+            for entry in entries:
+                if entry.is_symlink():
+                    self.links[entry.name] = os.readlink(entry.path)
+                else:
+                    self.other_entries.append(entry.name)
+        self.other_entries.sort()
+
+    def save(self, manifest_file, source_space):
+        """
+        Atomically replace the manifest file. Call it after the last change of the source space.
+
+        :param manifest_file: Path of the manifest file
+        :type manifest_file: str
+        :param source_space: Catkin source space
+        :type source_space: str
+        """
+        manifest = {'version': LINK_MANIFEST_VERSION, 'source_space': source_space,
+                    'signature': directorySignature(source_space), 'links': self.links,
+                    'other_entries': self.other_entries}
+        tmp_file = manifest_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            json.dump(manifest, f, sort_keys=True)
+        os.replace(tmp_file, manifest_file)
+
+
+def directorySignature(directory):
+    """
+    :param directory: Path of the directory
+    :type directory: str
+    :returns: Modification time and inode of the directory, 'None' if it does not exist
+    :rtype: list(int)
+    """
+    try:
+        stat = os.stat(directory)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_ino]
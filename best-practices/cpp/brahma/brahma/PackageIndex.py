@@ -0,0 +1,246 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import hashlib
+import os
+import pickle
+
+import brahma.log as log
+import brahma.timing as timing
+from brahma.DependencyGraph import DependencyGraph
+
+# Bump if the layout of the cache file changes
+PACKAGE_CACHE_VERSION = 1
+
+
+class PackageIndex:
+    """
+    The PackageIndex object holds all catkin packages of a directory.
+    The directory is crawled once on load, afterwards packages are looked up by name, path or topological position.
+    Parsed manifests can be persisted in a cache file, such that only changed package.xml files are parsed again.
+
+    :ivar package_dir: Directory in which the packages are searched
+    :vartype package_dir: str
+    :ivar parsed_manifests: Number of package.xml files parsed during the last load (not found in the cache)
+    :vartype parsed_manifests: int
+    """
+
+    def __init__(self):
+        self.package_dir = None
+        self.parsed_manifests = 0
+        self._packages_by_path = dict()
+        self._packages_by_name = dict()
+        self._ordered_packages = None
+        self._topological_positions = None
+        self._packages_by_real_path = None
+        self._dependency_graph = None
+        self._signatures = dict()
+
+    @timing.timed()
+    def load(self, package_dir, cache_file=None):
+        """
+        Crawl 'package_dir' for catkin packages.
+
+        :param package_dir: Directory in which packages are searched.
+        :type package_dir: str
+        :param cache_file: Manifest cache. Unchanged package.xml files are not parsed again, 'None' to disable.
+        :type cache_file: str
+        """
+        from catkin_pkg.package import InvalidPackage, PACKAGE_MANIFEST_FILENAME, parse_package
+        from catkin_pkg.packages import find_package_paths
+
+        self.package_dir = os.path.abspath(package_dir)
+        self.parsed_manifests = 0
+        cached_manifests = loadManifestCache(cache_file) if cache_file else dict()
+        manifests = dict()
+        self._packages_by_path = dict()
+        self._packages_by_name = dict()
+        self._signatures = dict()
+
+        for path in find_package_paths(self.package_dir, exclude_subspaces=True):
+            manifest = os.path.join(self.package_dir, path, PACKAGE_MANIFEST_FILENAME)
+            stat = os.stat(manifest)
+            signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            cached_manifest = cached_manifests.get(manifest)
+            if cached_manifest and cached_manifest[0] == signature:
+                package = cached_manifest[1]
+            else:
+                try:
+                    package = parse_package(manifest, warnings=[])
+                except InvalidPackage as e:
+                    log.error("{}".format(e))
+                self.parsed_manifests += 1
+            manifests[manifest] = (signature, package)
+            self._signatures[manifest] = signature
+
+            if package.name in self._packages_by_name:
+                log.error('Multiple packages found with the same name "{}":\n- {}\n- {}'.format(
+                    package.name, os.path.dirname(self._packages_by_name[package.name].filename),
+                    os.path.dirname(package.filename)))
+            self._packages_by_path[path] = package
+            self._packages_by_name[package.name] = package
+
+        if cache_file and (self.parsed_manifests or len(manifests) != len(cached_manifests)):
+            saveManifestCache(cache_file, manifests)
+        self._ordered_packages = None
+        self._topological_positions = None
+        self._packages_by_real_path = None
+        self._dependency_graph = None
+
+    def fingerprint(self):
+        """
+        Cheap fingerprint of the packages. It changes if a manifest is added, removed or changed, also in directories
+        that are not part of a tracked repository.
+
+        :returns: Hash of the paths and stat signatures of all manifests
+        :rtype: str
+        """
+        fingerprint = hashlib.sha1()
+        for manifest, signature in sorted(self._signatures.items()):
+            fingerprint.update('{}:{}:{}:{}\0'.format(manifest, *signature).encode())
+        return fingerprint.hexdigest()
+
+    def __contains__(self, package_name):
+        return package_name in self._packages_by_name
+
+    def __len__(self):
+        return len(self._packages_by_name)
+
+    def packages(self):
+        """
+        :returns: A dictionary of all catkin packages in the index
+        :rtype: dict(str,catkin_pkg.Package)
+        """
+        return dict(self._packages_by_name)
+
+    def package(self, package_name):
+        """
+        :param package_name: Name of the package
+        :type package_name: str
+        :returns: Package with name 'package_name', 'None' if not in the index
+        :rtype: catkin_pkg.Package
+        """
+        return self._packages_by_name.get(package_name)
+
+    def packagePath(self, package_name):
+        """
+        :param package_name: Name of the package
+        :type package_name: str
+        :returns: Absolute directory of the package with name 'package_name', 'None' if not in the index
+        :rtype: str
+        """
+        package = self.package(package_name)
+        if package is None:
+            return None
+        return os.path.dirname(package.filename)
+
+    def packageFromPath(self, path):
+        """
+        :param path: Directory of the package (absolute or relative to the package directory)
+        :type path: str
+        :returns: Package located in 'path', 'None' if not in the index
+        :rtype: catkin_pkg.Package
+        """
+        return self._packages_by_path.get(os.path.relpath(os.path.join(self.package_dir, path), self.package_dir))
+
+    def packageFromFile(self, file):
+        """
+        Look up the package owning 'file' by walking up its parent directories. The cost is linear in the depth of
+        'file' and independent of the number of packages. Package directories are resolved to real paths once.
+
+        :param file: Absolute path of a file, symbolic links are not resolved
+        :type file: str
+        :returns: Package whose real directory is the longest prefix of 'file', 'None' if there is none
+        :rtype: catkin_pkg.Package
+        """
+        if self._packages_by_real_path is None:
+            self._packages_by_real_path = dict(
+                (os.path.dirname(os.path.realpath(pkg.filename)), pkg) for pkg in self._packages_by_name.values())
+        directory = os.path.dirname(file)
+        while True:
+            package = self._packages_by_real_path.get(directory)
+            if package is not None:
+                return package
+            parent = os.path.dirname(directory)
+            if parent == directory:
+                return None
+            directory = parent
+
+    @timing.timed()
+    def dependencyGraph(self):
+        """
+        Dependency graph of the indexed packages. Built on first use.
+
+        :returns: Dependency graph of all packages in the index
+        :rtype: DependencyGraph
+        """
+        if self._dependency_graph is None:
+            self._dependency_graph = DependencyGraph(self._packages_by_name)
+        return self._dependency_graph
+
+    @timing.timed()
+    def topologicalOrder(self):
+        """
+        Topologically ordered packages. Computed on first use, exits the process on cyclic dependencies.
+
+        :returns: List of package path, package tuples
+        :rtype: list(tuple(str,catkin_pkg.Package))
+        """
+        if self._ordered_packages is None:
+            from catkin_pkg.topological_order import topological_order_packages
+            ordered_packages = topological_order_packages(self._packages_by_path)
+            if ordered_packages and not ordered_packages[-1][0]:
+                log.error("Cyclic dependency detected. Involved packages: {}".format(ordered_packages[-1][1]))
+            self._ordered_packages = ordered_packages
+            self._topological_positions = dict(
+                (pkg.name, position) for position, (path, pkg) in enumerate(ordered_packages))
+        return self._ordered_packages
+
+    def topologicalPosition(self, package_name):
+        """
+        :param package_name: Name of the package
+        :type package_name: str
+        :returns: Position of the package in the topological order, 'None' if not in the index
+        :rtype: int
+        """
+        self.topologicalOrder()
+        return self._topological_positions.get(package_name)
+
+
+def loadManifestCache(cache_file):
+    """
+    Load the parsed package manifests from the cache file.
+
+    :param cache_file: Path of the cache file
+    :type cache_file: str
+    :returns: Dict of manifest paths to (stat signature, package) tuples, empty if there is no valid cache
+    :rtype: dict(str,tuple(tuple(int,int,int),catkin_pkg.Package))
+    """
+    try:
+        with open(cache_file, 'rb') as f:
+            cache = pickle.load(f)
+        if cache.get('version') == PACKAGE_CACHE_VERSION:
+            return cache['manifests']
+    except (OSError, EOFError, AttributeError, ImportError, pickle.UnpicklingError):
+        pass
+    return dict()
+
+
+def saveManifestCache(cache_file, manifests):
+    """
+    Atomically replace the cache file with the parsed package manifests.
+
+    :param cache_file: Path of the cache file
+    :type cache_file: str
+    :param manifests: Dict of manifest paths to (stat signature, package) tuples
+    :type manifests: dict(str,tuple(tuple(int,int,int),catkin_pkg.Package))
+    """
+    tmp_file = cache_file + '.tmp'
+    try:
+        with open(tmp_file, 'wb') as f:
+            pickle.dump({'version': PACKAGE_CACHE_VERSION, 'manifests': manifests}, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        log.warn("Could not write package cache {}: {}".format(cache_file, e))
@@ -0,0 +1,119 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import os
+
+
+class UpdateState:
+    """
+    The UpdateState object records the fingerprint of the last successful workspace update.
+    It is used to skip unchanged repositories and to skip the update entirely if nothing changed.
+
+    :ivar settings_hash: Hash of the settings file after the update
+    :vartype settings_hash: str
+    :ivar underlay: Fingerprint of the installed packages the workspace is extending
+    :vartype underlay: str
+    :ivar manifests: Fingerprint of the manifests of all packages in the source directory
+    :vartype manifests: str
+    :ivar repositories: Fingerprint, resolved diff packages and optionally the changed files per repository
+    :vartype repositories: dict(str, dict)
+    :ivar catkin_packages: Packages linked into the catkin workspace
+    :vartype catkin_packages: list(str)
+    """
+
+    def __init__(self):
+        self.settings_hash = None
+        self.underlay = None
+        self.manifests = None
+        self.repositories = {}
+        self.catkin_packages = None
+
+    def repositoryPackages(self, repo, fingerprint):
+        """
+        :param repo: Name of the repository
+        :type repo: str
+        :param fingerprint: Current fingerprint of the repository
+        :type fingerprint: str
+        :returns: Diff packages of 'repo' if its fingerprint did not change, 'None' otherwise
+        :rtype: list(str)
+        """
+        repo_state = self.repositories.get(repo)
+        if repo_state and fingerprint and repo_state.get('fingerprint') == fingerprint:
+            return repo_state.get('packages')
+        return None
+
+    def repositoryFiles(self, repo, fingerprint):
+        """
+        :param repo: Name of the repository
+        :type repo: str
+        :param fingerprint: Current fingerprint of the repository
+        :type fingerprint: str
+        :returns: Changed files of 'repo' if its fingerprint did not change and they were recorded, 'None' otherwise
+        :rtype: list(str)
+        """
+        if self.repositoryPackages(repo, fingerprint) is None:
+            return None
+        return self.repositories[repo].get('files')
+
+    def setRepository(self, repo, fingerprint, packages, files=None):
+        """
+        :param repo: Name of the repository
+        :type repo: str
+        :param fingerprint: Fingerprint of the repository
+        :type fingerprint: str
+        :param packages: Resolved diff packages of the repository
+        :type packages: list(str)
+        :param files: Changed files of the repository, 'None' to not record them
+        :type files: list(str)
+        """
+        self.repositories[repo] = {'fingerprint': fingerprint, 'packages': sorted(packages)}
+        if files is not None:
+            self.repositories[repo]['files'] = sorted(files)
+
+    def isUpToDate(self, settings_hash, fingerprints, underlay, manifests):
+        """
+        Check whether the workspace changed since the last update.
+
+        :param settings_hash: Hash of the current settings file
+        :type settings_hash: str
+        :param fingerprints: Current fingerprint per repository
+        :type fingerprints: dict(str, str)
+        :param underlay: Current fingerprint of the installed packages
+        :type underlay: str
+        :param manifests: Current fingerprint of the package manifests
+        :type manifests: str
+        :returns: True, if settings, underlay, manifests and all repository fingerprints are unchanged
+        :rtype: bool
+        """
+        if self.catkin_packages is None or settings_hash != self.settings_hash or underlay != self.underlay or \
+                manifests != self.manifests:
+            return False
+        if set(fingerprints.keys()) != set(self.repositories.keys()):
+            return False
+        return all(fingerprint and self.repositories[repo].get('fingerprint') == fingerprint
+                   for repo, fingerprint in fingerprints.items())
+
+    def load(self, state_file):
+        """
+        Load the update state from a yaml file. Keeps the empty state if the file does not exist.
+
+        :param state_file: Path of the state file
+        :type state_file: str
+        """
+        import yaml
+        if os.path.isfile(state_file):
+            with open(state_file, 'r') as f:
+                self.__dict__.update(yaml.full_load(f) or {})
+
+    def save(self, state_file):
+        """
+        Save the update state to a yaml file.
+
+        :param state_file: Path of the state file
+        :type state_file: str
+        """
+        import yaml
+        with open(state_file, 'w') as f:
+            yaml.dump(self.__dict__, f)
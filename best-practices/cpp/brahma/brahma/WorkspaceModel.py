@@ -0,0 +1,298 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import errno
+import fnmatch
+import os
+import threading
+
+import brahma.git_helpers as git_helpers
+import brahma.log as log
+from brahma.CatkinWorkspace import CatkinWorkspace
+from brahma.Inotify import Inotify, IN_DIRECTORY_CHANGES, IN_ISDIR, IN_ONLYDIR, IN_Q_OVERFLOW
+from brahma.PackageIndex import PackageIndex
+
+# Files in the source tree that change the package index
+PACKAGE_FILES = ['package.xml', 'CATKIN_IGNORE']
+# Files in the git directory of a repository that change its refs
+GIT_FILES = ['HEAD', 'index', 'packed-refs']
+# Files in the configuration directory that change the workspace
+SETTINGS_FILES = ['paths.yaml', 'settings.yaml']
+
+# Categories of the watched directories
+_SOURCE = 'source'
+_GIT = 'git'
+_SETTINGS = 'settings'
+_CATKIN = 'catkin'
+
+
+class WorkspaceModel:
+    """
+    The WorkspaceModel object provides the package index, the catkin workspace and the git repositories of the
+    workspace to the verbs. Usually they are loaded on every access. The model of 'brahma serve' watches the workspace
+    with inotify, keeps them in memory and drops them when package.xml files, git refs or settings change.
+
+    :param paths: Paths of the watched workspace, 'None' to load everything on every access
+    :type paths: BrahmaWorkspacePaths
+    :param prune_patterns: Directories of the source tree that are not watched (see getRepositories)
+    :type prune_patterns: list(str)
+    :ivar invalidations: Number of times a part of the model was dropped
+    :vartype invalidations: int
+    """
+
+    # Model used by the verbs, set by 'brahma serve'
+    _active = None
+
+    def __init__(self, paths=None, prune_patterns=None):
+        self.invalidations = 0
+        self._paths = paths
+        self._prune_patterns = prune_patterns or []
+        self._lock = threading.RLock()
+        self._inotify = None
+        self._categories = dict()
+        self._package_index = None
+        self._catkin_workspaces = dict()
+        self._repositories = dict()
+        self._changes = list()
+        if paths is not None:
+            self._watch()
+
+    @staticmethod
+    def active():
+        """
+        :returns: The model of 'brahma serve' if it is running in this process, otherwise a model loading
+                  everything on every access
+        :rtype: WorkspaceModel
+        """
+        return WorkspaceModel._active or WorkspaceModel()
+
+    @staticmethod
+    def activate(model):
+        """
+        :param model: Model returned by 'active', 'None' to deactivate the current model
+        :type model: WorkspaceModel
+        """
+        WorkspaceModel._active = model
+
+    def isWatching(self):
+        """
+        :returns: True, if the model is kept in memory
+        :rtype: bool
+        """
+        return self._inotify is not None
+
+    def fileno(self):
+        return self._inotify.fileno()
+
+    def watchedDirectories(self):
+        """
+        :returns: Directories watched with inotify
+        :rtype: list(str)
+        """
+        return list(self._inotify.watches.values()) if self.isWatching() else []
+
+    def packageIndex(self, package_dir, cache_file=None):
+        """
+        :param package_dir: Directory in which packages are searched.
+        :type package_dir: str
+        :param cache_file: Manifest cache (see PackageIndex.load)
+        :type cache_file: str
+        :returns: Index of the packages in 'package_dir'
+        :rtype: PackageIndex
+        """
+        with self._lock:
+            self.processEvents()
+            package_index = self._package_index
+            if package_index is not None and package_index.package_dir == os.path.abspath(package_dir):
+                package_index.parsed_manifests = 0
+                return package_index
+            package_index = PackageIndex()
+            package_index.load(package_dir, cache_file)
+            if self.isWatching():
+                self._package_index = package_index
+            return package_index
+
+    def catkinWorkspace(self, catkin_options):
+        """
+        :param catkin_options: Options with which the catkin workspace is loaded
+        :type catkin_options: CatkinToolsOptions
+        :returns: Loaded catkin workspace
+        :rtype: CatkinWorkspace
+        """
+        with self._lock:
+            self.processEvents()
+            catkin_ws = self._catkin_workspaces.get(catkin_options.workspace)
+            if catkin_ws is None:
+                catkin_ws = CatkinWorkspace()
+                catkin_ws.load(catkin_options)
+                if self.isWatching():
+                    self._catkin_workspaces[catkin_options.workspace] = catkin_ws
+            return catkin_ws
+
+    def repository(self, repo_path):
+        """
+        :param repo_path: Path of the repository
+        :type repo_path: str
+        :returns: Repository at 'repo_path'
+        :rtype: git.Repo
+        """
+        with self._lock:
+            self.processEvents()
+            key = os.path.realpath(repo_path)
+            repo = self._repositories.get(key)
+            if repo is None:
+                repo = git_helpers.getRepository(repo_path)
+                if self.isWatching():
+                    self._repositories[key] = repo
+            return repo
+
+    def processEvents(self):
+        """
+        Drop the parts of the model that are affected by the pending inotify events.
+
+        The paths of the changed entries are collected until 'takeChanges' is called.
+        """
+        if not self.isWatching():
+            return
+        changes = self._changes
+        with self._lock:
+            for path, mask, name in self._inotify.readEvents():
+                if mask & IN_Q_OVERFLOW:
+                    log.warn("Missed changes of the workspace, reloading the workspace model.")
+                    self._rewatch()
+                    changes.append(self._paths.workspace)
+                    return
+                category = self._categories.get(path)
+                entry = os.path.join(path, name) if path else None
+                if category == _SOURCE:
+                    if mask & IN_ISDIR:
+                        # Repositories or packages might have been added, moved or removed
+                        self._watchSourceTree(entry)
+                        self._invalidate(package_index=True, repositories=True)
+                    elif name in PACKAGE_FILES:
+                        self._invalidate(package_index=True)
+                    changes.append(entry)
+                elif category == _GIT:
+                    # The git directory itself is watched for GIT_FILES, its refs directory for all refs
+                    is_refs = os.path.basename(path) != '.git'
+                    if is_refs and mask & IN_ISDIR:
+                        self._watchTree(entry, _GIT)
+                    if name in GIT_FILES or (is_refs and not name.endswith('.lock')):
+                        self._invalidate(repositories=True)
+                        changes.append(entry)
+                elif category == _SETTINGS and name in SETTINGS_FILES:
+                    self._invalidate(package_index=True, catkin_workspaces=True, repositories=True)
+                    changes.append(entry)
+                elif category == _CATKIN:
+                    if mask & IN_ISDIR:
+                        self._watchDirectory(entry, _CATKIN)
+                    if mask & IN_ISDIR or name.endswith('.yaml'):
+                        self._invalidate(catkin_workspaces=True)
+                        changes.append(entry)
+
+    def takeChanges(self):
+        """
+        :returns: Paths of the entries in the source tree, the git directories, the settings and the catkin profiles
+                  that changed since the last call, the workspace path if changes were missed
+        :rtype: list(str)
+        """
+        with self._lock:
+            self.processEvents()
+            changes, self._changes = self._changes, list()
+            return changes
+
+    def close(self):
+        """
+        Stop watching the workspace and drop the model.
+        """
+        with self._lock:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+            self._invalidate(package_index=True, catkin_workspaces=True, repositories=True)
+
+    def _watch(self):
+        self._inotify = Inotify()
+        self._categories = dict()
+        try:
+            self._watchDirectory(self._paths.configurationDirectory().rstrip('/'), _SETTINGS)
+            catkin_config = os.path.join(self._paths.catkin, '.catkin_tools')
+            self._watchDirectory(catkin_config, _CATKIN)
+            self._watchDirectory(os.path.join(catkin_config, 'profiles'), _CATKIN)
+            for profile in _subdirectories(os.path.join(catkin_config, 'profiles')):
+                self._watchDirectory(profile, _CATKIN)
+            self._watchSourceTree(self._paths.source)
+        except OSError as e:
+            if e.errno != errno.ENOSPC:
+                raise
+            log.warn("Reached the inotify watch limit (fs.inotify.max_user_watches), the workspace model is not kept "
+                     "in memory.")
+            self._inotify.close()
+            self._inotify = None
+
+    def _rewatch(self):
+        self._inotify.close()
+        self._invalidate(package_index=True, catkin_workspaces=True, repositories=True)
+        self._watch()
+
+    def _watchSourceTree(self, dir):
+        # Watch the directories of the source tree, the git directories of the repositories are watched separately
+        visited = set()
+        pending = [dir]
+        while pending:
+            dir = pending.pop()
+            name = os.path.basename(dir)
+            if name == '.git':
+                self._watchDirectory(dir, _GIT)
+                self._watchTree(os.path.join(dir, 'refs'), _GIT)
+                continue
+            if dir != self._paths.source and any(fnmatch.fnmatch(name, pattern) for pattern in self._prune_patterns):
+                continue
+            try:
+                stat = os.stat(dir)
+            except OSError:
+                continue
+            if (stat.st_dev, stat.st_ino) in visited:
+                continue
+            visited.add((stat.st_dev, stat.st_ino))
+            if self._watchDirectory(dir, _SOURCE):
+                pending.extend(_subdirectories(dir))
+
+    def _watchTree(self, dir, category):
+        self._watchDirectory(dir, category)
+        for subdir in _subdirectories(dir):
+            self._watchTree(subdir, category)
+
+    def _watchDirectory(self, dir, category):
+        if self._inotify is None:
+            return False
+        try:
+            self._inotify.addWatch(dir, IN_DIRECTORY_CHANGES | IN_ONLYDIR)
+        except OSError as e:
+            if e.errno == errno.ENOSPC:
+                raise
+            return False  # Removed in the meantime or not a directory
+        self._categories[dir] = category
+        return True
+
+    def _invalidate(self, package_index=False, catkin_workspaces=False, repositories=False):
+        if package_index and self._package_index is not None:
+            self._package_index = None
+            self.invalidations += 1
+        if catkin_workspaces and self._catkin_workspaces:
+            self._catkin_workspaces.clear()
+            self.invalidations += 1
+        if repositories:
+            git_helpers.clearRepositoryCache()
+            if self._repositories:
+                self._repositories.clear()
+                self.invalidations += 1
+
+
+def _subdirectories(dir):
+    try:
+        return sorted(entry.path for entry in os.scandir(dir) if entry.is_dir())
+    except OSError:
+        return []
@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import argparse
+
+import brahma.compiler_cache as compiler_cache
+import brahma.log as log
+
+
+def run(paths, settings, args):
+    """
+    Execute cache step.
+
+    :param paths: Relevant workspace paths
+    :type paths: BrahmaWorkspacePaths
+    :param settings: Workspace settings
+    :type settings: BrahmaWorkspaceSettings
+    :param args: Additional arguments parsed by argparse
+    """
+    # Load configuration from file
+    settings.load(paths.workspace)
+
+    if settings.compiler_cache == 'none':
+        log.info("No compiler cache configured, enable it with 'brahma config --compiler-cache ccache'.")
+        return
+
+    if args.action == 'stats':
+        log.title('Compiler cache statistics')
+        compiler_cache.reportStatistics(settings, paths.compilerCacheStatsFile())
+
+
+def setup_parser():
+    """
+    Parse cache options.
+
+    :returns: Parser with added arguments for the cache step.
+    """
+    parser = argparse.ArgumentParser(prog='brahma cache',
+                                     description='\033[1mbrahma cache [args]\033[0m\n Inspect the compiler cache shared '
+                                                 'by the workspaces.',
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("action", choices=['stats'],
+                        help='stats: Print the size and hit rate of the cache, also since the last report.')
+
+    return parser
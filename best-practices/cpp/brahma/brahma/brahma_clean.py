@@ -10,7 +10,7 @@ import sys
 from brahma.BrahmaWorkspacePaths import BrahmaWorkspacePaths
 from brahma.BrahmaWorkspaceSettings import BrahmaWorkspaceSettings
 from brahma.CatkinToolsOptions import CatkinToolsOptions
-from brahma.CatkinWorkspace import CatkinWorkspace
+from brahma.WorkspaceModel import WorkspaceModel
 
 import brahma.log as log
 
@@ -31,10 +31,9 @@ def run(paths, settings, args):
 
     # Clean packages
     if args.packages:
-        catkin_options = CatkinToolsOptions(paths.catkin, settings.ros_distro)
-        catkin_ws = CatkinWorkspace()
-        catkin_ws.load(catkin_options)
-        catkin_ws.cleanPackages(args.packages)
+        catkin_options = CatkinToolsOptions(paths.catkin, settings.ros_distro, settings.underlayPaths()[0])
+        catkin_ws = WorkspaceModel.active().catkinWorkspace(catkin_options)
+        catkin_ws.cleanPackages(args.packages, paths.trashDirectory())
         settings.include_upstream_dependencies = True
 
 
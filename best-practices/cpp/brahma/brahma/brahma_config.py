@@ -10,6 +10,7 @@ import sys
 from brahma.BrahmaWorkspacePaths import BrahmaWorkspacePaths
 from brahma.BrahmaWorkspaceSettings import BrahmaWorkspaceSettings
 
+import brahma.compiler_cache as compiler_cache
 import brahma.log as log
 
 
@@ -37,6 +38,11 @@ def run(paths, settings, args):
     if args.no_downstream_deps:
         settings.include_downstream_dependencies = False
 
+    if args.header_aware_downstream:
+        settings.header_aware_downstream = True
+    if args.no_header_aware_downstream:
+        settings.header_aware_downstream = False
+
     if args.missing_deps:
         settings.include_missing_dependencies = True
     if args.no_missing_deps:
@@ -50,6 +56,14 @@ def run(paths, settings, args):
         package_set.difference_update(args.remove_filter_packages)
         settings.filter_packages = list(package_set)
 
+    # The order of the ignore patterns matters, the last matching pattern wins
+    if args.no_diff_ignore_patterns:
+        settings.diff_ignore_patterns = []
+    settings.diff_ignore_patterns = [pattern for pattern in settings.diff_ignore_patterns
+                                     if pattern not in args.remove_diff_ignore_patterns]
+    settings.diff_ignore_patterns += [pattern for pattern in args.add_diff_ignore_patterns
+                                      if pattern not in settings.diff_ignore_patterns]
+
     if args.filter_only_downstream_packages:
         settings.only_filter_downstream_packages = True
     if args.filter_all_packages:
@@ -67,6 +81,16 @@ def run(paths, settings, args):
         settings.ide = args.ide
     if args.ros_distro is not None:
         settings.ros_distro = args.ros_distro
+    if args.git_jobs is not None:
+        settings.git_jobs = max(1, args.git_jobs)
+    if args.compiler_cache is not None:
+        settings.compiler_cache = args.compiler_cache
+    if args.compiler_cache_dir is not None:
+        settings.compiler_cache_dir = args.compiler_cache_dir
+    if args.compiler_cache_max_size is not None:
+        settings.compiler_cache_max_size = args.compiler_cache_max_size
+    if args.downstream_build_budget is not None:
+        settings.downstream_build_budget = max(0, args.downstream_build_budget)
 
     # Save workspace configuration
     log.title("Brahma workspace configuration")
@@ -95,30 +119,48 @@ def setup_parser():
     parser.add_argument('--no-downstream-deps',
                         help='Do not add downstream dependencies of the packages to the workspace.',
                         action='store_true')
+    parser.add_argument('--header-aware-downstream',
+                        help='Only add the downstream dependencies that include a changed header.',
+                        action='store_true')
+    parser.add_argument('--no-header-aware-downstream',
+                        help='Add all downstream dependencies of the changed packages.',
+                        action='store_true')
+    parser.add_argument('--downstream-build-budget', metavar='MINUTES', type=float, default=None,
+                        help='Only add the downstream dependencies that can be built within this time, estimated from '
+                             'previous builds (0 to add all).')
     parser.add_argument(
         '--missing-deps', help='Adds all dependencies that are not installed to the workspace.', action='store_true')
     parser.add_argument('--no-missing-deps',
                         help='Do not add all dependencies that are not installed to the workspace.',
                         action='store_true')
 
-    parser.add_argument("--add-filter-packages", nargs="+",
+    parser.add_argument("--add-filter-packages", nargs="+", metavar='PACKAGE',
                         help='Add package to the list of packages that are used to filter the package tree.', type=str,
                         default=list())
-    parser.add_argument("--remove-filter-packages", nargs="+",
+    parser.add_argument("--remove-filter-packages", nargs="+", metavar='PACKAGE',
                         help='Remove package from the list of packages that are used to filter the package tree.',
                         type=str, default=list())
     parser.add_argument("--no-filter-packages",
                         help='Clear list of packages that are used to filter the package tree.', action='store_true')
 
+    parser.add_argument("--add-diff-ignore-patterns", nargs="+", metavar='PATTERN',
+                        help='Add glob patterns of changed files that do not mark their package as changed.', type=str,
+                        default=list())
+    parser.add_argument("--remove-diff-ignore-patterns", nargs="+", metavar='PATTERN',
+                        help='Remove glob patterns of changed files that do not mark their package as changed.',
+                        type=str, default=list())
+    parser.add_argument("--no-diff-ignore-patterns",
+                        help='Clear list of glob patterns of changed files that are ignored.', action='store_true')
+
     parser.add_argument("--filter-only-downstream-packages",
                         help='Limit the filtering of packages to downstream packages.', action='store_true')
     parser.add_argument("--filter-all-packages",
                         help='Apply the filtering of packages to all packages.', action='store_true')
 
-    parser.add_argument("--add-explicit-packages", nargs="+",
+    parser.add_argument("--add-explicit-packages", nargs="+", metavar='PACKAGE',
                         help='Add packages to the list of packages explicitly added to the workspace.', type=str,
                         default=list())
-    parser.add_argument("--remove-explicit-packages", nargs="+",
+    parser.add_argument("--remove-explicit-packages", nargs="+", metavar='PACKAGE',
                         help='Remove packages from the list of packages explicitly added to the workspace.', type=str,
                         default=list())
     parser.add_argument("--no-explicit-packages",
@@ -128,4 +170,12 @@ def setup_parser():
                         default=None, choices=["none", "clion"])
     parser.add_argument(
         "--ros-distro", help='ROS distribution.', default=None)
+    parser.add_argument(
+        "--git-jobs", help='Number of repositories that are processed in parallel.', type=int, default=None)
+    parser.add_argument("--compiler-cache", help='Compiler cache the compilers are launched with.', default=None,
+                        choices=compiler_cache.COMPILER_CACHES)
+    parser.add_argument("--compiler-cache-dir", metavar='DIR', default=None,
+                        help='Directory of the compiler cache (empty for the cache shared by all workspaces).')
+    parser.add_argument("--compiler-cache-max-size", metavar='SIZE', default=None,
+                        help='Size limit of the compiler cache, e.g. 20G.')
     return parser
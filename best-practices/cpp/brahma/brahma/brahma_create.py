@@ -6,8 +6,6 @@
 import argparse
 import os
 
-from git import Repo
-
 import brahma.git_helpers as git_helpers
 import brahma.log as log
 import brahma.utils as utils
@@ -37,9 +35,18 @@ def run(paths, settings, args):
     for repo in args.repository:
         settings.addRepository(repo[0], repo[1], repo[2])
 
+    # Clone options given on the command line apply to all repositories without configured options
+    clone_options = dict((option, value) for option, value in
+                         [('depth', args.depth), ('filter', args.filter), ('single_branch', args.single_branch)]
+                         if value)
+    if clone_options:
+        for repo in settings.git_repositories:
+            settings.clone_options.setdefault(repo, dict(clone_options))
+
     if settings.git_repositories:
         log.title('Creating repositories')
-        git_helpers.cloneOrLinkRepositories(settings.git_repositories, paths.source)
+        jobs = args.jobs if args.jobs is not None else settings.git_jobs
+        git_helpers.cloneOrLinkRepositories(settings.git_repositories, paths.source, settings.clone_options, jobs)
 
     # Initialize the workspace
     brahma_init.init_workspace(paths, settings)
@@ -62,5 +69,12 @@ def setup_parser():
     parser.add_argument('-r', '--repository', help='Git repositories to clone.', metavar=("REPO_NAME", "REPO_URL", "REPO_BASE_BRANCH"),
                         nargs=3, action='append', default=[])
     parser.add_argument('--config', help='Configuration to load.', default="default")
+    parser.add_argument('--jobs', '-j', help='Number of repositories that are cloned in parallel.', type=int,
+                        default=None)
+    parser.add_argument('--depth', help='Create shallow clones with a history truncated to DEPTH commits.', type=int,
+                        default=None)
+    parser.add_argument('--filter', help='Create partial clones with the given object filter (e.g. blob:none).',
+                        default=None)
+    parser.add_argument('--single-branch', help='Only clone the history of the base branch.', action='store_true')
 
     return parser
@@ -0,0 +1,40 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import argparse
+
+import brahma.log as log
+import brahma.trash as trash
+
+
+def run(paths, settings, args):
+    """
+    Execute gc step.
+
+    :param paths: Relevant workspace paths
+    :type paths: BrahmaWorkspacePaths
+    :param settings: Workspace settings
+    :type settings: BrahmaWorkspaceSettings
+    :param args: Additional arguments parsed by argparse
+    """
+    log.title('Empty trash')
+    log.info('Deleting the build spaces of cleaned packages in {}'.format(paths.trashDirectory()))
+    deleted = trash.emptyTrash(paths.trashDirectory(), args.jobs)
+    log.info('Deleted {} entries'.format(deleted))
+
+
+def setup_parser():
+    """
+    Parse gc options.
+
+    :returns: Parser with added arguments for the gc step.
+    """
+    parser = argparse.ArgumentParser(prog='brahma gc',
+                                     description='\033[1mbrahma gc [args]\033[0m\n Delete the build spaces of cleaned packages. '
+                                                 'Usually done in the background after cleaning.',
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--jobs", "-j", help='Number of entries that are deleted in parallel.', type=int, default=4)
+
+    return parser
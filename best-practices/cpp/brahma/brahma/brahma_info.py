@@ -4,15 +4,13 @@
 # Affiliation:  ANYbotics
 
 import argparse
-import os
 
 from brahma.CatkinToolsOptions import CatkinToolsOptions
-from brahma.CatkinWorkspace import CatkinWorkspace
+from brahma.WorkspaceModel import WorkspaceModel
 
 import brahma.log as log
 import brahma.utils as utils
-
-properties = ['source_dir', 'catkin_dir', 'source_file']
+import brahma.workspace_info as workspace_info
 
 
 def run(paths, settings, args):
@@ -25,20 +23,16 @@ def run(paths, settings, args):
     :type settings: BrahmaWorkspaceSettings
     :param args: Additonal Arguments parsed by argparse
     """
-    catkin_options = CatkinToolsOptions(paths.catkin, settings.ros_distro)
-    catkin_ws = CatkinWorkspace()
-    catkin_ws.load(catkin_options)
-
-    if args.property == properties[0]:  # source dir
-        print(paths.source)
-    elif args.property == properties[1]:  # catkin dir
-        print(paths.catkin)
-    elif args.property == properties[2]:  # source file
-        is_zsh = False
-        shell = os.environ.get('SHELL')
-        if shell:
-            is_zsh = shell.endswith("zsh")
-        print(catkin_ws.sourceFile(is_zsh))
+    # Usually answered by workspace_info.printInfo, only load the workspace if the info is missing or outdated
+    info = workspace_info.readWorkspaceInfo(paths.workspace)
+    if info is None:
+        catkin_options = CatkinToolsOptions(paths.catkin, settings.ros_distro, settings.underlayPaths()[0])
+        catkin_ws = WorkspaceModel.active().catkinWorkspace(catkin_options)
+        workspace_info.writeWorkspaceInfo(paths, catkin_ws)
+        info = workspace_info.readWorkspaceInfo(paths.workspace)
+
+    if args.property in workspace_info.properties:
+        print(workspace_info.infoProperty(info, args.property))
 
     exit(0)
 
@@ -51,6 +45,6 @@ def setup_parser():
     """
     parser = argparse.ArgumentParser(prog='brahma info', description='\033[1mbrahma info [args]\033[0m\n Print infos about the workspace.',
                                      formatter_class=argparse.RawTextHelpFormatter)
-    parser.add_argument("property", help=', '.join(properties))
+    parser.add_argument("property", help=', '.join(workspace_info.properties))
 
     return parser
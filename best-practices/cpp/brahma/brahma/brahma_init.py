@@ -11,9 +11,11 @@ from brahma.BrahmaWorkspaceSettings import BrahmaWorkspaceSettings
 from brahma.CatkinToolsOptions import CatkinToolsOptions
 from brahma.CatkinWorkspace import CatkinWorkspace
 
+import brahma.compiler_cache as compiler_cache
 import brahma.git_helpers as git_helpers
 import brahma.log as log
 import brahma.utils as utils
+import brahma.workspace_info as workspace_info
 
 
 def run(paths, settings, args):
@@ -33,6 +35,10 @@ def run(paths, settings, args):
     if not os.path.isdir(os.path.join("/opt/ros/",settings.ros_distro)):
         log.error("ROS version '{}' is not installed. Update the configuration '{}' with an installed ROS version.".format(settings.ros_distro, args.config))
 
+    for underlay in settings.underlays:
+        if not os.path.isdir(underlay):
+            log.error("Underlay '{}' does not exist. Update the configuration '{}'.".format(underlay, args.config))
+
     if not os.path.isdir(paths.catkin):
         log.error("Catkin workspace '{}' does not exist. Can not initialize brahma workspace.".format(paths.catkin))
 
@@ -51,7 +57,9 @@ def init_workspace(paths, settings):
 
     # Init catkin workspace
     log.title('Initializing catkin workspace')
-    catkin_options = CatkinToolsOptions(paths.catkin, settings.ros_distro)
+    catkin_options = CatkinToolsOptions(paths.catkin, settings.ros_distro, settings.underlayPaths()[0])
+    compiler_cache.configureCache(settings)
+    catkin_options.cmake_args += compiler_cache.launcherCMakeArgs(settings)
     catkin_ws = CatkinWorkspace()
     catkin_ws.init(catkin_options)
 
@@ -64,6 +72,9 @@ def init_workspace(paths, settings):
 
     settings.summary()
 
+    # Precompute the answers of 'brahma info'
+    workspace_info.writeWorkspaceInfo(paths, catkin_ws)
+
 
 def setup_parser():
     """
@@ -0,0 +1,68 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import argparse
+
+from brahma.WorkspaceModel import WorkspaceModel
+
+import brahma.log as log
+import brahma.server as server
+
+
+def run(paths, settings, args):
+    """
+    Execute serve step.
+
+    :param paths: Relevant workspace paths
+    :type paths: BrahmaWorkspacePaths
+    :param settings: Workspace settings
+    :type settings: BrahmaWorkspaceSettings
+    :param args: Additional arguments parsed by argparse
+    """
+    if args.stop:
+        log.title('Stop brahma server')
+        if server.stop(paths.workspace):
+            log.info('Stopped the server of workspace {}'.format(paths.workspace))
+        else:
+            log.info('No server is running for workspace {}'.format(paths.workspace))
+        return
+
+    # Load configuration from file
+    settings.load(paths.workspace)
+
+    log.title('Serve workspace {}'.format(paths.workspace))
+    try:
+        model = WorkspaceModel(paths, settings.repository_prune_patterns)
+    except OSError as e:
+        log.error("Can not watch the workspace: {}".format(e))
+    log.info('Watching {} directories for changes of packages, git refs and settings'.format(
+        len(model.watchedDirectories())))
+
+    # Verbs forwarded by other brahma calls run in this process
+    from brahma.main import brahma_main
+    WorkspaceModel.activate(model)
+    try:
+        server.serve(paths, model, lambda argv: brahma_main(argv, forward=False))
+    except KeyboardInterrupt:
+        log.warn('Interrupted by user!')
+    finally:
+        WorkspaceModel.activate(None)
+        model.close()
+
+
+def setup_parser():
+    """
+    Parse serve options.
+
+    :returns: Parser with added arguments for the serve step.
+    """
+    parser = argparse.ArgumentParser(prog='brahma serve',
+                                     description='\033[1mbrahma serve [args]\033[0m\n Keep the workspace model in memory. '
+                                                 'Other brahma calls in this workspace run their verb in the server '
+                                                 'until it is stopped.',
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--stop", help='Stop the server of the workspace.', action='store_true')
+
+    return parser
@@ -5,16 +5,26 @@
 
 import argparse
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 from brahma.BrahmaWorkspacePaths import BrahmaWorkspacePaths
 from brahma.BrahmaWorkspaceSettings import BrahmaWorkspaceSettings
 from brahma.CatkinToolsOptions import CatkinToolsOptions
-from brahma.CatkinWorkspace import CatkinWorkspace
-
+from brahma.InstalledPackageIndex import InstalledPackageIndex, installedPackageCacheFile
+from brahma.LinkManifest import LinkManifest
+from brahma.UpdateState import UpdateState
+from brahma.WorkspaceModel import WorkspaceModel
+
+import brahma.IncludeIndex as IncludeIndex
+import brahma.build_costs as build_costs
+import brahma.compiler_cache as compiler_cache
+import brahma.completion as completion
+import brahma.diff_ignore as diff_ignore
 import brahma.ide.clion as clion
 import brahma.git_helpers as git_helpers
 import brahma.log as log
 import brahma.utils as utils
+import brahma.workspace_info as workspace_info
 
 
 def run(paths, settings, args):
@@ -33,110 +43,150 @@ def run(paths, settings, args):
     # Load configuration from file
     settings.load(paths.workspace)
 
+    # The current directory might vanish when repositories switch branches
+    os.chdir(paths.workspace)
+
+    # Fingerprint of the last successful update, ignored if the update is forced
+    update_state = UpdateState()
+    if not args.force:
+        update_state.load(paths.updateStateFile())
+    settings_hash = utils.hashFile(settings.settingsFile(paths.workspace))
+    installed_packages = InstalledPackageIndex()
+    installed_packages.load(settings.underlayPaths(), installedPackageCacheFile(settings.ros_distro))
+    underlay = installed_packages.fingerprint()
+
+    # Resolved packages of unchanged repositories can only be reused if the settings did not change
+    reusable_state = update_state if settings_hash == update_state.settings_hash else UpdateState()
+
     log.title('Initializing git repositories')
+    jobs = args.jobs if args.jobs is not None else settings.git_jobs
 
     # Clone missing repositories
-    git_helpers.cloneOrLinkRepositories(settings.git_repositories, paths.source)
+    git_helpers.cloneOrLinkRepositories(settings.git_repositories, paths.source, settings.clone_options, jobs)
 
     # Setup git repos from folder
-    repos = git_helpers.getRepositories(paths.source)
+    repos = git_helpers.getRepositories(paths.source, settings.repository_prune_patterns)
     for repo in repos:
         repo_rel_path = os.path.relpath(repo, paths.source)
         if not repo_rel_path in settings.git_repositories.keys():
             log.warn("Untracked repository '{}' found. Not resolving diff.".format(os.path.basename(repo)))
 
+    # Update repositories and look up their diff to the base branch (only if there is a base_branch)
+    if settings.complete_overlay:
+        fingerprints = getRepositoryFingerprints(settings.git_repositories, paths.source)
+        diffs = dict()
+    else:
+        fingerprints, diffs = updateRepositories(settings.git_repositories, paths.source, args, jobs,
+                                                 reusable_state)
+
+    # Crawl the source directory once all repositories are updated, all following steps use the package index
+    package_index = WorkspaceModel.active().packageIndex(paths.source, paths.packageCacheFile())
+    log.info('Indexed {} packages in {} ({} manifests parsed)'.format(len(package_index), paths.source,
+                                                                      package_index.parsed_manifests))
+    manifests = package_index.fingerprint()
+
+    # Skip the update if neither the repositories, the manifests, the settings nor the installed packages changed
+    link_manifest = LinkManifest()
+    link_manifest.load(paths.linkManifestFile(), paths.catkinSource())
+    linked_packages = set(link_manifest.links.keys())
+    if update_state.isUpToDate(settings_hash, fingerprints, underlay, manifests) and \
+            linked_packages == set(update_state.catkin_packages) and os.path.isfile(paths.packageNamesFile()):
+        log.title('Workspace is up to date')
+        log.info('Nothing changed since the last update. Use --force to update anyway.')
+        return
+
+    completion.writePackageNames(paths.packageNamesFile(), package_index.packages().keys())
+
+    # Load catkin workspace, its logs hold the build durations of the packages
+    catkin_options = CatkinToolsOptions(paths.catkin, settings.ros_distro, settings.underlayPaths()[0])
+    catkin_ws = WorkspaceModel.active().catkinWorkspace(catkin_options)
+    costs = build_costs.updateBuildCosts(paths.buildCostsFile(), catkin_ws.logSpace())
+
+    # Launch the compilers through the compiler cache shared by all workspaces
+    # Launchers configured by the user are kept, brahma only replaces or removes the ones it wrote
+    compiler_cache.configureCache(settings)
+    cmake_args = catkin_ws.cmakeArgs()
+    launcher_args = []
+    if settings.compiler_cache != 'none':
+        if any(compiler_cache.setsCompilerLauncher(arg) and not compiler_cache.isLauncherCMakeArg(arg)
+               for arg in cmake_args):
+            log.warn("The catkin profile sets its own compiler launchers, compiler cache '{}' is not used.".format(
+                settings.compiler_cache))
+        else:
+            launcher_args = compiler_cache.launcherCMakeArgs(settings)
+    if (launcher_args or any(compiler_cache.isLauncherCMakeArg(arg) for arg in cmake_args)) and \
+            catkin_ws.replaceCMakeArgs(compiler_cache.isLauncherCMakeArg, launcher_args) and \
+            os.path.isdir(catkin_ws.buildSpace()) and os.listdir(catkin_ws.buildSpace()):
+        log.warn("The compiler launchers changed, run 'brahma_catkin build --force-cmake' to apply them to the "
+                 "packages that were already built.")
+
+    # Fingerprint of this update, saved once the update succeeded
+    new_update_state = UpdateState()
+
     # Package collections needed for catkin and ide folder update
     catkin_packages = dict()
+    # Packages that are built again after this update
+    rebuild_packages = set()
 
     # Gather filter packages information
     if settings.filter_packages:
         log.title('Initialize filter packages')
         log.info('Resolve dependencies of the filter packages ...')
-        filter_packages = utils.getPackagesFromPackageNames(settings.filter_packages, paths.source)
-        filter_packages_tree = utils.getRecursiveUpstreamDependencies(filter_packages, paths.source)
+        filter_packages = utils.getPackagesFromPackageNames(settings.filter_packages, package_index)
+        filter_packages_tree = utils.getRecursiveUpstreamDependencies(filter_packages, package_index)
+        log.info('Resolved {} upstream packages of the filter packages'.format(len(filter_packages_tree)))
 
     # Handle complete overlay
     if settings.complete_overlay:
         # Complete overlay - Add all packages to the catkin workspace.
         log.title('Resolve complete overlay')
-        all_packages = utils.getAllPackagesFromDirectory(paths.source)
-        catkin_packages = all_packages
+        catkin_packages = package_index.packages()
+        for repo, fingerprint in fingerprints.items():
+            new_update_state.setRepository(repo, fingerprint, [])
 
     else:
-        # Resolve packages from diff (only if there is a base_branch)
+        # Resolve packages from diff
         diff_packages = dict()
-        for repo, repo_info in settings.git_repositories.items():
-            log.title("Process repository '{}'".format(repo))
-
-            repo_url = repo_info[0]
-            repo_base_branch = repo_info[1]
-            if repo_base_branch:
-                repo_path = os.path.join(paths.source, repo)
-                git_repo = git_helpers.getRepository(repo_path)
-                os.chdir(repo_path)
-
-                # Pull branches
-                if args.pull:
-                    # Fetch remotes
-                    for remote in git_repo.remotes:
-                        remote.fetch()
-
-                    if git_repo.head.is_detached:
-                        log.warn("HEAD is detached for repository '{}'. Not pulling latest changes.".format(repo))
-                    else:
-                        current_branch = git_repo.active_branch.name
-
-                        stash_name = "brahma_update"
-                        log.status("Stash")
-                        log.info("Stash changes of branch '{}'.".format(current_branch))
-                        stash_return = git_helpers.stashChanges(git_repo, stash_name)
-                        log.info(stash_return)
-                        log.status("Pull")
-                        if current_branch != repo_base_branch:
-                            log.info("Update base branch '{}'.".format(repo_base_branch))
-                            git_helpers.pullBranch(git_repo, repo_base_branch)
-                        log.info("Update current branch '{}'.".format(current_branch))
-                        log.info(git_helpers.checkoutBranch(git_repo, current_branch, True))
-                        if current_branch != repo_base_branch and args.pull_and_merge:
-                            log.status("Merge")
-                            log.info("Merge base branch '{}' into current branch '{}'.".format(repo_base_branch,
-                                                                                               current_branch))
-                            log.info(git_helpers.mergeBranch(git_repo, repo_base_branch))
-                        if git_helpers.hasStash(stash_return, stash_name):
-                            log.status("Re-apply stash")
-                            log.info("Re-apply stashed changes of branch '{}'.".format(current_branch))
-                            log.info(git_helpers.popStash(git_repo))
-                else:
-                    # Check if base branch exists
-                    if repo_base_branch not in git_repo.refs:
-                        log.status("Checkout")
-                        log.info('Initial checkout of base branch {}.'.format(repo_base_branch))
-                        current_branch = git_repo.active_branch.name
-                        git_helpers.checkoutBranch(git_repo, repo_base_branch, False)
-                        git_helpers.checkoutBranch(git_repo, current_branch, False)
-
-                log.status("Check for deleted headers")
-                utils.warnIfDeletedHeaders(git_repo, repo_base_branch)
-
-                log.status("Resolve 'git diff'")
-                diff = utils.getDiffToBaseBranch(git_repo, repo_base_branch)
-                packages = utils.getPackagesFromFileList(diff, paths.source)
+        # Changed files of the diff packages and the diff packages whose changed files are unknown
+        changed_files = []
+        unknown_change_packages = set()
+        if any(repo_info[1] for repo_info in settings.git_repositories.values()):
+            log.title('Resolve packages from diff')
+        for repo in settings.git_repositories:
+            if repo in diffs:
+                files, ignored_files = diff_ignore.filterIgnoredFiles(diffs[repo], package_index,
+                                                                      settings.diff_ignore_patterns)
+                diff_ignore.reportIgnoredFiles(ignored_files, repo, os.path.realpath(os.path.join(paths.source, repo)))
+                packages = utils.getPackagesFromFileList(files, package_index)
+                if packages:
+                    log.info("Resolved {} packages from the diff of repository '{}'".format(len(packages), repo))
+                    log.packages(packages)
+            else:
+                files = reusable_state.repositoryFiles(repo, fingerprints.get(repo))
+                package_names = reusable_state.repositoryPackages(repo, fingerprints.get(repo)) or []
+                packages = utils.getPackagesFromPackageNames(package_names, package_index) if package_names else {}
                 if packages:
-                    log.info('Resolved {} packages from the diff'.format(len(packages)))
+                    log.info("Reused {} packages of the unchanged repository '{}'".format(len(packages), repo))
                     log.packages(packages)
+            if files is None:
+                unknown_change_packages.update(packages.keys())
+            else:
+                changed_files.extend(files)
+            if repo in fingerprints:
+                new_update_state.setRepository(repo, fingerprints[repo], packages.keys(),
+                                               files if settings.header_aware_downstream else None)
 
-                diff_keys = set(diff_packages.keys())
-                keys = set(packages.keys())
-                if diff_keys.intersection(keys):
-                    log.error("Multiple git repositories contain the same packages [{}]" +
-                              ', '.join(p.name for p in diff_keys.intersection(keys)))
-                diff_packages.update(packages)
+            duplicate_packages = set(diff_packages.keys()) & set(packages.keys())
+            if duplicate_packages:
+                log.error("Multiple git repositories contain the same packages [{}]".format(
+                    ', '.join(sorted(duplicate_packages))))
+            diff_packages.update(packages)
 
         # Resolve upstream packages
         upstream_packages = dict()
         if settings.include_upstream_dependencies and diff_packages:
             log.title('Resolve upstream dependencies')
-            upstream_packages = utils.getRecursiveUpstreamDependencies(diff_packages, paths.source)
+            upstream_packages = utils.getRecursiveUpstreamDependencies(diff_packages, package_index)
             log.info('Resolved {} recursive upstream packages'.format(len(upstream_packages)))
             log.packages(upstream_packages)
 
@@ -144,24 +194,38 @@ def run(paths, settings, args):
         downstream_packages = dict()
         if settings.include_downstream_dependencies and diff_packages:
             log.title('Resolve downstream dependencies')
-            downstream_packages = utils.getRecursiveDownstreamDependencies(diff_packages, paths.source)
+            downstream_packages = utils.getRecursiveDownstreamDependencies(diff_packages, package_index)
+
+            # Only keep downstream packages affected by the changed headers
+            if settings.header_aware_downstream and downstream_packages:
+                downstream_packages = limitDownstreamToIncludingPackages(
+                    downstream_packages, diff_packages, changed_files, unknown_change_packages, package_index,
+                    paths.includeCacheFile())
 
             # Filter downstream packages
             if settings.filter_packages and settings.only_filter_downstream_packages and downstream_packages:
                 log.info('Filter downstream packages')
                 downstream_packages = utils.getFilteredPackages(downstream_packages, filter_packages,
-                                                                filter_packages_tree)
+                                                                package_index)
 
             log.info('Resolved {} recursive downstream packages'.format(len(downstream_packages)))
             log.packages(downstream_packages)
 
+            # Limit downstream packages to the build budget
+            if settings.downstream_build_budget and downstream_packages:
+                downstream_packages = limitDownstreamPackages(
+                    downstream_packages, diff_packages, settings.downstream_build_budget * 60, costs, package_index,
+                    set(filter_packages) | set(filter_packages_tree) if settings.filter_packages else set())
+
+        rebuild_packages.update(diff_packages.keys(), downstream_packages.keys())
+
         # Get dictionary of all packages
         catkin_packages = {**diff_packages, **upstream_packages, **downstream_packages}
 
     # Filter all packages
     if settings.filter_packages and not settings.only_filter_downstream_packages and catkin_packages:
         log.title('Filter packages')
-        catkin_packages = utils.getFilteredPackages(catkin_packages, filter_packages, filter_packages_tree)
+        catkin_packages = utils.getFilteredPackages(catkin_packages, filter_packages, package_index)
         log.info('{} packages remaining after filtering'.format(len(catkin_packages)))
         log.packages(catkin_packages)
 
@@ -169,7 +233,7 @@ def run(paths, settings, args):
     explicit_packages = dict()
     if settings.explicit_packages:
         log.title('Resolve explicit packages')
-        explicit_packages = utils.getPackagesFromPackageNames(settings.explicit_packages, paths.source)
+        explicit_packages = utils.getPackagesFromPackageNames(settings.explicit_packages, package_index)
         log.info('Resolved {} explicit packages'.format(len(explicit_packages)))
         log.packages(explicit_packages)
         catkin_packages.update(explicit_packages)
@@ -177,8 +241,10 @@ def run(paths, settings, args):
     # Identify missing upstream packages
     if catkin_packages:
         log.title('Resolve missing upstream dependencies')
-        install_path = "/opt/ros/" + settings.ros_distro + "/share"
-        missing_packages = utils.getNotInstalledUpstreamDependencies(catkin_packages, paths.source, install_path)
+        log.info('Indexed {} packages installed in {}'.format(len(installed_packages),
+                                                             ', '.join(installed_packages.prefixes)))
+        missing_packages = utils.getNotInstalledUpstreamDependencies(catkin_packages, package_index,
+                                                                     installed_packages)
         if missing_packages:
             log.info('Resolved {} missing upstream packages'.format(len(missing_packages)))
             log.packages(missing_packages)
@@ -188,32 +254,261 @@ def run(paths, settings, args):
                 log.warn(
                     'Configuration for "include_missing_dependencies" is set to "false". Will not add missing dependencies.')
 
-    # Load catkin workspace
-    catkin_options = CatkinToolsOptions(paths.catkin, settings.ros_distro)
-    catkin_ws = CatkinWorkspace()
-    catkin_ws.load(catkin_options)
+    workspace_info.writeWorkspaceInfo(paths, catkin_ws)
 
     if settings.ide == "clion":
         log.title('Update clion')
         log.info('Create project files.')
-        clion.setupCLionProject(paths.source, paths.source, os.path.basename(paths.workspace),
+        clion.setupCLionProject(package_index, paths.source, os.path.basename(paths.workspace),
                                 catkin_packages, catkin_ws)
         log.info('Setup clang tooling.')
-        clion.createClangToolsSymlinks(paths.source)
+        clion.createClangToolsSymlinks(package_index, paths.source)
 
     # Complete overlay adds all packages to workspace
     if settings.complete_overlay:
-        catkin_packages = all_packages
+        catkin_packages = package_index.packages()
 
     # Update and clean packages
     log.title('Update catkin workspace')
-    utils.updateAndCleanPackages(catkin_packages, catkin_ws, paths.source)
+    utils.updateAndCleanPackages(catkin_packages, catkin_ws, package_index, paths.trashDirectory(),
+                                 paths.linkManifestFile())
     log.info('Adding {} packages to the workspace'.format(len(catkin_packages)))
     log.packages(catkin_packages)
 
+    # Changed packages, their downstream dependencies and the newly linked packages are built again
+    rebuild_packages = (rebuild_packages | (set(catkin_packages) - linked_packages)) & set(catkin_packages)
+    rebuild_cost, unknown_packages = build_costs.estimateCost(rebuild_packages, costs)
+    log.info('Estimated rebuild cost: {} for {} packages{}'.format(
+        build_costs.formatDuration(rebuild_cost), len(rebuild_packages),
+        ' ({} without build history)'.format(len(unknown_packages)) if unknown_packages else ''))
+
     # Save workspace configuration
     settings.save(paths.workspace)
 
+    # Save the fingerprint of this update
+    new_update_state.settings_hash = utils.hashFile(settings.settingsFile(paths.workspace))
+    new_update_state.underlay = underlay
+    new_update_state.manifests = manifests
+    new_update_state.catkin_packages = sorted(catkin_packages.keys())
+    new_update_state.save(paths.updateStateFile())
+
+
+def limitDownstreamToIncludingPackages(downstream_packages, changed_packages, changed_files, unknown_change_packages,
+                                       package_index, cache_file):
+    """
+    Limit the downstream packages to the ones affected by the changes. Changes other than to existing C and C++ files
+    (e.g. CMakeLists.txt, messages or removed headers) affect all downstream packages. Changed source files affect no
+    downstream package and changed headers affect the packages (transitively) including them.
+
+    :param downstream_packages: Downstream dependencies of the changed packages
+    :type downstream_packages: dict(str,catkin_pkg.Package)
+    :param changed_packages: Changed packages
+    :type changed_packages: dict(str,catkin_pkg.Package)
+    :param changed_files: Absolute paths of the changed files
+    :type changed_files: list(str)
+    :param unknown_change_packages: Names of the changed packages whose changed files are unknown
+    :type unknown_change_packages: set(str)
+    :param package_index: Index of the packages in the source directory
+    :type package_index: PackageIndex
+    :param cache_file: Path of the include cache
+    :type cache_file: str
+    :returns: Affected downstream packages
+    :rtype: dict(str,catkin_pkg.Package)
+    """
+    interface_packages = set(unknown_change_packages)
+    changed_headers = dict()
+    for file in changed_files:
+        package = package_index.packageFromFile(file)
+        if package is None or package.name not in changed_packages:
+            continue
+        if not IncludeIndex.isSourceFile(file) or not os.path.isfile(file):
+            interface_packages.add(package.name)
+        elif IncludeIndex.isHeaderFile(file):
+            changed_headers.setdefault(package.name, []).append(file)
+
+    affected_packages = set(package_index.dependencyGraph().downstream(interface_packages))
+    headers = [header for name, headers in changed_headers.items() if name not in interface_packages
+               for header in headers]
+    if headers:
+        include_index = IncludeIndex.IncludeIndex()
+        include_index.load(package_index, set(changed_packages) | set(downstream_packages), cache_file)
+        log.info('Indexed the includes of {} files ({} parsed)'.format(len(include_index),
+                                                                       include_index.parsed_files))
+        affected_packages.update(include_index.includingPackages(headers))
+
+    log.info('{} of {} downstream packages include a changed header or depend on a package with interface '
+             'changes'.format(len(affected_packages & set(downstream_packages)), len(downstream_packages)))
+    return dict((name, package) for name, package in downstream_packages.items() if name in affected_packages)
+
+
+def limitDownstreamPackages(downstream_packages, changed_packages, budget, costs, package_index, priority_packages):
+    """
+    Limit the downstream packages to the ones that can be built within the budget (see build_costs.selectWithinBudget).
+
+    :param downstream_packages: Downstream dependencies of the changed packages
+    :type downstream_packages: dict(str,catkin_pkg.Package)
+    :param changed_packages: Changed packages
+    :type changed_packages: dict(str,catkin_pkg.Package)
+    :param budget: Build budget in seconds
+    :type budget: float
+    :param costs: Build duration in seconds per package name
+    :type costs: dict(str,float)
+    :param package_index: Index of the packages in the source directory
+    :type package_index: PackageIndex
+    :param priority_packages: Names of the packages to keep first
+    :type priority_packages: set(str)
+    :returns: Downstream packages within the budget
+    :rtype: dict(str,catkin_pkg.Package)
+    """
+    if not costs:
+        log.warn('No build history available to apply the downstream build budget. Build the workspace once.')
+        return downstream_packages
+    total_cost, _ = build_costs.estimateCost(downstream_packages, costs)
+    selected_packages, selected_cost = build_costs.selectWithinBudget(
+        set(downstream_packages), changed_packages.keys(), priority_packages, costs, budget,
+        package_index.dependencyGraph())
+    skipped_packages = set(downstream_packages) - selected_packages
+    if skipped_packages:
+        log.warn('Skipped {} downstream packages exceeding the build budget of {} (keeping an estimated {} of {})'
+                 .format(len(skipped_packages), build_costs.formatDuration(budget),
+                         build_costs.formatDuration(selected_cost), build_costs.formatDuration(total_cost)))
+        log.packages(skipped_packages)
+    return dict((name, downstream_packages[name]) for name in selected_packages)
+
+
+def updateRepositories(repositories, source_dir, args, jobs, update_state):
+    """
+    Update the repositories concurrently and look up their diff to the base branch.
+    The log output is buffered per repository and printed in the order of 'repositories'.
+
+    :param repositories: Repository information
+    :type repositories: dict(str, pair(str,str))
+    :param source_dir: Directory containing the git repositories
+    :type source_dir: str
+    :param args: Additonal Arguments parsed by argparse
+    :param jobs: Maximum number of repositories that are processed at the same time
+    :type jobs: int
+    :param update_state: State of the last update, the diff of unchanged repositories is not resolved again
+    :type update_state: UpdateState
+    :returns: Fingerprints of all existing repositories and the diff to the base branch of all changed repositories
+              with a base branch
+    :rtype: tuple(dict(str,str),dict(str,list(str)))
+    """
+    fingerprints = dict()
+    diffs = dict()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = [(repo, executor.submit(log.callBuffered, updateRepository, repo, os.path.join(source_dir, repo),
+                                          repo_info[1], args, update_state))
+                   for repo, repo_info in repositories.items()]
+        for repo, future in futures:
+            records, result, exception = future.result()
+            log.replay(records)
+            if exception is not None:
+                raise exception
+            fingerprint, diff = result
+            if fingerprint is not None:
+                fingerprints[repo] = fingerprint
+            if diff is not None:
+                diffs[repo] = diff
+    return fingerprints, diffs
+
+
+def getRepositoryFingerprints(repositories, source_dir):
+    """
+    :param repositories: Repository information
+    :type repositories: dict(str, pair(str,str))
+    :param source_dir: Directory containing the git repositories
+    :type source_dir: str
+    :returns: Fingerprints of all existing repositories
+    :rtype: dict(str,str)
+    """
+    fingerprints = dict()
+    for repo, repo_info in repositories.items():
+        repo_path = os.path.join(source_dir, repo)
+        if os.path.isdir(repo_path):
+            fingerprints[repo] = git_helpers.getRepositoryFingerprint(WorkspaceModel.active().repository(repo_path),
+                                                                      repo_info[1])
+    return fingerprints
+
+
+def updateRepository(repo, repo_path, repo_base_branch, args, update_state):
+    """
+    Pull (and merge) the branches of a repository and look up its diff to the base branch.
+    Does not change the current directory, such that multiple repositories can be updated at the same time.
+
+    :param repo: Name of the repository
+    :type repo: str
+    :param repo_path: Path of the repository
+    :type repo_path: str
+    :param repo_base_branch: Base branch of the repository
+    :type repo_base_branch: str
+    :param args: Additonal Arguments parsed by argparse
+    :param update_state: State of the last update, the diff is not resolved if the repository did not change
+    :type update_state: UpdateState
+    :returns: Fingerprint of the repository ('None' if it does not exist) and the list of edited files ('None' if the
+              repository has no base branch or did not change since the last update)
+    :rtype: tuple(str,list(str))
+    """
+    log.title("Process repository '{}'".format(repo))
+    if not os.path.isdir(repo_path):
+        return None, None
+    if not repo_base_branch:
+        return git_helpers.getRepositoryFingerprint(WorkspaceModel.active().repository(repo_path), None), None
+
+    git_repo = WorkspaceModel.active().repository(repo_path)
+
+    # Pull branches
+    if args.pull:
+        # Fetch remotes
+        for remote in git_repo.remotes:
+            remote.fetch()
+
+        if git_repo.head.is_detached:
+            log.warn("HEAD is detached for repository '{}'. Not pulling latest changes.".format(repo))
+        else:
+            current_branch = git_repo.active_branch.name
+
+            stash_name = "brahma_update"
+            log.status("Stash")
+            log.info("Stash changes of branch '{}'.".format(current_branch))
+            stash_return = git_helpers.stashChanges(git_repo, stash_name)
+            log.info(stash_return)
+            log.status("Pull")
+            if current_branch != repo_base_branch:
+                log.info("Update base branch '{}'.".format(repo_base_branch))
+                git_helpers.pullBranch(git_repo, repo_base_branch)
+            log.info("Update current branch '{}'.".format(current_branch))
+            log.info(git_helpers.checkoutBranch(git_repo, current_branch, True))
+            if current_branch != repo_base_branch and args.pull_and_merge:
+                log.status("Merge")
+                log.info("Merge base branch '{}' into current branch '{}'.".format(repo_base_branch,
+                                                                                   current_branch))
+                log.info(git_helpers.mergeBranch(git_repo, repo_base_branch))
+            if git_helpers.hasStash(stash_return, stash_name):
+                log.status("Re-apply stash")
+                log.info("Re-apply stashed changes of branch '{}'.".format(current_branch))
+                log.info(git_helpers.popStash(git_repo))
+    else:
+        # Check if base branch exists
+        if repo_base_branch not in git_repo.refs:
+            log.status("Checkout")
+            log.info('Initial checkout of base branch {}.'.format(repo_base_branch))
+            current_branch = git_repo.active_branch.name
+            git_helpers.checkoutBranch(git_repo, repo_base_branch, False)
+            git_helpers.checkoutBranch(git_repo, current_branch, False)
+
+    fingerprint = git_helpers.getRepositoryFingerprint(git_repo, repo_base_branch)
+    if update_state.repositoryPackages(repo, fingerprint) is not None:
+        log.info("Repository unchanged since the last update.")
+        return fingerprint, None
+
+    log.status("Resolve 'git diff'")
+    change_set = utils.getDiffToBaseBranch(git_repo, repo_base_branch)
+
+    log.status("Check for deleted headers")
+    utils.warnIfDeletedHeaders(change_set)
+    return fingerprint, change_set.files()
+
 
 def setup_parser():
     """
@@ -230,4 +525,10 @@ def setup_parser():
         "--pull-and-merge",
         help='Pull changes from the remote for the current branch and the base branch. Merge base branch into the current branch.',
         action='store_true')
+    parser.add_argument(
+        "--jobs", "-j", help='Number of repositories that are processed in parallel (overrides the configuration).',
+        type=int, default=None)
+    parser.add_argument(
+        "--force", "-f", help='Update the workspace even if nothing changed since the last update.',
+        action='store_true')
     return parser
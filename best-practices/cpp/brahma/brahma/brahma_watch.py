@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import argparse
+import copy
+import os
+import select
+import sys
+import time
+
+from brahma.WorkspaceModel import WorkspaceModel
+
+import brahma.brahma_update as brahma_update
+import brahma.log as log
+import brahma.timing as timing
+
+
+def run(paths, settings, args):
+    """
+    Execute watch step.
+
+    :param paths: Relevant workspace paths
+    :type paths: BrahmaWorkspacePaths
+    :param settings: Workspace settings
+    :type settings: BrahmaWorkspaceSettings
+    :param args: Additional arguments parsed by argparse
+    """
+    # Every update loads the workspace settings on top of the default configuration
+    default_settings = copy.deepcopy(settings)
+    settings.load(paths.workspace)
+
+    log.title('Watch workspace {}'.format(paths.workspace))
+    try:
+        model = WorkspaceModel(paths, settings.repository_prune_patterns)
+    except OSError as e:
+        log.error("Can not watch the workspace: {}".format(e))
+    if not model.isWatching():
+        log.error("Can not watch the workspace.")
+    log.info('Watching {} directories for changes of packages, git refs and settings'.format(
+        len(model.watchedDirectories())))
+
+    update_args = argparse.Namespace(pull=False, pull_and_merge=False, jobs=args.jobs, force=False)
+    WorkspaceModel.activate(model)
+    try:
+        updateWorkspace(paths, default_settings, update_args, 'Initial update')
+        while True:
+            changes = waitForChanges(model, paths, args.debounce)
+            updateWorkspace(paths, default_settings, update_args, 'Update after {} changes'.format(len(changes)))
+    finally:
+        WorkspaceModel.activate(None)
+        model.close()
+
+
+def waitForChanges(model, paths, debounce):
+    """
+    Wait for changes of the workspace. Changes are batched until no change happened for 'debounce' seconds.
+
+    :param model: Watching workspace model
+    :type model: WorkspaceModel
+    :param paths: Relevant workspace paths
+    :type paths: BrahmaWorkspacePaths
+    :param debounce: Quiet period in seconds
+    :type debounce: float
+    :returns: Paths of the changed entries
+    :rtype: list(str)
+    """
+    # Changes might have been collected while updating
+    changes = _takeChanges(model, paths)
+    while True:
+        ready, _, _ = select.select([model], [], [], debounce if changes else None)
+        if not ready:
+            return changes
+        changes.extend(_takeChanges(model, paths))
+
+
+def updateWorkspace(paths, default_settings, update_args, reason):
+    """
+    Run an update of the workspace. Unchanged repositories and the unchanged parts of the workspace model are reused,
+    errors are reported without stopping to watch.
+
+    :param paths: Relevant workspace paths
+    :type paths: BrahmaWorkspacePaths
+    :param default_settings: Default configuration, the workspace settings are loaded on top
+    :type default_settings: BrahmaWorkspaceSettings
+    :param update_args: Arguments of the update step
+    :param reason: Reason of the update
+    :type reason: str
+    """
+    log.title(reason)
+    start = time.perf_counter()
+    try:
+        brahma_update.run(paths, copy.deepcopy(default_settings), update_args)
+    except SystemExit as e:
+        print(e.code, file=sys.stderr)
+        log.warn('Update failed, waiting for further changes.')
+        return
+    finally:
+        # Only the duration of every update is reported, a watch runs indefinitely
+        timing.reset()
+    log.info('Updated the workspace in {:.2f} s, waiting for changes.'.format(time.perf_counter() - start))
+
+
+def setup_parser():
+    """
+    Parse watch options.
+
+    :returns: Parser with added arguments for the watch step.
+    """
+    parser = argparse.ArgumentParser(prog='brahma watch',
+                                     description='\033[1mbrahma watch [args]\033[0m\n Watch the source repositories and '
+                                                 'update the workspace whenever branches, commits or packages change.',
+                                     formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--debounce", help='Seconds without changes before the workspace is updated.', type=float,
+                        default=1.0)
+    parser.add_argument("--jobs", "-j", help='Number of repositories that are processed in parallel.', type=int,
+                        default=None)
+
+    return parser
+
+
+def _takeChanges(model, paths):
+    # The IDE project files in the root of the source directory are written by the update itself. Git refreshes the
+    # index when the update reads the status, staging alone does not change the overlay either.
+    return [change for change in model.takeChanges()
+            if os.path.dirname(change) != paths.source and not change.endswith(os.path.join('.git', 'index'))]
@@ -0,0 +1,237 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+# Build costs of the packages, measured from the logs catkin writes for every build stage of a package
+# (<log space>/<package>/build.<stage>.<index>.log). The index counts the builds per stage, so the indices of the stages
+# of one build differ once a stage is skipped (e.g. 'cmake' in incremental builds). The stage logs of a build are
+# written one after the other when the stages finish: ordered by modification time, a build ends before a stage
+# repeats. The time between the first and the last finished stage of the last full build (running 'cmake' and 'make')
+# is the estimated build duration of the package. Incremental builds would underestimate the cost of a rebuild.
+
+import json
+import os
+import re
+import statistics
+from collections import deque
+
+import brahma.log as log
+import brahma.timing as timing
+
+# Bump if the layout of the cost file changes
+BUILD_COSTS_VERSION = 2
+
+_STAGE_LOG = re.compile(r'^build\.(?P<stage>.+)\.(?P<index>\d+)\.log$')
+# Stages run by every full build of a package
+_FULL_BUILD_STAGES = {'cmake', 'make'}
+
+
+def readBuildDuration(package_log_dir):
+    """
+    Estimate the duration of the last full build of a package from the modification times of its stage logs.
+
+    :param package_log_dir: Log directory of the package
+    :type package_log_dir: str
+    :returns: Duration in seconds, 'None' if no full build is logged
+    :rtype: float
+    """
+    stage_logs = []
+    try:
+        with os.scandir(package_log_dir) as entries:
+            for entry in entries:
+                match = _STAGE_LOG.match(entry.name)
+                if match and not entry.is_symlink():
+                    stage_logs.append((entry.stat().st_mtime, int(match.group('index')), match.group('stage')))
+    except OSError:
+        return None
+
+    # Split the stage logs into builds, a build ends before a stage repeats
+    builds = []
+    stages = None
+    for mtime, _, stage in sorted(stage_logs):
+        if stages is None or stage in stages:
+            stages = dict()
+            builds.append(stages)
+        stages[stage] = mtime
+    for stages in reversed(builds):
+        if _FULL_BUILD_STAGES <= set(stages):
+            return max(stages.values()) - min(stages.values())
+    return None
+
+
+@timing.timed()
+def updateBuildCosts(cost_file, log_space):
+    """
+    Update the stored build costs with the builds logged since the last update. Only the log directories of packages
+    that were built again are read. Costs of packages whose logs were removed are kept.
+
+    :param cost_file: Path of the cost file
+    :type cost_file: str
+    :param log_space: Catkin log space
+    :type log_space: str
+    :returns: Build duration in seconds per package name
+    :rtype: dict(str,float)
+    """
+    packages = loadBuildCosts(cost_file)
+    changed = False
+    try:
+        entries = list(os.scandir(log_space))
+    except OSError:
+        entries = []
+    for entry in entries:
+        if not entry.is_dir(follow_symlinks=False):
+            continue
+        stat = entry.stat(follow_symlinks=False)
+        signature = [stat.st_mtime_ns, stat.st_ino]
+        if packages.get(entry.name, {}).get('signature') == signature:
+            continue
+        seconds = readBuildDuration(entry.path)
+        if seconds is not None:
+            packages[entry.name] = {'seconds': seconds, 'signature': signature}
+            changed = True
+    if changed:
+        saveBuildCosts(cost_file, packages)
+    return dict((name, package['seconds']) for name, package in packages.items())
+
+
+def loadBuildCosts(cost_file):
+    """
+    :param cost_file: Path of the cost file
+    :type cost_file: str
+    :returns: Build duration and log directory signature per package name, empty if there is no valid cost file
+    :rtype: dict(str,dict)
+    """
+    try:
+        with open(cost_file, 'r') as f:
+            costs = json.load(f)
+        if costs.get('version') == BUILD_COSTS_VERSION:
+            return costs['packages']
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    return dict()
+
+
+def saveBuildCosts(cost_file, packages):
+    """
+    Atomically replace the cost file.
+
+    :param cost_file: Path of the cost file
+    :type cost_file: str
+    :param packages: Build duration and log directory signature per package name
+    :type packages: dict(str,dict)
+    """
+    tmp_file = cost_file + '.tmp'
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump({'version': BUILD_COSTS_VERSION, 'packages': packages}, f, sort_keys=True)
+        os.replace(tmp_file, cost_file)
+    except OSError as e:
+        log.warn("Could not write build costs {}: {}".format(cost_file, e))
+
+
+def estimateCost(package_names, costs):
+    """
+    :param package_names: Names of the packages to build
+    :type package_names: iterable(str)
+    :param costs: Build duration in seconds per package name
+    :type costs: dict(str,float)
+    :returns: Summed build duration of the packages with a history in seconds and the names of the packages without
+    :rtype: tuple(float,set(str))
+    """
+    package_names = set(package_names)
+    unknown = set(name for name in package_names if name not in costs)
+    return sum(costs[name] for name in package_names - unknown), unknown
+
+
+def selectWithinBudget(candidates, changed_packages, priority_packages, costs, budget, dependency_graph):
+    """
+    Select downstream packages until their estimated build cost reaches the budget. A package is only selected
+    together with its dependencies among the candidates, such that it is built against the changed packages.
+    Packages of 'priority_packages' come first, then packages on the critical path: ordered by the cost of the longest
+    dependency chain among the candidates passing through them, which bounds the duration of a parallel build. Ties
+    are broken by the distance from the changed packages, cheaper ones first. Packages without build history are
+    estimated with the median cost.
+
+    :param candidates: Names of the downstream packages
+    :type candidates: set(str)
+    :param changed_packages: Names of the changed packages the candidates depend on
+    :type changed_packages: iterable(str)
+    :param priority_packages: Names of the packages to select first (e.g. the filter package tree)
+    :type priority_packages: set(str)
+    :param costs: Build duration in seconds per package name
+    :type costs: dict(str,float)
+    :param budget: Build budget in seconds
+    :type budget: float
+    :param dependency_graph: Dependency graph containing the candidates
+    :type dependency_graph: DependencyGraph
+    :returns: Names of the selected packages and their estimated build cost in seconds
+    :rtype: tuple(set(str),float)
+    """
+    known_costs = [costs[name] for name in candidates if name in costs] or list(costs.values()) or [0.0]
+    default_cost = statistics.median(known_costs)
+
+    def cost(name):
+        return costs.get(name, default_cost)
+
+    # Distance of every candidate from the changed packages
+    distances = dict()
+    queue = deque((name, 0) for name in changed_packages)
+    while queue:
+        name, distance = queue.popleft()
+        for dependent in dependency_graph.dependents(name):
+            if dependent in candidates and dependent not in distances:
+                distances[dependent] = distance + 1
+                queue.append((dependent, distance + 1))
+
+    # Cost of the longest chain of candidates ending at (upstream) and starting from (downstream) every candidate
+    order = [name for name in dependency_graph.topologicalOrder() if name in candidates]
+    upstream_chains = dict()
+    for name in order:
+        upstream_chains[name] = cost(name) + max([upstream_chains[dependency]
+                                                  for dependency in dependency_graph.dependencies(name)
+                                                  if dependency in candidates] or [0.0])
+    downstream_chains = dict()
+    for name in reversed(order):
+        downstream_chains[name] = cost(name) + max([downstream_chains[dependent]
+                                                    for dependent in dependency_graph.dependents(name)
+                                                    if dependent in candidates] or [0.0])
+
+    def chain(name):
+        return upstream_chains.get(name, 0.0) + downstream_chains.get(name, 0.0) - cost(name)
+
+    selected = set()
+    spent = 0.0
+    for name in sorted(candidates, key=lambda name: (name not in priority_packages, -chain(name),
+                                                     distances.get(name, len(candidates)), cost(name), name)):
+        if name in selected:
+            continue
+        # The package and its unselected dependencies among the candidates
+        required = {name}
+        queue = deque([name])
+        while queue:
+            for dependency in dependency_graph.dependencies(queue.popleft()):
+                if dependency in candidates and dependency not in selected and dependency not in required:
+                    required.add(dependency)
+                    queue.append(dependency)
+        required_cost = sum(cost(required_name) for required_name in required)
+        if spent + required_cost <= budget:
+            selected.update(required)
+            spent += required_cost
+    return selected, spent
+
+
+def formatDuration(seconds):
+    """
+    :param seconds: Duration in seconds
+    :type seconds: float
+    :returns: Duration in hours, minutes and seconds, e.g. '1 h 05 min' or '3 min 20 s'
+    :rtype: str
+    """
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return '{} h {:02d} min'.format(hours, minutes)
+    if minutes:
+        return '{} min {:02d} s'.format(minutes, seconds)
+    return '{} s'.format(seconds)
@@ -0,0 +1,256 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+# Compiler cache shared by all brahma workspaces of a user. The compilers are launched through ccache or sccache with
+# the cache directory set by the launcher, such that builds from a shell without brahma use the same cache.
+# Objects are shared between workspaces, since the packages are compiled through the links in the catkin source space:
+# relative to the build space the paths are the same in every workspace. ccache rewrites the absolute paths below its
+# base directory (the home directory) to relative ones and does not hash the build directory for debug information.
+
+import json
+import os
+import shutil
+import subprocess
+
+import brahma.log as log
+import brahma.summary as summary
+
+COMPILER_CACHES = ['none', 'ccache', 'sccache']
+COMPILER_CACHE_DIR = os.path.expanduser("~/.cache/brahma")
+CCACHE_CONFIG_FILE = "ccache.conf"
+
+# CMake variables of the compiler launchers set by brahma
+LAUNCHER_VARIABLES = ['CMAKE_C_COMPILER_LAUNCHER', 'CMAKE_CXX_COMPILER_LAUNCHER']
+# Start of the launchers written by brahma, launchers configured by the user do not set the cache directory first
+LAUNCHER_PREFIXES = ['env;CCACHE_DIR=', 'env;SCCACHE_DIR=']
+
+
+def cacheDirectory(settings):
+    """
+    :param settings: Workspace settings
+    :type settings: BrahmaWorkspaceSettings
+    :returns: Directory of the compiler cache, by default shared by all workspaces of the user
+    :rtype: str
+    """
+    if settings.compiler_cache_dir:
+        return os.path.abspath(os.path.expanduser(settings.compiler_cache_dir))
+    return os.path.join(COMPILER_CACHE_DIR, settings.compiler_cache)
+
+
+def cacheEnvironment(settings):
+    """
+    :param settings: Workspace settings
+    :type settings: BrahmaWorkspaceSettings
+    :returns: Environment variables configuring the compiler cache, the cache directory first
+    :rtype: list(tuple(str,str))
+    """
+    if settings.compiler_cache == 'ccache':
+        return [('CCACHE_DIR', cacheDirectory(settings))]
+    if settings.compiler_cache == 'sccache':
+        return [('SCCACHE_DIR', cacheDirectory(settings)), ('SCCACHE_CACHE_SIZE', settings.compiler_cache_max_size)]
+    return []
+
+
+def launcherCMakeArgs(settings):
+    """
+    CMake arguments launching the compilers through the compiler cache. The launcher sets the cache environment with
+    'env'. No arguments are returned if the compiler cache is disabled or not installed.
+
+    :param settings: Workspace settings
+    :type settings: BrahmaWorkspaceSettings
+    :returns: CMake arguments of the compiler launchers
+    :rtype: list(str)
+    """
+    if settings.compiler_cache == 'none':
+        return []
+    executable = shutil.which(settings.compiler_cache)
+    if executable is None:
+        log.warn("Compiler cache '{}' is not installed, building without it.".format(settings.compiler_cache))
+        return []
+    environment = ['{}={}'.format(key, value) for key, value in cacheEnvironment(settings)]
+    launcher = ';'.join(['env'] + environment + [executable])
+    return ['-D{}={}'.format(variable, launcher) for variable in LAUNCHER_VARIABLES]
+
+
+def setsCompilerLauncher(cmake_arg):
+    """
+    :param cmake_arg: CMake argument
+    :type cmake_arg: str
+    :returns: True, if 'cmake_arg' sets one of the compiler launchers
+    :rtype: bool
+    """
+    return any(cmake_arg.startswith('-D{}='.format(variable)) or cmake_arg.startswith('-D{}:'.format(variable))
+               for variable in LAUNCHER_VARIABLES)
+
+
+def isLauncherCMakeArg(cmake_arg):
+    """
+    :param cmake_arg: CMake argument
+    :type cmake_arg: str
+    :returns: True, if 'cmake_arg' sets one of the compiler launchers to a compiler cache configured by brahma
+    :rtype: bool
+    """
+    if not setsCompilerLauncher(cmake_arg):
+        return False
+    value = cmake_arg.split('=', 1)[1]
+    return any(value.startswith(prefix) for prefix in LAUNCHER_PREFIXES)
+
+
+def configureCache(settings):
+    """
+    Create the cache directory and write the size limit and path handling to the ccache configuration. Other entries
+    of the configuration are kept. sccache is configured by the environment of the launcher.
+    The size limit belongs to the cache directory: workspaces sharing a directory overwrite the limit of each other,
+    the limit of the last updated workspace applies. Workspaces need a separate 'compiler_cache_dir' for their own
+    limit.
+
+    :param settings: Workspace settings
+    :type settings: BrahmaWorkspaceSettings
+    """
+    if settings.compiler_cache == 'none':
+        return
+    cache_dir = cacheDirectory(settings)
+    os.makedirs(cache_dir, exist_ok=True)
+    if settings.compiler_cache != 'ccache':
+        return
+
+    import brahma.utils as utils
+    options = {'max_size': settings.compiler_cache_max_size, 'base_dir': os.path.expanduser('~'), 'hash_dir': 'false'}
+    config_file = os.path.join(cache_dir, CCACHE_CONFIG_FILE)
+    lines = []
+    try:
+        with open(config_file, 'r') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        pass
+    lines = [line for line in lines if line.split('=')[0].strip() not in options]
+    lines += ['{} = {}'.format(key, value) for key, value in options.items()]
+    utils.writeFileIfChanged(config_file, '\n'.join(lines) + '\n')
+
+
+def readStatistics(settings):
+    """
+    Read the statistics of the compiler cache.
+
+    :param settings: Workspace settings
+    :type settings: BrahmaWorkspaceSettings
+    :returns: Cache hits, cache misses and the cache size in bytes ('None' if unknown), 'None' if the statistics can
+              not be read
+    :rtype: dict
+    """
+    if settings.compiler_cache == 'ccache':
+        command = ['ccache', '--print-stats']
+    elif settings.compiler_cache == 'sccache':
+        command = ['sccache', '--show-stats', '--stats-format=json']
+    else:
+        return None
+    try:
+        output = subprocess.run(command, env=dict(os.environ, **dict(cacheEnvironment(settings))), check=True,
+                                stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True).stdout
+    except (OSError, subprocess.CalledProcessError) as e:
+        log.warn("Could not read the statistics of {}: {}".format(settings.compiler_cache, e))
+        return None
+
+    if settings.compiler_cache == 'ccache':
+        counters = dict()
+        for line in output.splitlines():
+            key, _, value = line.partition('\t')
+            if value.strip().isdigit():
+                counters[key.strip()] = int(value)
+        size = counters.get('cache_size_kibibyte')
+        return {'hits': counters.get('direct_cache_hit', 0) + counters.get('preprocessed_cache_hit', 0),
+                'misses': counters.get('cache_miss', 0), 'size': size * 1024 if size is not None else None}
+
+    def count(counter):
+        # Counted per language by newer versions
+        return sum(counter['counts'].values()) if isinstance(counter, dict) else counter or 0
+
+    try:
+        stats = json.loads(output)
+        return {'hits': count(stats['stats']['cache_hits']), 'misses': count(stats['stats']['cache_misses']),
+                'size': stats.get('cache_size')}
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        log.warn("Could not parse the statistics of sccache: {}".format(e))
+        return None
+
+
+def loadSnapshot(snapshot_file):
+    """
+    :param snapshot_file: Path of the statistics snapshot of the workspace
+    :type snapshot_file: str
+    :returns: Statistics of the last report, empty if there is none
+    :rtype: dict
+    """
+    try:
+        with open(snapshot_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+
+def saveSnapshot(snapshot_file, snapshot):
+    """
+    :param snapshot_file: Path of the statistics snapshot of the workspace
+    :type snapshot_file: str
+    :param snapshot: Statistics of this report
+    :type snapshot: dict
+    """
+    tmp_file = snapshot_file + '.tmp'
+    try:
+        with open(tmp_file, 'w') as f:
+            json.dump(snapshot, f, sort_keys=True)
+        os.replace(tmp_file, snapshot_file)
+    except OSError as e:
+        log.warn("Could not write compiler cache statistics {}: {}".format(snapshot_file, e))
+
+
+def hitRate(hits, misses):
+    """
+    :param hits: Number of cache hits
+    :type hits: int
+    :param misses: Number of cache misses
+    :type misses: int
+    :returns: Hit rate in percent, e.g. '87.5 %', or '-' without compilations
+    :rtype: str
+    """
+    if hits + misses == 0:
+        return '-'
+    return '{:.1f} %'.format(100.0 * hits / (hits + misses))
+
+
+def reportStatistics(settings, snapshot_file):
+    """
+    Print the statistics of the compiler cache and the hits and misses since the last report of the workspace, e.g.
+    the last build.
+
+    :param settings: Workspace settings
+    :type settings: BrahmaWorkspaceSettings
+    :param snapshot_file: Path of the statistics snapshot of the workspace
+    :type snapshot_file: str
+    :returns: False, if the statistics could not be read
+    :rtype: bool
+    """
+    stats = readStatistics(settings)
+    if stats is None:
+        return False
+    cache_dir = cacheDirectory(settings)
+    summary.entry('compiler_cache', settings.compiler_cache)
+    summary.entry('directory', cache_dir)
+    if stats['size'] is not None:
+        summary.entry('size', '{:.1f} MB (max {})'.format(stats['size'] / 1e6, settings.compiler_cache_max_size))
+    summary.entry('hits / misses', '{} / {}'.format(stats['hits'], stats['misses']))
+    summary.entry('hit rate', hitRate(stats['hits'], stats['misses']))
+
+    snapshot = {'compiler_cache': settings.compiler_cache, 'directory': cache_dir, 'hits': stats['hits'],
+                'misses': stats['misses']}
+    last_snapshot = loadSnapshot(snapshot_file)
+    # Counters of another cache or counters that were reset are not comparable
+    if all(last_snapshot.get(key) == snapshot[key] for key in ['compiler_cache', 'directory']) and \
+            last_snapshot['hits'] <= stats['hits'] and last_snapshot['misses'] <= stats['misses']:
+        hits = stats['hits'] - last_snapshot['hits']
+        misses = stats['misses'] - last_snapshot['misses']
+        summary.entry('since last report', '{} / {} ({})'.format(hits, misses, hitRate(hits, misses)))
+    saveSnapshot(snapshot_file, snapshot)
+    return True
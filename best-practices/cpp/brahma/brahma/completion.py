@@ -0,0 +1,92 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+# Static data of the shell completion (bash/brahma-completion.bash). The completion reads these files on every TAB
+# press instead of running brahma, each file holds a single line of space separated words.
+
+import glob
+import os
+
+import brahma.utils as utils
+
+COMPLETION_CACHE_DIR = os.path.expanduser("~/.cache/brahma/completion")
+COMPLETION_STAMP_FILE = "stamp"
+# Options of the verbs with this metavar are completed with the package names of the workspace
+PACKAGE_METAVAR = 'PACKAGE'
+
+
+def completionStamp():
+    """
+    :returns: Identifier of the installed brahma version, changes if brahma is installed or updated
+    :rtype: str
+    """
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    modules = sorted(glob.glob(os.path.join(package_dir, '*.py')))
+    return ' '.join([package_dir] + ['{}:{}'.format(os.path.basename(module), os.stat(module).st_mtime_ns)
+                                     for module in modules])
+
+
+def isCompletionCacheUpToDate(cache_dir=COMPLETION_CACHE_DIR):
+    """
+    :param cache_dir: Directory of the completion cache
+    :type cache_dir: str
+    :returns: True, if the completion cache was written by the installed brahma version
+    :rtype: bool
+    """
+    try:
+        with open(os.path.join(cache_dir, COMPLETION_STAMP_FILE), 'r') as f:
+            return f.read() == completionStamp()
+    except OSError:
+        return False
+
+
+def writeCompletionCache(main_parser, verb_parsers, cache_dir=COMPLETION_CACHE_DIR):
+    """
+    Write the verbs, the options of every verb and the options taking package names to the completion cache.
+    Failing to write the cache is not an error, the completion falls back to parsing the help output.
+
+    :param main_parser: Main parser of brahma, which determines the verb
+    :type main_parser: argparse.ArgumentParser
+    :param verb_parsers: Parsers of the verbs, including the common arguments
+    :type verb_parsers: dict(str,argparse.ArgumentParser)
+    :param cache_dir: Directory of the completion cache
+    :type cache_dir: str
+    :returns: True, if the cache was written
+    :rtype: bool
+    """
+    files = {'verbs': list(verb_parsers), 'brahma.options': _options(main_parser)}
+    for verb, parser in verb_parsers.items():
+        files[verb + '.options'] = _options(parser)
+        files[verb + '.package_options'] = _options(parser, PACKAGE_METAVAR)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        for name, words in files.items():
+            utils.writeFileIfChanged(os.path.join(cache_dir, name), ' '.join(words) + '\n')
+        # The stamp is written last, an interrupted write is repeated on the next run
+        utils.writeFileIfChanged(os.path.join(cache_dir, COMPLETION_STAMP_FILE), completionStamp())
+    except OSError:
+        return False
+    return True
+
+
+def writePackageNames(package_names_file, package_names):
+    """
+    Write the package names of the workspace, which are completed for the options taking package names.
+
+    :param package_names_file: Path of the package names file
+    :type package_names_file: str
+    :param package_names: Names of all packages in the source directory
+    :type package_names: list(str)
+    """
+    try:
+        utils.writeFileIfChanged(package_names_file, ' '.join(sorted(package_names)) + '\n')
+    except OSError:
+        pass
+
+
+def _options(parser, metavar=None):
+    # Long options of the parser, optionally only the ones with the given metavar
+    return sorted(option for action in parser._actions for option in action.option_strings
+                  if option.startswith('--') and (metavar is None or action.metavar == metavar))
@@ -0,0 +1,203 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+# Ignore rules for changed files that do not affect the build of a package (e.g. README, documentation, CI configs).
+# The patterns of the settings apply to every package, a '.brahmaignore' file in the package directory adds patterns
+# for that package. Patterns follow the gitignore syntax, relative to the package directory:
+#   - '*' and '?' do not match '/', '[...]' matches a character of a set. '**' matches any number of directories in
+#     a leading '**/', a trailing '/**' or an inner '/**/'.
+#   - A pattern with a leading or inner '/' is anchored to the package directory (e.g. '/README.md', 'launch/*.launch').
+#     A pattern without matches the name of a file or directory at any level (e.g. '*.md', 'doc').
+#   - A pattern with a trailing '/' only matches directories (e.g. 'doc/').
+#   - The files below a matching directory are matched as well.
+#   - A pattern starting with '!' includes matching files again. The last matching pattern wins, such that the
+#     '.brahmaignore' of a package can override the patterns of the settings. A file can not be included again if one
+#     of its parent directories is ignored.
+#   - Empty lines and lines starting with '#' are skipped, a leading '\' escapes '#' and '!'.
+
+import functools
+import os
+import re
+
+import brahma.log as log
+
+IGNORE_FILE = ".brahmaignore"
+
+
+def readIgnoreFile(package_path):
+    """
+    :param package_path: Directory of the package
+    :type package_path: str
+    :returns: Patterns of the '.brahmaignore' file of the package, empty if there is none
+    :rtype: list(str)
+    """
+    try:
+        with open(os.path.join(package_path, IGNORE_FILE), 'r') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return []
+    return [line.strip() for line in lines if line.strip() and not line.strip().startswith('#')]
+
+
+@functools.lru_cache(maxsize=None)
+def compilePattern(pattern):
+    """
+    Translate an ignore pattern to a regular expression matching the relative paths.
+
+    :param pattern: Ignore pattern without the '!' prefix
+    :type pattern: str
+    :returns: Regular expression and whether the pattern only matches directories
+    :rtype: tuple(re.Pattern,bool)
+    """
+    if pattern.startswith('\\'):
+        pattern = pattern[1:]
+    directory_only = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    anchored = '/' in pattern
+    parts = pattern.lstrip('/').split('/')
+    expression = '' if anchored else '(?:.*/)?'
+    for index, part in enumerate(parts):
+        last = index == len(parts) - 1
+        if part == '**':
+            expression += '.*' if last else '(?:.*/)?'
+            continue
+        expression += _translateGlob(part) + ('' if last else '/')
+    return re.compile(expression), directory_only
+
+
+def _translateGlob(part):
+    """
+    :param part: Glob of a single path component
+    :type part: str
+    :returns: Regular expression of the glob, wildcards do not match '/'
+    :rtype: str
+    """
+    expression = ''
+    index = 0
+    while index < len(part):
+        char = part[index]
+        index += 1
+        if char == '*':
+            while index < len(part) and part[index] == '*':
+                index += 1
+            expression += '[^/]*'
+        elif char == '?':
+            expression += '[^/]'
+        elif char == '\\' and index < len(part):
+            expression += re.escape(part[index])
+            index += 1
+        elif char == '[':
+            end = index + 1 if part[index:index + 1] in ('!', '^') else index
+            end = part.find(']', end + 1 if part[end:end + 1] == ']' else end)
+            if end < 0:
+                expression += '\\['
+                continue
+            characters = part[index:end]
+            index = end + 1
+            if characters[0] in ('!', '^'):
+                characters = '^' + characters[1:]
+            expression += '[' + characters.replace('\\', '\\\\') + ']'
+        else:
+            expression += re.escape(char)
+    return expression
+
+
+def matchPattern(relative_path, pattern, is_directory=False):
+    """
+    :param relative_path: Path relative to the package directory
+    :type relative_path: str
+    :param pattern: Ignore pattern without the '!' prefix
+    :type pattern: str
+    :param is_directory: True, if 'relative_path' is a directory
+    :type is_directory: bool
+    :returns: True, if 'pattern' matches the path itself
+    :rtype: bool
+    """
+    expression, directory_only = compilePattern(pattern)
+    if directory_only and not is_directory:
+        return False
+    return expression.fullmatch(relative_path.replace(os.sep, '/')) is not None
+
+
+def matchIgnoreRules(relative_path, rules):
+    """
+    :param relative_path: Path of the file relative to the package directory
+    :type relative_path: str
+    :param rules: Patterns and their origin, in the order they are applied
+    :type rules: list(tuple(str,str))
+    :returns: Last matching pattern and its origin of the file or of its first ignored parent directory, 'None' if
+              the file is not ignored
+    :rtype: tuple(str,str)
+    """
+    parts = relative_path.split(os.sep)
+    for index in range(1, len(parts) + 1):
+        path = '/'.join(parts[:index])
+        is_directory = index < len(parts)
+        match = None
+        for pattern, origin in rules:
+            negated = pattern.startswith('!')
+            if matchPattern(path, pattern[1:] if negated else pattern, is_directory):
+                match = None if negated else (pattern, origin)
+        if match is not None:
+            return match
+    return None
+
+
+def filterIgnoredFiles(files, package_index, patterns):
+    """
+    Remove the changed files matched by the ignore patterns of the settings or of the '.brahmaignore' of their
+    package. Changes to a '.brahmaignore' file are ignored as well. Files outside of packages are kept.
+
+    :param files: Absolute paths of the changed files
+    :type files: list(str)
+    :param package_index: Index of the packages in the source directory
+    :type package_index: PackageIndex
+    :param patterns: Ignore patterns of the settings
+    :type patterns: list(str)
+    :returns: Files that are not ignored and the reason (pattern and origin) per ignored file
+    :rtype: tuple(list(str),dict(str,tuple(str,str)))
+    """
+    kept_files = []
+    ignored_files = dict()
+    rules_by_package = dict()
+    for file in files:
+        package = package_index.packageFromFile(file)
+        if package is None:
+            kept_files.append(file)
+            continue
+        package_path = os.path.dirname(os.path.realpath(package.filename))
+        relative_path = os.path.relpath(file, package_path)
+        if relative_path == IGNORE_FILE:
+            ignored_files[file] = (IGNORE_FILE, 'brahma')
+            continue
+        rules = rules_by_package.get(package.name)
+        if rules is None:
+            rules = [(pattern, 'settings') for pattern in patterns] + \
+                    [(pattern, os.path.join(package.name, IGNORE_FILE)) for pattern in readIgnoreFile(package_path)]
+            rules_by_package[package.name] = rules
+        match = matchIgnoreRules(relative_path, rules) if rules else None
+        if match is None:
+            kept_files.append(file)
+        else:
+            ignored_files[file] = match
+    return kept_files, ignored_files
+
+
+def reportIgnoredFiles(ignored_files, repo, repo_path):
+    """
+    Print the ignored files of a repository and the pattern that matched them.
+
+    :param ignored_files: Reason (pattern and origin) per ignored file
+    :type ignored_files: dict(str,tuple(str,str))
+    :param repo: Name of the repository
+    :type repo: str
+    :param repo_path: Directory of the repository
+    :type repo_path: str
+    """
+    if not ignored_files:
+        return
+    log.info("Ignored {} changed files of repository '{}'".format(len(ignored_files), repo))
+    for file, (pattern, origin) in sorted(ignored_files.items()):
+        log.info("  {} (pattern '{}' of {})".format(os.path.relpath(file, repo_path), pattern, origin))
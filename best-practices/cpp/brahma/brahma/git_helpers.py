@@ -3,45 +3,36 @@
 # Author:       Gabriel Hottiger
 # Affiliation:  ANYbotics
 
+import fnmatch
+import hashlib
 import os
-import sys
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 
 import brahma.log as log
+import brahma.timing as timing
 
-try:
-    import git
-    from git import RemoteProgress
-    from git import Repo
-except:
-    log.error(
-        "The current directory does not exist in the base branch. Try to run the command from the root of your brahma workspace.")
+# Results of getRepositories per directory and prune patterns
+_repository_cache = dict()
 
 
-class GitProgressPrinter(RemoteProgress):
-    """
-    Progress printer for GitPython cloning. See GitPython documentation for details.
+def _git():
     """
+    Import GitPython on first use. Importing it is slower than most brahma commands that do not need it.
 
-    def update(self, op_code, cur_count, max_count=None, message=''):
-        OP_NAMES = {
-            RemoteProgress.BEGIN: 'Begin',
-            RemoteProgress.CHECKING_OUT: 'Checkout',
-            RemoteProgress.COMPRESSING: 'Compressing',
-            RemoteProgress.COUNTING: 'Counting',
-            RemoteProgress.END: 'End',
-            RemoteProgress.FINDING_SOURCES: 'Finding Sources',
-            RemoteProgress.OP_MASK: 'OP Mask',
-            RemoteProgress.RECEIVING: 'Receiving',
-            RemoteProgress.RESOLVING: 'Resolving',
-            RemoteProgress.STAGE_MASK: 'Stage mask',
-            RemoteProgress.WRITING: 'Writing'
-        }
-        if op_code in OP_NAMES:
-            print("\033[K", end='\r')
-            print(OP_NAMES[op_code] + " {0:.1f}%".format(100.0 * cur_count / (max_count or 100.0)), end='\r')
+    :returns: The git module
+    :rtype: module
+    """
+    try:
+        import git
+    except Exception:
+        log.error(
+            "The current directory does not exist in the base branch. Try to run the command from the root of your brahma workspace.")
+    return git
 
 
-def cloneRepository(url, dir):
+@timing.timed()
+def cloneRepository(url, dir, branch=None, clone_options=None, progress=None):
     """
     Clone repository into directory.
 
@@ -49,48 +40,104 @@ def cloneRepository(url, dir):
     :type url: str
     :param dir: Directory in which to clone repository.
     :type dir: str
+    :param branch: Branch to check out after cloning, 'None' for the default branch of the remote
+    :type branch: str
+    :param clone_options: Shallow and partial clone options ('depth', 'filter' and 'single_branch')
+    :type clone_options: dict
+    :param progress: Progress printer, 'None' to print the progress of this clone only
+    :type progress: git.RemoteProgress
     """
     if os.path.exists(dir):
         log.error("Tried to clone repo into existing folder {}".format(dir))
+
+    kwargs = dict()
+    clone_options = clone_options or dict()
+    if clone_options.get('depth'):
+        kwargs['depth'] = int(clone_options['depth'])
+    if clone_options.get('filter'):
+        kwargs['filter'] = clone_options['filter']
+    if clone_options.get('single_branch'):
+        kwargs['single_branch'] = True
+    if kwargs and os.path.exists(url):
+        # Git ignores the depth and filter options for local paths
+        url = 'file://' + os.path.abspath(url)
+
+    git = _git()
+    from brahma.git_progress import GitProgressPrinter
+    progress = progress or GitProgressPrinter()
     try:
-        Repo.clone_from(url, dir, progress=GitProgressPrinter())
-        log.info("")  # Line break
-    except git.exc.GitCommandError:
-        log.error("Could not clone repo from {}".format(url))
+        git.Repo.clone_from(url, dir, progress=progress, branch=branch, **kwargs)
+    except git.exc.GitCommandError as e:
+        # With a progress printer git's error output ends up in the printer's error lines
+        if branch is None or "Remote branch" not in str(e.stderr) + "".join(progress.error_lines):
+            log.error("Could not clone repo from {}".format(url))
+        log.warn("Could not checkout branch {}. Continue with default branch.".format(branch))
+        shutil.rmtree(dir, ignore_errors=True)
+        cloneRepository(url, dir, None, clone_options, progress)
 
 
-def cloneOrLinkRepositories(repositories, dir):
+def cloneOrLinkRepositories(repositories, dir, clone_options=None, jobs=1):
     """
     Clone or symlink repositories into directory and check out the base branch.
+    Repositories are cloned concurrently, the log output is printed in the order of 'repositories'.
 
     :param repositories: Repository information
     :type repositories: dict(str, pair(str,str))
     :param dir: Directory in which to clone repository.
     :type dir: str
+    :param clone_options: Shallow and partial clone options per repository (see cloneRepository)
+    :type clone_options: dict(str, dict)
+    :param jobs: Maximum number of repositories that are cloned at the same time
+    :type jobs: int
     """
+    clone_options = clone_options or dict()
+    clones = list()
     for repo_name, repo_info in repositories.items():
         repo_url = repo_info[0]
         repo_base_branch = repo_info[1]
         repo_path = dir + "/" + repo_name
         if not os.path.exists(repo_path):
             if repo_url.endswith(".git"):  # Can be local or remote repo
-                log.prefixStatus("Cloning repository '{}' with URL".format(repo_name), '{}'.format(repo_url))
-                log.prefixStatus('into path', '{}'.format(repo_path))
-                cloneRepository(repo_url, repo_path)
+                clones.append((repo_name, repo_url, repo_base_branch, repo_path))
             elif os.path.exists(repo_url):
                 log.prefixStatus("Symlinking repository '{}' with path".format(repo_name), '{}'.format(repo_url))
                 log.prefixStatus('into path', '{}'.format(repo_path))
                 os.symlink(repo_url, repo_path)
+                clearRepositoryCache()
+                # Check out the base branch
+                git_repo = getRepository(repo_path)
+                log.prefixStatus('Check out base branch', '{}'.format(repo_base_branch))
+                checkoutBranch(git_repo, repo_base_branch, pull=False, abortOnError=False)
             else:
                 log.warn("Repository '{}' with URL {} is not valid. Skip creation.".format(repo_name, repo_url))
-                continue
-            # Check out the base branch
-            git_repo = getRepository(repo_path)
-            log.prefixStatus('Check out base branch', '{}'.format(repo_base_branch))
-            checkoutBranch(git_repo, repo_base_branch, pull=False, abortOnError=False)
         else:
             log.info("Existing repository in folder '{}'".format(repo_path))
 
+    if not clones:
+        return
+
+    # Clone directly into the base branch, this avoids a checkout and a second fetch after cloning
+    def clone(repo_name, repo_url, repo_base_branch, repo_path):
+        log.prefixStatus("Cloning repository '{}' with URL".format(repo_name), '{}'.format(repo_url))
+        log.prefixStatus('into path', '{}'.format(repo_path))
+        log.prefixStatus('Check out base branch', '{}'.format(repo_base_branch))
+        cloneRepository(repo_url, repo_path, repo_base_branch, clone_options.get(repo_name),
+                        progress.printer(repo_name))
+        progress.finish(repo_name)
+
+    from brahma.git_progress import CloneProgressDisplay
+    progress = CloneProgressDisplay([repo_name for repo_name, _, _, _ in clones])
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = [executor.submit(log.callBuffered, clone, *clone_args) for clone_args in clones]
+        results = [future.result() for future in futures]
+    progress.close()
+    clearRepositoryCache()
+
+    for records, _, exception in results:
+        log.replay(records)
+        if exception is not None:
+            raise exception
+
 
 def isGitRepo(path):
     """
@@ -101,6 +148,7 @@ def isGitRepo(path):
     :returns: True, if 'path' is a repository
     :rtype: bool
     """
+    git = _git()
     try:
         _ = git.Repo(path).git_dir
         return True
@@ -117,26 +165,121 @@ def getRepository(dir):
     """
     if not os.path.exists(dir):
         log.error("Tried to init repo from non-existing folder {}".format(dir))
-    return Repo(dir)
+    return _git().Repo(dir)
 
 
-def getRepositories(git_dir):
+@timing.timed()
+def getRepositories(git_dir, prune_patterns=None):
     """
-    Get repository at path. Exit process if non-existing folder.
+    Get the paths of all git repositories in 'git_dir'. Directories are crawled with os.scandir and recognized as
+    repository by their '.git' entry, repositories are not searched for nested repositories. Symbolic links are
+    followed, every directory is visited once. The result is cached until 'clearRepositoryCache' is called.
 
     :param git_dir: Directory containing the git repositories
     :type git_dir: str
-    :returns: List of repository in 'git_dir'
-    :rtype: list of git.Repo
+    :param prune_patterns: Glob patterns of directory names that are not searched
+    :type prune_patterns: list(str)
+    :returns: Sorted list of repository paths in 'git_dir'
+    :rtype: list(str)
+    """
+    prune_patterns = tuple(prune_patterns or ())
+    key = (os.path.abspath(git_dir), prune_patterns)
+    if key not in _repository_cache:
+        _repository_cache[key] = sorted(_findRepositories(key[0], prune_patterns))
+    return list(_repository_cache[key])
+
+
+def clearRepositoryCache():
+    """
+    Clear the cached results of 'getRepositories'. Needs to be called after repositories were added or removed.
     """
+    _repository_cache.clear()
+
+
+def _findRepositories(git_dir, prune_patterns):
     repos = list()
-    for dir, subdirs, files in os.walk(git_dir, followlinks=True):
-        if isGitRepo(dir):
+    visited = set()
+    stack = [git_dir]
+    # Symbolic links are followed last, such that repositories are reported with their real path if possible
+    linked_dirs = list()
+    while stack or linked_dirs:
+        dir = stack.pop() if stack else linked_dirs.pop(0)
+        try:
+            stat = os.stat(dir)
+            if (stat.st_dev, stat.st_ino) in visited:
+                continue  # Symbolic link cycle or directory linked twice
+            visited.add((stat.st_dev, stat.st_ino))
+            subdirs = list()
+            linked_subdirs = list()
+            is_repo = False
+            with os.scandir(dir) as entries:
+                for entry in entries:
+                    if entry.name == '.git':
+                        is_repo = True
+                        break
+                    if entry.is_dir() and not any(fnmatch.fnmatch(entry.name, pattern) for pattern in prune_patterns):
+                        (linked_subdirs if entry.is_symlink() else subdirs).append(entry.path)
+        except OSError:
+            continue  # Dangling symbolic link or missing permissions
+        if is_repo:
             repos.append(dir)
-            del subdirs[:]
+        else:
+            stack.extend(subdirs)
+            linked_dirs.extend(linked_subdirs)
     return repos
 
 
+@timing.timed()
+def getRepositoryFingerprint(repo, base_branch):
+    """
+    Fingerprint of the state of a repository. It changes with the HEAD commit, the base branch commit, the status
+    of the index and the working tree (including untracked files) and the modification time and size of every changed
+    path, such that editing a file that is already modified changes the fingerprint as well.
+
+    :param repo: Repository
+    :type repo: git.Repo
+    :param base_branch: Base branch of the repository, 'None' if there is none
+    :type base_branch: str
+    :returns: Hash of the repository state
+    :rtype: str
+    """
+    fingerprint = hashlib.sha1()
+    try:
+        fingerprint.update(repo.head.commit.hexsha.encode())
+    except ValueError:
+        pass  # Repository without commits
+    if base_branch and base_branch in repo.refs:
+        fingerprint.update(repo.refs[base_branch].commit.hexsha.encode())
+    status = repo.git.status('--porcelain', '-z', '--untracked-files=all')
+    fingerprint.update(status.encode())
+    for path in getStatusPaths(status):
+        try:
+            stat = os.lstat(os.path.join(repo.working_tree_dir, path))
+            fingerprint.update('{}:{}:{}\0'.format(path, stat.st_mtime_ns, stat.st_size).encode())
+        except OSError:
+            fingerprint.update('{}:missing\0'.format(path).encode())
+    return fingerprint.hexdigest()
+
+
+def getStatusPaths(status):
+    """
+    :param status: Output of 'git status --porcelain -z'
+    :type status: str
+    :returns: Paths of the changed entries relative to the repository, the current path of renamed and copied entries
+    :rtype: list(str)
+    """
+    paths = []
+    entries = iter(status.split('\0'))
+    for entry in entries:
+        if len(entry) < 4:
+            continue
+        paths.append(entry[3:])
+        # Renamed and copied entries are followed by their original path
+        if entry[0] in 'RC' or entry[1] in 'RC':
+            next(entries, None)
+    return paths
+
+
 def getRepoNameFromURL(url):
     """
     Get repository name from the URL.
@@ -167,7 +310,7 @@ def getURLFromRepoPath(path):
     :rtype: str
     """
     if isGitRepo(path):
-        return git.Repo(path).remotes.origin.url
+        return _git().Repo(path).remotes.origin.url
     return None
 
 
@@ -180,12 +323,14 @@ def createBranch(repo, branch_name):
     :param branch_name: Name of the created branch
     :type branch_name: str
     """
+    git = _git()
     try:
         repo.git.checkout('-b', branch_name)
     except git.exc.GitCommandError:
         log.error("Could not checkout new branch {}".format(branch_name))
 
 
+@timing.timed()
 def pullBranch(repo, branch_name):
     """
     Pull branch 'branch_name' for 'repo'
@@ -195,9 +340,11 @@ def pullBranch(repo, branch_name):
     :param branch_name: Name of the branch to checkout
     :type branch_name: str
     """
+    from brahma.git_progress import GitProgressPrinter
     repo.remotes.origin.fetch(branch_name + ":" + branch_name, progress=GitProgressPrinter())
 
 
+@timing.timed()
 def checkoutBranch(repo, branch_name, pull, abortOnError=True):
     """
     Checkout and update branch 'branch_name' for 'repo'
@@ -211,6 +358,7 @@ def checkoutBranch(repo, branch_name, pull, abortOnError=True):
     :param abortOnError: Abort if branch can not be checked out
     :type abortOnError: bool
     """
+    git = _git()
     repo.remotes.origin.fetch()
 
     try:
@@ -230,21 +378,27 @@ def checkoutBranch(repo, branch_name, pull, abortOnError=True):
     return output
 
 
+@timing.timed()
 def mergeBranch(repo, branch_name):
+    git = _git()
     try:
         return repo.git.merge(branch_name)
     except git.exc.GitCommandError:
         log.error("Could not merge branch {}. Please resolve conflicts, local remain were stashed.".format(branch_name))
 
 
+@timing.timed()
 def stashChanges(repo, stash_name):
+    git = _git()
     try:
         return repo.git.stash('save', '-u', stash_name)
     except git.exc.GitCommandError:
         log.error("Could not stash changes")
 
 
+@timing.timed()
 def popStash(repo):
+    git = _git()
     try:
         return repo.git.stash('pop')
     except git.exc.GitCommandError:
@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+# Progress printers of git_helpers. Kept separate since importing GitPython is slow, git_helpers only imports this
+# module when a repository is cloned or fetched.
+
+import threading
+
+from git import RemoteProgress
+
+import brahma.log as log
+
+
+class GitProgressPrinter(RemoteProgress):
+    """
+    Progress printer for GitPython cloning. See GitPython documentation for details.
+    """
+
+    def update(self, op_code, cur_count, max_count=None, message=''):
+        # Progress of concurrent git operations would interleave
+        if log.isBuffered():
+            return
+        OP_NAMES = {
+            RemoteProgress.BEGIN: 'Begin',
+            RemoteProgress.CHECKING_OUT: 'Checkout',
+            RemoteProgress.COMPRESSING: 'Compressing',
+            RemoteProgress.COUNTING: 'Counting',
+            RemoteProgress.END: 'End',
+            RemoteProgress.FINDING_SOURCES: 'Finding Sources',
+            RemoteProgress.OP_MASK: 'OP Mask',
+            RemoteProgress.RECEIVING: 'Receiving',
+            RemoteProgress.RESOLVING: 'Resolving',
+            RemoteProgress.STAGE_MASK: 'Stage mask',
+            RemoteProgress.WRITING: 'Writing'
+        }
+        if op_code in OP_NAMES:
+            print("\033[K", end='\r')
+            print(OP_NAMES[op_code] + " {0:.1f}%".format(100.0 * cur_count / (max_count or 100.0)), end='\r')
+
+
+class CloneProgressDisplay:
+    """
+    Combined progress display for concurrent clones. Prints a single line with the progress of all active clones.
+
+    :param repo_names: Names of the repositories that are cloned
+    :type repo_names: list(str)
+    """
+
+    STAGE_NAMES = {
+        RemoteProgress.CHECKING_OUT: 'Checkout',
+        RemoteProgress.COMPRESSING: 'Compressing',
+        RemoteProgress.COUNTING: 'Counting',
+        RemoteProgress.FINDING_SOURCES: 'Finding Sources',
+        RemoteProgress.RECEIVING: 'Receiving',
+        RemoteProgress.RESOLVING: 'Resolving',
+        RemoteProgress.WRITING: 'Writing'
+    }
+
+    def __init__(self, repo_names):
+        self._lock = threading.Lock()
+        self._total = len(repo_names)
+        self._active = dict()
+        self._finished = 0
+
+    def printer(self, repo_name):
+        """
+        :param repo_name: Name of the cloned repository
+        :type repo_name: str
+        :returns: Progress printer reporting to this display
+        :rtype: git.RemoteProgress
+        """
+        return CloneProgressPrinter(self, repo_name)
+
+    def update(self, repo_name, stage, percentage):
+        with self._lock:
+            self._active[repo_name] = "{} {} {:.0f}%".format(repo_name, stage, percentage)
+            self._print()
+
+    def finish(self, repo_name):
+        with self._lock:
+            self._active.pop(repo_name, None)
+            self._finished += 1
+            self._print()
+
+    def close(self):
+        print("\033[K", end='\r')
+
+    def _print(self):
+        print("\033[K" + "Cloned {}/{} repositories".format(self._finished, self._total) +
+              "".join(" | " + status for status in self._active.values()), end='\r')
+
+
+class CloneProgressPrinter(RemoteProgress):
+    """
+    Progress printer for a single of multiple concurrent clones. See GitPython documentation for details.
+    """
+
+    def __init__(self, display, repo_name):
+        super().__init__()
+        self._display = display
+        self._repo_name = repo_name
+
+    def update(self, op_code, cur_count, max_count=None, message=''):
+        stage = op_code & RemoteProgress.OP_MASK
+        if stage in CloneProgressDisplay.STAGE_NAMES:
+            self._display.update(self._repo_name, CloneProgressDisplay.STAGE_NAMES[stage],
+                                 100.0 * cur_count / (max_count or 100.0))
@@ -3,21 +3,25 @@
 # Author:       Gabriel Hottiger
 # Affiliation:  ANYbotics
 
+import hashlib
+import json
 import os
-import shutil
-import sys
-
-from catkin_pkg.topological_order import topological_order
 
+import brahma.log as log
+import brahma.timing as timing
 import brahma.utils as utils
 
+# Hash of the inputs of the last project generation
+PROJECT_HASH_FILE = ".project_hash"
+
 
-def setupCLionProject(git_dir, ide_dir, project, packages, catkin_ws):
+@timing.timed()
+def setupCLionProject(package_index, ide_dir, project, packages, catkin_ws):
     """
     Create a CMakeLists.txt for the CLion project from a template. Setup helper scripts and include hack for CLion.
 
-    :param git_dir: Git directory in which packages are located
-    :type git_dir: str
+    :param package_index: Index of the packages in the git directory
+    :type package_index: PackageIndex
     :param ide_dir: Directory in which CLion project files should be generated
     :type ide_dir: str
     :param project: Name of the CLion project
@@ -39,50 +43,80 @@ def setupCLionProject(git_dir, ide_dir, project, packages, catkin_ws):
     utils.createDirectory(clion_path, True)
     utils.createDirectory(run_configurations_path, True)
 
-    # Copy code style settings
-    code_style_config_src = os.path.join(script_path, "codeStyleConfig.xml")
-    code_style_config_dest = os.path.join(code_style_path, 'codeStyleConfig.xml')
-    shutil.copyfile(code_style_config_src, code_style_config_dest)
-    project_setting_src = os.path.join(script_path, "Project.xml")
-    project_setting_dest = os.path.join(code_style_path, 'Project.xml')
-    shutil.copyfile(project_setting_src, project_setting_dest)
-
-    # Set project root
-    misc_setting_src = os.path.join(script_path, "misc.xml")
-    misc_setting_dest = os.path.join(project_settings_path, 'misc.xml')
-    shutil.copyfile(misc_setting_src, misc_setting_dest)
-
-    # Add the header library
-    header_library = os.path.join(clion_path, ".enable_include_folders.cpp")
-    open(header_library, 'w+')
-
-    # Copy project helper
-    project_helper_src = os.path.join(script_path, "clion_macros.cmake")
-    project_helper_dest = os.path.join(clion_path, "clion_macros.cmake")
-    shutil.copyfile(project_helper_src, project_helper_dest)
-
-    # Create CMakeLists
+    # Copied settings and helpers
+    copied_files = [
+        # Code style settings
+        (os.path.join(script_path, "codeStyleConfig.xml"), os.path.join(code_style_path, 'codeStyleConfig.xml')),
+        (os.path.join(script_path, "Project.xml"), os.path.join(code_style_path, 'Project.xml')),
+        # Project root
+        (os.path.join(script_path, "misc.xml"), os.path.join(project_settings_path, 'misc.xml')),
+        # Project helper
+        (os.path.join(script_path, "clion_macros.cmake"), os.path.join(clion_path, "clion_macros.cmake"))]
+
+    # Expanded templates: CMakeLists, project name and run configurations
     package_paths = [os.path.relpath(os.path.dirname(
-        package[1].filename), clion_path) for package in topological_order(git_dir) if package[1].name in packages]
+        package[1].filename), clion_path) for package in package_index.topologicalOrder() if package[1].name in packages]
     subs = {"project": project, "packages": package_paths,
             "catkin_devel_or_install_space": catkin_ws.develOrInstallSpace(),
             "ros_path": catkin_ws.extendPath(), "python_executable": getPythonExecutable(catkin_ws)}
-    utils.updateFileFromTemplate(os.path.join(script_path, "CMakeLists.txt.em"),
-                                 os.path.join(clion_path, "CMakeLists.txt"), subs)
-
-    # Set project name
-    utils.updateFileFromTemplate(os.path.join(script_path, "name.em"), os.path.join(project_settings_path, ".name"),
-                                 {"project": project})
-
-    # Create run configuration settings
-    run_configuration_files = os.listdir(run_configs_internal_path)
-    for run_configuration_file in run_configuration_files:
+    template_files = [
+        (os.path.join(script_path, "CMakeLists.txt.em"), os.path.join(clion_path, "CMakeLists.txt"), subs),
+        (os.path.join(script_path, "name.em"), os.path.join(project_settings_path, ".name"), {"project": project})]
+    for run_configuration_file in sorted(os.listdir(run_configs_internal_path)):
         source_file = os.path.join(run_configs_internal_path, run_configuration_file)
         if source_file.endswith(".em"):
             destination_file = os.path.splitext(os.path.join(run_configurations_path, run_configuration_file))[0]
-            utils.updateFileFromTemplate(source_file, destination_file, subs)
+            template_files.append((source_file, destination_file, subs))
         else:
-            shutil.copy(source_file, run_configurations_path)
+            copied_files.append((source_file, os.path.join(run_configurations_path, run_configuration_file)))
+
+    # The header library
+    header_library = os.path.join(clion_path, ".enable_include_folders.cpp")
+
+    # Skip the generation if neither the packages, the substitutions nor the brahma templates changed
+    project_hash = getProjectHash(copied_files, template_files)
+    project_hash_file = os.path.join(clion_path, PROJECT_HASH_FILE)
+    project_files = [destination for _, destination in copied_files] + \
+                    [destination for _, destination, _ in template_files] + [header_library]
+    previous_project_hash = None
+    if os.path.isfile(project_hash_file):
+        with open(project_hash_file, 'r') as f:
+            previous_project_hash = f.read()
+    if project_hash == previous_project_hash and all(os.path.isfile(file) for file in project_files):
+        log.info('Project files are up to date.')
+        return
+
+    # Only write changed files, every write triggers a CMake reload of CLion
+    written_files = 0
+    for source_file, destination_file in copied_files:
+        written_files += utils.copyFileIfChanged(source_file, destination_file)
+    for template_file, destination_file, substitutions in template_files:
+        written_files += utils.updateFileFromTemplate(template_file, destination_file, substitutions)
+    if not os.path.exists(header_library):
+        open(header_library, 'w').close()
+        written_files += 1
+    utils.writeFileIfChanged(project_hash_file, project_hash)
+    log.info('Updated {} of {} project files.'.format(written_files, len(project_files)))
+
+
+def getProjectHash(copied_files, template_files):
+    """
+    Hash of the inputs of the project generation.
+
+    :param copied_files: Source, destination tuples of the copied files
+    :type copied_files: list(tuple(str,str))
+    :param template_files: Template, destination, substitutions tuples of the expanded templates
+    :type template_files: list(tuple(str,str,dict))
+    :returns: Hash of the sources, the destinations and the substitutions
+    :rtype: str
+    """
+    project_hash = hashlib.sha1()
+    for source_file, destination_file in copied_files:
+        project_hash.update((destination_file + '\0' + utils.hashFile(source_file) + '\0').encode())
+    for template_file, destination_file, substitutions in template_files:
+        project_hash.update((destination_file + '\0' + utils.hashFile(template_file) + '\0' +
+                             json.dumps(substitutions, sort_keys=True) + '\0').encode())
+    return project_hash.hexdigest()
 
 
 def getPythonExecutable(catkin_ws):
@@ -100,17 +134,17 @@ def getPythonExecutable(catkin_ws):
         return "python2.7"
 
 
-def createClangToolsSymlinks(git_dir):
+@timing.timed()
+def createClangToolsSymlinks(package_index, git_dir):
     """
     Create symlinks for .clang-tidy and .clang-format in root directory of IDE project.
 
-    :param git_dir: Git directory in which clang_tools is located
+    :param package_index: Index of the packages in the git directory
+    :type package_index: PackageIndex
+    :param git_dir: Git directory in which the symlinks are created
     :type git_dir: str
-    :param ide_dir: Directory in which IDE project files should be generated
-    :type ide_dir: str
     """
-    clang_tools = utils.getPackagePath(git_dir, 'cmake_clang_tools')
-    if clang_tools:
-        path = os.path.join(git_dir, clang_tools[0])
+    path = package_index.packagePath('cmake_clang_tools')
+    if path:
         utils.updateSymlink(os.path.join(path, ".clang-tidy"), git_dir)
         utils.updateSymlink(os.path.join(path, ".clang-format"), git_dir)
@@ -5,14 +5,20 @@
 
 import sys
 import logging
-from logging.handlers import RotatingFileHandler
+import threading
 
 from termcolor import colored
 
+import brahma.timing as timing
+
 logger = logging.getLogger("brahma")
 
+# Log records of threads that buffer their output (see callBuffered)
+_thread_buffer = threading.local()
+
 
 def setupLogger(quiet, loggerFilePath, loggerFileName):
+    import logging.handlers
     logFormatter = logging.Formatter("%(asctime)s [%(threadName)-12.12s] [%(levelname)-5.5s]  %(message)s")
     fileHandler = logging.handlers.RotatingFileHandler(
         "{0}/{1}.log".format(loggerFilePath, loggerFileName), maxBytes=1000000, backupCount=5)
@@ -28,6 +34,55 @@ def setupLogger(quiet, loggerFilePath, loggerFileName):
     logger.setLevel(logging.DEBUG)
 
 
+def _log(level, message, **kwargs):
+    records = getattr(_thread_buffer, 'records', None)
+    if records is None:
+        logger.log(level, message, **kwargs)
+    else:
+        records.append((level, message, kwargs))
+
+
+def isBuffered():
+    """
+    :returns: True, if the log output of the current thread is buffered
+    :rtype: bool
+    """
+    return getattr(_thread_buffer, 'records', None) is not None
+
+
+def callBuffered(function, *args, **kwargs):
+    """
+    Call 'function' and buffer its log output in the current thread instead of printing it.
+    Used to run tasks concurrently and print their output in a deterministic order with 'replay'.
+
+    :param function: The function to call
+    :param `*args`: Arguments of the function
+    :param `*kwargs`: Keyword arguments of the function
+    :returns: The buffered records, the return value of 'function' and the raised exception ('None' on success)
+    :rtype: tuple(list, object, BaseException)
+    """
+    _thread_buffer.records = []
+    try:
+        return _thread_buffer.records, function(*args, **kwargs), None
+    except BaseException as e:
+        return _thread_buffer.records, None, e
+    finally:
+        _thread_buffer.records = None
+        # Worker threads are reused, phases must not extend into the next task
+        timing.endPhases()
+
+
+def replay(records):
+    """
+    Prints buffered log records
+
+    :param records: Records returned by 'callBuffered'
+    :type records: list
+    """
+    for level, message, kwargs in records:
+        _log(level, message, **kwargs)
+
+
 def error(*args):
     """
     Prints and error message and exits the process
@@ -44,7 +99,7 @@ def warn(*args, **kwargs):
     :param `*args`: The message to be printed
     :param `*kwargs`: Additional arguments for the print function
     """
-    logger.warn(colored(*args, 'yellow'), **kwargs)
+    _log(logging.WARNING, colored(*args, 'yellow'), **kwargs)
 
 
 def status(*status, **kwargs):
@@ -54,7 +109,8 @@ def status(*status, **kwargs):
     :param `*status`: The message to be printed
     :param `*kwargs`: Additional arguments for the print function
     """
-    logger.info(colored('--> ', 'green') + colored(*status, 'green'), **kwargs)
+    timing.phase(*status, timing.STATUS)
+    _log(logging.INFO, colored('--> ', 'green') + colored(*status, 'green'), **kwargs)
 
 
 def prefixStatus(prefix, *status, **kwargs):
@@ -65,7 +121,8 @@ def prefixStatus(prefix, *status, **kwargs):
     :param `*status`: The message to be printed
     :param `*kwargs`: Additional arguments for the print function
     """
-    logger.info(colored(prefix + ':\n', 'magenta') + colored('--> ', 'blue') + colored(*status, 'blue'), **kwargs)
+    _log(logging.INFO, colored(prefix + ':\n', 'magenta') + colored('--> ', 'blue') + colored(*status, 'blue'),
+         **kwargs)
 
 
 def info(*args, **kwargs):
@@ -75,7 +132,7 @@ def info(*args, **kwargs):
     :param `*args`: The message to be printed
     :param `*kwargs`: Additional arguments for the print function
     """
-    logger.debug(colored(*args, 'magenta'), **kwargs)
+    _log(logging.DEBUG, colored(*args, 'magenta'), **kwargs)
 
 
 def title(*args, **kwargs):
@@ -85,7 +142,8 @@ def title(*args, **kwargs):
     :param `*args`: The title to be printed
     :param `*kwargs`: Additional arguments for the print function
     """
-    logger.info(colored(*args, 'cyan', attrs=['bold']), **kwargs)
+    timing.phase(*args, timing.TITLE)
+    _log(logging.INFO, colored(*args, 'cyan', attrs=['bold']), **kwargs)
 
 
 def packages(packages, **kwargs):
@@ -96,4 +154,4 @@ def packages(packages, **kwargs):
     :param `*args`: The message to be printed
     :param `*kwargs`: Additional arguments for the print function
     """
-    logger.debug(colored("[{}]".format(', '.join(sorted(packages, key=lambda x: x.lower()))), 'blue'), **kwargs)
+    _log(logging.DEBUG, colored("[{}]".format(', '.join(sorted(packages, key=lambda x: x.lower()))), 'blue'), **kwargs)
@@ -5,37 +5,57 @@
 # Affiliation:  ANYbotics
 
 import argparse
+import importlib
 import sys
 import os
 
+import brahma.completion as completion
 import brahma.log as log
-import brahma.utils as utils
+import brahma.server as server
+import brahma.summary as summary
+import brahma.timing as timing
+import brahma.workspace_info as workspace_info
 
 from brahma.BrahmaWorkspacePaths import BrahmaWorkspacePaths as BrahmaWorkspacePaths
 from brahma.BrahmaWorkspaceSettings import BrahmaWorkspaceSettings as BrahmaWorkspaceSettings
 
-import brahma.brahma_config as brahma_config
-import brahma.brahma_create as brahma_create
-import brahma.brahma_init as brahma_init
-import brahma.brahma_update as brahma_update
-import brahma.brahma_info as brahma_info
-import brahma.brahma_clean as brahma_clean
-
-# Setup verbs
-verbs = ['create', 'init', 'config', 'update', 'setup', 'info', 'clean']
-
-
-def brahma_main():
+# Verb registry, maps the verbs to their module and description. The module of a verb is only imported when the verb
+# is dispatched, such that '--help' and light verbs do not pay for importing catkin and git. 'setup' is handled here.
+VERB_REGISTRY = {
+    'create': ('brahma.brahma_create', 'Create a new workspace.'),
+    'init': ('brahma.brahma_init', 'Initialize the workspace.'),
+    'config': ('brahma.brahma_config', 'Configure the workspace.'),
+    'update': ('brahma.brahma_update', 'Update the workspace.'),
+    'setup': (None, 'Create the default configuration.'),
+    'info': ('brahma.brahma_info', 'Print infos about the workspace.'),
+    'clean': ('brahma.brahma_clean', 'Clean packages.'),
+    'gc': ('brahma.brahma_gc', 'Delete the build spaces of cleaned packages.'),
+    'serve': ('brahma.brahma_serve', 'Keep the workspace model in memory and run the verbs of other brahma calls.'),
+    'watch': ('brahma.brahma_watch', 'Update the workspace whenever the source repositories change.'),
+    'cache': ('brahma.brahma_cache', 'Print the statistics of the compiler cache.'),
+}
+verbs = list(VERB_REGISTRY)
+
+
+def brahma_main(argv=None, forward=True):
     """
     Main function of the brahma script.
     Calls fucntions depending on the selected verb.
+
+    :param argv: Command line arguments, 'None' for the arguments of the process
+    :type argv: list(str)
+    :param forward: Forward the verb to the server of the workspace (brahma serve), if it is running
+    :type forward: bool
     """
+    argv = sys.argv[1:] if argv is None else argv
+
+    # Fast path for the shell integration, answers 'brahma info' from the precomputed workspace info
+    if argv[0:1] == ['info'] and workspace_info.printInfo(argv[1:]):
+        return
+
     # Use main parser to determine verb
-    main_parser = argparse.ArgumentParser(
-        description='brahma is a managing tool for catkin workspaces that are version controlled with git.\n',
-        formatter_class=argparse.RawTextHelpFormatter)
-    main_parser.add_argument("verb", help=', '.join(verbs))
-    main_args = main_parser.parse_args(sys.argv[1:2])
+    main_parser = setupMainParser()
+    main_args = main_parser.parse_args(argv[0:1])
     verb = main_args.verb
 
     # Error on no verb provided
@@ -48,29 +68,16 @@ def brahma_main():
         log.error("Unknown verb '{0}' provided.".format(main_args.verb))
         main_parser.print_help()
 
-    # Create default config
+    # Create default config and the shell completion data
     if verb == verbs[4]:
         BrahmaWorkspaceSettings().createDefaultConfiguration(True)
+        updateCompletionCache(main_parser, force=True)
         return
 
     # Parse verb arguments
-    if verb == verbs[0]:  # Create
-        parser = brahma_create.setup_parser()
-    elif verb == verbs[1]:  # Init
-        parser = brahma_init.setup_parser()
-    elif verb == verbs[2]:  # Config
-        parser = brahma_config.setup_parser()
-    elif verb == verbs[3]:  # Update
-        parser = brahma_update.setup_parser()
-    elif verb == verbs[5]:  # Source
-        parser = brahma_info.setup_parser()
-    elif verb == verbs[6]:  # Clean
-        parser = brahma_clean.setup_parser()
-
-    # Common arguments
-    parser.add_argument("workspace", help='Full path of the workspace.', nargs='?', default=None)
-    parser.add_argument('--quiet', '-q', help='Disable verbose output.', action='store_true')
-    args = parser.parse_args(sys.argv[2:])
+    verb_module = loadVerb(verb)
+    parser = addCommonArguments(verb_module.setup_parser())
+    args = parser.parse_args(argv[1:])
 
     # Get workspace path
     if verb == verbs[0]:
@@ -83,7 +90,7 @@ def brahma_main():
         if not args.workspace:
             args.workspace = os.getcwd()
 
-        workspace_path = utils.getWorkspacePath(args.workspace)
+        workspace_path = workspace_info.findWorkspacePath(args.workspace)
         # Init does not necessarily have a config file yet use provided folder
         if not workspace_path and verb == verbs[1]:
             workspace_path = args.workspace
@@ -92,6 +99,12 @@ def brahma_main():
         if not workspace_path or not os.path.isdir(workspace_path):
             log.error("Could not find workspace.")
 
+        # Run the verb in the server of the workspace, which keeps the workspace model in memory
+        if forward and verb in server.FORWARDED_VERBS:
+            exit_code = server.forward(workspace_path, argv)
+            if exit_code is not None:
+                sys.exit(exit_code)
+
     # Get settings from default configuration
     settings = BrahmaWorkspaceSettings()
     settings.loadConfiguration()
@@ -100,25 +113,98 @@ def brahma_main():
     paths = BrahmaWorkspacePaths(workspace_path)
 
     # IMPORTANT: No info output before this point, otherwise brahma info breaks.
-    utils.createDirectory(paths.log(), True)
+    os.makedirs(paths.log(), exist_ok=True)
     log.setupLogger(args.quiet, paths.log(), "brahma")
 
+    # Regenerate the shell completion data after brahma was installed or updated
+    updateCompletionCache(main_parser)
+
     # Execute action
-    if verb == verbs[0]:  # Create
-        brahma_create.run(paths, settings, args)
-    elif verb == verbs[1]:  # Init
-        brahma_init.run(paths, settings, args)
-    elif verb == verbs[2]:  # Config
-        brahma_config.run(paths, settings, args)
-    elif verb == verbs[3]:  # Update
-        brahma_update.run(paths, settings, args)
-    elif verb == verbs[5]:  # Info
-        brahma_info.run(paths, settings, args)
-    elif verb == verbs[6]:  # Clean
-        brahma_clean.run(paths, settings, args)
+    verb_module.run(paths, settings, args)
+
+    # Report timing
+    timing.finish()
+    printTimingSummary()
+    if args.trace:
+        log.info('Wrote trace to {}'.format(timing.writeTrace(paths.traceDirectory(), verb)))
     log.title('Done')
 
 
+def setupMainParser():
+    """
+    :returns: Parser that determines the verb
+    :rtype: argparse.ArgumentParser
+    """
+    main_parser = argparse.ArgumentParser(
+        description='brahma is a managing tool for catkin workspaces that are version controlled with git.\n',
+        formatter_class=argparse.RawTextHelpFormatter)
+    main_parser.add_argument("verb", help='\n'.join('{:8}{}'.format(verb, VERB_REGISTRY[verb][1]) for verb in verbs))
+    return main_parser
+
+
+def addCommonArguments(parser):
+    """
+    Add the arguments shared by all verbs.
+
+    :param parser: Parser of a verb
+    :type parser: argparse.ArgumentParser
+    :returns: The parser
+    :rtype: argparse.ArgumentParser
+    """
+    parser.add_argument("workspace", help='Full path of the workspace.', nargs='?', default=None)
+    parser.add_argument('--quiet', '-q', help='Disable verbose output.', action='store_true')
+    parser.add_argument('--trace', help='Write a Chrome trace of the timed phases to .brahma/trace.', action='store_true')
+    return parser
+
+
+def updateCompletionCache(main_parser, force=False):
+    """
+    Write the verbs and options of the shell completion, if they are missing or outdated. Imports all verb modules.
+
+    :param main_parser: Parser that determines the verb
+    :type main_parser: argparse.ArgumentParser
+    :param force: Write the completion data even if it is up to date
+    :type force: bool
+    """
+    if not force and completion.isCompletionCacheUpToDate():
+        return
+    verb_parsers = dict()
+    for verb in verbs:
+        if VERB_REGISTRY[verb][0] is None:
+            verb_parsers[verb] = argparse.ArgumentParser(prog='brahma ' + verb)
+        else:
+            verb_parsers[verb] = addCommonArguments(loadVerb(verb).setup_parser())
+    completion.writeCompletionCache(main_parser, verb_parsers)
+
+
+def loadVerb(verb):
+    """
+    Import the module of a verb. The module provides 'setup_parser()' and 'run(paths, settings, args)'.
+
+    :param verb: One of 'verbs'
+    :type verb: str
+    :returns: Module of the verb
+    :rtype: module
+    """
+    return importlib.import_module(VERB_REGISTRY[verb][0])
+
+
+def printTimingSummary():
+    """
+    Print the time spent in the phases and the timed calls of the executed verb.
+    """
+    phases, calls = timing.summary()
+    if not phases and not calls:
+        return
+    log.title('Timing')
+    for level, name, count, total in phases:
+        summary.entry('  ' * level + name, '{:8.3f} s'.format(total) + (' ({}x)'.format(count) if count > 1 else ''))
+    if calls:
+        log.info("-" * 50)
+    for name, count, total in calls:
+        summary.entry(name, '{:8.3f} s ({}x)'.format(total, count))
+
+
 if __name__ == '__main__':
     try:
         brahma_main()
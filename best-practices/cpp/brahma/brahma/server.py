@@ -0,0 +1,238 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+# Server of 'brahma serve' and its client. The client forwards the command line, the working directory and the
+# environment as a single JSON line. The server runs the verb in its process and answers with JSON lines holding the
+# output ('stdout', 'stderr') and finally the exit code ('exit'). Requests are handled one at a time.
+#
+# Only the verbs in FORWARDED_VERBS run in the server. 'update' and 'info' are the verbs that profit from the model in
+# memory, they are run after every checkout. The other verbs stay in the calling process: 'create', 'init', 'config',
+# 'clean' and 'gc' change the workspace, the settings or the build spaces behind the back of the model, and 'serve' and
+# 'watch' run indefinitely and would block the server.
+
+import fcntl
+import io
+import json
+import os
+import selectors
+import socket
+import sys
+import threading
+import traceback
+
+import brahma.log as log
+import brahma.timing as timing
+from brahma.BrahmaWorkspacePaths import SERVER_SOCKET_FILE
+
+# Unix socket paths are limited to 108 bytes including the terminating null byte
+_MAX_SOCKET_PATH = 107
+# Verbs run by the server, see above
+FORWARDED_VERBS = ('update', 'info')
+# Worker threads of a verb write to the client concurrently
+_send_lock = threading.Lock()
+
+
+def forward(workspace_path, argv):
+    """
+    Run a command in the server of the workspace.
+
+    :param workspace_path: Root path of the workspace
+    :type workspace_path: str
+    :param argv: Command line arguments of brahma
+    :type argv: list(str)
+    :returns: Exit code of the command, 'None' if no server is running
+    :rtype: int
+    """
+    socket_file = os.path.join(workspace_path, '.brahma', SERVER_SOCKET_FILE)
+    if not os.path.exists(socket_file):
+        return None
+    try:
+        client = _connect(socket_file)
+    except OSError:
+        return None  # Server is not running anymore
+    with client, client.makefile('r', encoding='utf-8') as responses:
+        _send(client, {'argv': argv, 'cwd': os.getcwd(), 'env': dict(os.environ), 'isatty': sys.stdout.isatty()})
+        for line in responses:
+            response = json.loads(line)
+            if 'stdout' in response:
+                sys.stdout.write(response['stdout'])
+                sys.stdout.flush()
+            elif 'stderr' in response:
+                sys.stderr.write(response['stderr'])
+                sys.stderr.flush()
+            elif 'exit' in response:
+                return response['exit']
+    log.error("The brahma server closed the connection.")
+
+
+def stop(workspace_path):
+    """
+    Stop the server of the workspace.
+
+    :param workspace_path: Root path of the workspace
+    :type workspace_path: str
+    :returns: True, if a server was stopped
+    :rtype: bool
+    """
+    try:
+        client = _connect(os.path.join(workspace_path, '.brahma', SERVER_SOCKET_FILE))
+    except OSError:
+        return False
+    with client, client.makefile('r', encoding='utf-8') as responses:
+        _send(client, {'stop': True})
+        return any('exit' in json.loads(line) for line in responses)
+
+
+def serve(paths, model, run_command):
+    """
+    Serve the workspace until a stop request is received. Only one server can run per workspace.
+
+    :param paths: Paths of the workspace
+    :type paths: BrahmaWorkspacePaths
+    :param model: Workspace model, events are processed while waiting for requests
+    :type model: WorkspaceModel
+    :param run_command: Function running a command line in this process, returns the exit code
+    :type run_command: function
+    """
+    with open(paths.serverLockFile(), 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            log.error("A brahma server is already running for workspace {}.".format(paths.workspace))
+
+        # A socket file left by a crashed server is replaced
+        socket_file = paths.serverSocket()
+        if os.path.exists(socket_file):
+            os.remove(socket_file)
+        server = _listen(socket_file)
+        log.info("Listening on {}".format(socket_file))
+
+        with server, selectors.DefaultSelector() as selector:
+            selector.register(server, selectors.EVENT_READ)
+            if model.isWatching():
+                selector.register(model, selectors.EVENT_READ)
+            try:
+                stopped = False
+                while not stopped:
+                    for key, _ in selector.select():
+                        if key.fileobj is model:
+                            model.takeChanges()
+                        else:
+                            connection, _ = server.accept()
+                            with connection:
+                                stopped = _handleRequest(connection, run_command)
+            finally:
+                os.remove(socket_file)
+
+
+def _handleRequest(connection, run_command):
+    # Returns True, if the server was asked to stop
+    with connection.makefile('r', encoding='utf-8') as requests:
+        line = requests.readline()
+    try:
+        request = json.loads(line)
+    except ValueError:
+        return False
+    if request.get('stop'):
+        log.info("Stopping the server")
+        _send(connection, {'exit': 0})
+        return True
+
+    if request['argv'][0:1] and request['argv'][0] not in FORWARDED_VERBS:
+        _send(connection, {'stderr': "The brahma server does not run '{}'.\n".format(request['argv'][0])})
+        _send(connection, {'exit': 1})
+        return False
+
+    log.info("Running 'brahma {}'".format(' '.join(request['argv'])))
+    saved_streams = sys.stdout, sys.stderr
+    saved_environment = dict(os.environ)
+    saved_cwd = os.getcwd()
+    saved_handlers = log.logger.handlers[:]
+    log.logger.handlers[:] = []
+    exit_code = 1
+    try:
+        sys.stdout = _ClientStream(connection, 'stdout', request['isatty'])
+        sys.stderr = _ClientStream(connection, 'stderr', request['isatty'])
+        os.environ.clear()
+        os.environ.update(request['env'])
+        os.chdir(request['cwd'])
+        timing.reset()
+        exit_code = run_command(request['argv'])
+    except SystemExit as e:
+        if isinstance(e.code, str):
+            sys.stderr.write(e.code + '\n')
+        exit_code = e.code if isinstance(e.code, int) else int(e.code is not None)
+    except OSError as e:
+        if not isinstance(e, BrokenPipeError):
+            traceback.print_exc()
+    except Exception:
+        traceback.print_exc()
+    finally:
+        sys.stdout, sys.stderr = saved_streams
+        os.environ.clear()
+        os.environ.update(saved_environment)
+        os.chdir(saved_cwd)
+        for handler in log.logger.handlers:
+            handler.close()
+        log.logger.handlers[:] = saved_handlers
+        # The spans of the verb are reported to the client only
+        timing.reset()
+    try:
+        _send(connection, {'exit': exit_code or 0})
+    except OSError:
+        log.warn("The client disconnected")
+    log.info("Finished with exit code {}".format(exit_code or 0))
+    return False
+
+
+class _ClientStream(io.TextIOBase):
+    """
+    Text stream forwarding the written output to the client.
+    """
+
+    def __init__(self, connection, name, isatty):
+        self._connection = connection
+        self._name = name
+        self._isatty = isatty
+
+    def write(self, data):
+        _send(self._connection, {self._name: data})
+        return len(data)
+
+    def isatty(self):
+        return self._isatty
+
+
+def _send(connection, message):
+    with _send_lock:
+        connection.sendall((json.dumps(message) + '\n').encode('utf-8'))
+
+
+def _connect(socket_file):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        _withSocketAddress(socket_file, client.connect)
+    except OSError:
+        client.close()
+        raise
+    return client
+
+
+def _listen(socket_file):
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    _withSocketAddress(socket_file, server.bind)
+    server.listen()
+    return server
+
+
+def _withSocketAddress(socket_file, function):
+    # Long socket paths are shortened by addressing the socket relative to an open file descriptor of its directory
+    if len(os.fsencode(socket_file)) <= _MAX_SOCKET_PATH:
+        return function(socket_file)
+    dir_fd = os.open(os.path.dirname(socket_file), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        return function('/proc/self/fd/{}/{}'.format(dir_fd, os.path.basename(socket_file)))
+    finally:
+        os.close(dir_fd)
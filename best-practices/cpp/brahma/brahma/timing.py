@@ -0,0 +1,180 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import functools
+import json
+import os
+import threading
+import time
+
+# Phase levels, a title phase ends the status phases it contains
+TITLE = 0
+STATUS = 1
+
+# Completed spans (name, category, parent phase, thread id, thread name, start, end)
+_spans = []
+_lock = threading.Lock()
+# Open phases of the current thread, indexed by level
+_open_phases = threading.local()
+_finished = False
+
+
+def phase(name, level):
+    """
+    Start a phase in the current thread. Ends the open phase of the same and all lower levels.
+    Called by log.title and log.status, which mark the phase boundaries of a verb.
+
+    :param name: Name of the phase
+    :type name: str
+    :param level: Level of the phase (TITLE or STATUS)
+    :type level: int
+    """
+    if _finished:
+        return
+    now = time.perf_counter()
+    endPhases(level, now)
+    phases = _phases()
+    parent = phases[level - 1][0] if level - 1 in phases else None
+    phases[level] = (name, parent, now)
+
+
+def endPhases(level=TITLE, now=None):
+    """
+    End the open phases of the current thread with at least 'level'.
+
+    :param level: Lowest level of the phases to end
+    :type level: int
+    :param now: End time of the phases, 'None' for the current time
+    :type now: float
+    """
+    phases = _phases()
+    now = now if now is not None else time.perf_counter()
+    for phase_level in sorted(phases.keys(), reverse=True):
+        if phase_level >= level:
+            name, parent, start = phases.pop(phase_level)
+            _record(name, 'phase', parent, start, now)
+
+
+def timed(name=None):
+    """
+    Decorator that records the duration of every call of the decorated function.
+
+    :param name: Name of the span, 'None' for the qualified function name
+    :type name: str
+    """
+
+    def decorator(function):
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _record(span_name, 'call', None, start, time.perf_counter())
+
+        return wrapper
+
+    return decorator
+
+
+def finish():
+    """
+    End all open phases of the current thread and stop recording.
+    """
+    global _finished
+    endPhases()
+    _finished = True
+
+
+def reset():
+    """
+    Drop the recorded spans and the open phases of the current thread and restart recording.
+    Used by processes running multiple verbs (brahma serve).
+    """
+    global _finished
+    with _lock:
+        del _spans[:]
+    _phases().clear()
+    _finished = False
+
+
+def summary():
+    """
+    Aggregated durations of the recorded phases and calls, in order of their first occurrence.
+    Status phases follow the title phase they are part of.
+
+    :returns: Phase rows (level, name, count, total seconds) and call rows (name, count, total seconds)
+    :rtype: tuple(list(tuple(int,str,int,float)),list(tuple(str,int,float)))
+    """
+    phases = dict()
+    children = dict()
+    calls = dict()
+    with _lock:
+        spans = sorted(_spans, key=lambda span: span[5])
+    for name, category, parent, _, _, start, end in spans:
+        if category == 'phase':
+            aggregate = children.setdefault(parent, dict()) if parent is not None else phases
+            count, total = aggregate.get(name, (0, 0.0))
+            aggregate[name] = (count + 1, total + end - start)
+        else:
+            count, total = calls.get(name, (0, 0.0))
+            calls[name] = (count + 1, total + end - start)
+
+    phase_rows = list()
+    for name, (count, total) in phases.items():
+        phase_rows.append((TITLE, name, count, total))
+        phase_rows.extend((STATUS, child, child_count, child_total)
+                          for child, (child_count, child_total) in children.pop(name, dict()).items())
+    # Status phases without a title phase
+    for parent_children in children.values():
+        phase_rows.extend((STATUS, child, count, total) for child, (count, total) in parent_children.items())
+    return phase_rows, [(name, count, total) for name, (count, total) in calls.items()]
+
+
+def writeTrace(trace_dir, verb):
+    """
+    Write the recorded spans as Chrome trace (chrome://tracing, Perfetto) JSON file.
+
+    :param trace_dir: Directory of the trace files, created if missing
+    :type trace_dir: str
+    :param verb: Verb that was traced, used as file name prefix
+    :type verb: str
+    :returns: Path of the trace file
+    :rtype: str
+    """
+    os.makedirs(trace_dir, exist_ok=True)
+    pid = os.getpid()
+    events = list()
+    thread_names = dict()
+    with _lock:
+        spans = list(_spans)
+    origin = min((span[5] for span in spans), default=0.0)
+    for name, category, _, thread_id, thread_name, start, end in spans:
+        thread_names[thread_id] = thread_name
+        events.append({'name': name, 'cat': category, 'ph': 'X', 'pid': pid, 'tid': thread_id,
+                       'ts': round((start - origin) * 1e6), 'dur': round((end - start) * 1e6)})
+    for thread_id, thread_name in thread_names.items():
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': thread_id,
+                       'args': {'name': thread_name}})
+    trace_file = os.path.join(trace_dir, '{}-{}.json'.format(verb, time.strftime('%Y%m%d-%H%M%S')))
+    with open(trace_file, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms',
+                   'otherData': {'verb': verb, 'wall_time': time.time()}}, f)
+    return trace_file
+
+
+def _phases():
+    phases = getattr(_open_phases, 'phases', None)
+    if phases is None:
+        phases = _open_phases.phases = dict()
+    return phases
+
+
+def _record(name, category, parent, start, end):
+    thread = threading.current_thread()
+    with _lock:
+        _spans.append((name, category, parent, thread.ident, thread.name, start, end))
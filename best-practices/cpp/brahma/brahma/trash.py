@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+import errno
+import fcntl
+import os
+import shutil
+import subprocess
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Lock file of the reaper, only one process empties a trash directory at a time
+TRASH_LOCK_FILE = ".lock"
+
+
+def moveToTrash(path, trash_dir):
+    """
+    Atomically move 'path' into the trash directory. Falls back to deleting 'path' if the trash directory is on
+    another filesystem.
+
+    :param path: File or directory to delete
+    :type path: str
+    :param trash_dir: Trash directory, created if missing
+    :type trash_dir: str
+    :returns: True, if 'path' was moved to the trash, False if it was deleted
+    :rtype: bool
+    """
+    os.makedirs(trash_dir, exist_ok=True)
+    trash_path = os.path.join(trash_dir, '{}.{}'.format(os.path.basename(path), uuid.uuid4().hex[:8]))
+    try:
+        os.rename(path, trash_path)
+        return True
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+    shutil.rmtree(path, ignore_errors=True)
+    return False
+
+
+def emptyTrash(trash_dir, jobs=4):
+    """
+    Delete all entries of the trash directory in parallel. Waits if another process is emptying the trash.
+
+    :param trash_dir: Trash directory
+    :type trash_dir: str
+    :param jobs: Number of entries that are deleted at the same time
+    :type jobs: int
+    :returns: Number of deleted entries
+    :rtype: int
+    """
+    if not os.path.isdir(trash_dir):
+        return 0
+    with open(os.path.join(trash_dir, TRASH_LOCK_FILE), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        # Entries might be added while deleting, entries that can not be deleted are only tried once
+        attempted = set()
+        entries = _trashEntries(trash_dir)
+        while entries:
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+                list(executor.map(_delete, entries))
+            attempted.update(entries)
+            entries = [entry for entry in _trashEntries(trash_dir) if entry not in attempted]
+        return len(attempted)
+
+
+def startReaper(trash_dir):
+    """
+    Empty the trash directory in a detached background process, which outlives the current process.
+
+    :param trash_dir: Trash directory
+    :type trash_dir: str
+    """
+    subprocess.Popen([sys.executable, '-m', 'brahma.trash', trash_dir], stdin=subprocess.DEVNULL,
+                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+                     cwd='/', env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+
+
+def _trashEntries(trash_dir):
+    return [os.path.join(trash_dir, entry) for entry in os.listdir(trash_dir) if entry != TRASH_LOCK_FILE]
+
+
+def _delete(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+if __name__ == '__main__':
+    emptyTrash(sys.argv[1])
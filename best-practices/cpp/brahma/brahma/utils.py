@@ -3,32 +3,16 @@
 # Author:       Gabriel Hottiger
 # Affiliation:  ANYbotics
 
-import em
+import hashlib
 import os
 import re
 import shutil
-import sys
-
-from catkin_pkg import packages as catkin_pkgs
-from catkin_pkg.packages import find_packages
-from catkin_pkg.topological_order import topological_order_packages
-from catkin_pkg.topological_order import topological_order
-
-from catkin_tools.common import get_recursive_build_depends_in_workspace
-from catkin_tools.common import get_recursive_run_depends_in_workspace
-from catkin_tools.common import get_recursive_build_dependents_in_workspace
-from catkin_tools.common import get_recursive_run_dependents_in_workspace
 
 import brahma.log as log
-from brahma.CatkinToolsOptions import CatkinToolsOptions
-from brahma.CatkinWorkspace import CatkinWorkspace
-
-try:
-    import git
-    from git import Repo
-except:
-    log.error(
-        "The current directory does not exist in the base branch. Try to run the command from the root of your brahma workspace.")
+import brahma.timing as timing
+import brahma.workspace_info as workspace_info
+from brahma.GitChangeSet import GitChangeSet
+from brahma.LinkManifest import LinkManifest
 
 
 ###########################
@@ -45,12 +29,7 @@ def getWorkspacePath(dir):
     :returns: Root path of the workspace of which 'dir' is part of, 'None' if 'dir' is not part of a workspace
     :rtype: str
     """
-    path = os.path.abspath(os.path.realpath(dir))
-    while path != "/":
-        if os.path.isdir(path + "/.brahma"):
-            return path
-        path = os.path.dirname(path)
-    return None
+    return workspace_info.findWorkspacePath(dir)
 
 
 def createDirectory(dir, force):
@@ -69,6 +48,77 @@ def createDirectory(dir, force):
         os.makedirs(dir)
 
 
+def hashFile(file):
+    """
+    Hash the content of a file.
+
+    :param file: Path of the file
+    :type file: str
+    :returns: Hash of the file content, 'None' if the file does not exist
+    :rtype: str
+    """
+    if not os.path.isfile(file):
+        return None
+    with open(file, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def getDirectoryFingerprint(dir):
+    """
+    Cheap fingerprint of a directory. It changes if entries are added to or removed from the directory.
+
+    :param dir: Path of the directory
+    :type dir: str
+    :returns: Modification time of the directory, 'None' if the directory does not exist
+    :rtype: str
+    """
+    try:
+        return str(os.stat(dir).st_mtime_ns)
+    except OSError:
+        return None
+
+
+def writeFileIfChanged(file, content):
+    """
+    Atomically replace 'file' with 'content'. The file is not touched if its content is identical, such that tools
+    watching the file (e.g. IDEs) do not reload it.
+
+    :param file: Path of the file
+    :type file: str
+    :param content: New content of the file
+    :type content: str or bytes
+    :returns: True, if the file was written
+    :rtype: bool
+    """
+    data = content.encode() if isinstance(content, str) else content
+    try:
+        with open(file, 'rb') as f:
+            if f.read() == data:
+                return False
+    except OSError:
+        pass
+    tmp_file = file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_file, file)
+    return True
+
+
+def copyFileIfChanged(source_file, destination_file):
+    """
+    Copy 'source_file' to 'destination_file' if their content differs (see writeFileIfChanged).
+
+    :param source_file: Path of the file to copy
+    :type source_file: str
+    :param destination_file: Path of the copy
+    :type destination_file: str
+    :returns: True, if the destination file was written
+    :rtype: bool
+    """
+    with open(source_file, 'rb') as f:
+        return writeFileIfChanged(destination_file, f.read())
+
+
 def updateSymlink(path, destination_dir):
     """
     Update (delete and recreate) a symlink to 'path' in 'destination_dir'
@@ -84,7 +134,79 @@ def updateSymlink(path, destination_dir):
     os.symlink(os.path.relpath(path, destination_dir), destination_folder)
 
 
-def updateAndCleanPackages(packages, catkin_ws, packages_dir):
+def exchangePaths(path_a, path_b):
+    """
+    Atomically exchange two paths on the same filesystem (renameat2 with RENAME_EXCHANGE).
+
+    :param path_a: First path
+    :type path_a: str
+    :param path_b: Second path
+    :type path_b: str
+    :returns: True, if the paths were exchanged, False if the system or filesystem does not support it
+    :rtype: bool
+    :raises OSError: If the paths exist but can not be exchanged
+    """
+    import ctypes
+    import ctypes.util
+    import errno
+    at_fdcwd, rename_exchange = -100, 2
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        renameat2 = libc.renameat2
+    except (OSError, AttributeError):
+        return False
+    if renameat2(at_fdcwd, os.fsencode(path_a), at_fdcwd, os.fsencode(path_b), rename_exchange) == 0:
+        return True
+    error = ctypes.get_errno()
+    if error in (errno.EINVAL, errno.ENOSYS, errno.ENOTSUP):
+        return False
+    raise OSError(error, os.strerror(error), path_a)
+
+
+@timing.timed()
+def replaceSymlinks(source_space, current_links, new_links, in_place=False):
+    """
+    Replace the symbolic links in 'source_space'. The new links are created in a staging directory next to it, which is
+    swapped into place atomically, such that builds never see a partially updated source space. The links are changed
+    in place if requested or if the system can not exchange directories.
+
+    :param source_space: Directory containing only the symbolic links
+    :type source_space: str
+    :param current_links: Link target per name of the links in 'source_space'
+    :type current_links: dict(str,str)
+    :param new_links: Link target per name of the links to create
+    :type new_links: dict(str,str)
+    :param in_place: Change the links in place instead of swapping a staging directory
+    :type in_place: bool
+    :returns: True, if a staging directory was swapped into place
+    :rtype: bool
+    """
+    swapped = False
+    if not in_place:
+        staging_dir = os.path.join(os.path.dirname(source_space), '.' + os.path.basename(source_space) + '.staging')
+        # A staging directory left by an interrupted update only contains links
+        if os.path.lexists(staging_dir):
+            shutil.rmtree(staging_dir)
+        os.mkdir(staging_dir)
+        try:
+            for name, target in new_links.items():
+                os.symlink(target, os.path.join(staging_dir, name))
+            # Afterwards the staging directory holds the previous links
+            swapped = exchangePaths(staging_dir, source_space)
+        finally:
+            shutil.rmtree(staging_dir)
+    if not swapped:
+        for name, target in current_links.items():
+            if new_links.get(name) != target:
+                os.unlink(os.path.join(source_space, name))
+        for name, target in new_links.items():
+            if current_links.get(name) != target:
+                os.symlink(target, os.path.join(source_space, name))
+    return swapped
+
+
+@timing.timed()
+def updateAndCleanPackages(packages, catkin_ws, package_index, trash_dir=None, manifest_file=None):
     """
     Remove all symlinks in 'catkin_ws' and add new symlinks to all 'packages'
 
@@ -92,10 +214,22 @@ def updateAndCleanPackages(packages, catkin_ws, packages_dir):
     :type packages: dict(str,catkin_pkg.Package)
     :param catkin_ws: Catkin workspace handle.
     :type catkin_ws: CatkinWorkspace
-    """
+    :param package_index: Index of the packages in the source directory.
+    :type package_index: PackageIndex
+    :param trash_dir: Trash directory for the build spaces of cleaned packages, 'None' to delete them immediately
+    :type trash_dir: str
+    :param manifest_file: Manifest of the links in the source space, 'None' to read the links from the source space
+    :type manifest_file: str
+    """
+    source_space = catkin_ws.sourceSpace()
+    manifest = LinkManifest()
+    manifest.load(manifest_file, source_space)
+    # Relative link target of every package
+    links = dict((name, os.path.relpath(os.path.dirname(package.filename), source_space))
+                 for name, package in packages.items())
+
     # Packages that are present in the current workspace
-    existing_packages = set([file for file in os.listdir(catkin_ws.sourceSpace())
-                             if os.path.islink(os.path.join(catkin_ws.sourceSpace(), file))])
+    existing_packages = set(manifest.links.keys())
     # Packages that are built in the current workspace (ignore catkin_tools_prebuild)
     built_packages = set(catkin_ws.getBuiltPackages().keys())
     if 'catkin_tools_prebuild' in built_packages:
@@ -110,12 +244,7 @@ def updateAndCleanPackages(packages, catkin_ws, packages_dir):
     kept_packages = set(existing_packages & set(packages.keys()))
 
     # Check for moved packages since the last update
-    moved_packages = set()
-    for pkg_name in kept_packages:
-        pkg_relative_path = os.readlink(os.path.join(catkin_ws.sourceSpace(), pkg_name))  # Is a relative symlink
-        pkg_path = os.path.abspath(os.path.realpath(os.path.join(catkin_ws.sourceSpace(), pkg_relative_path)))
-        if pkg_path != os.path.dirname(packages[pkg_name].filename):
-            moved_packages.add(pkg_name)
+    moved_packages = set(pkg_name for pkg_name in kept_packages if manifest.links[pkg_name] != links[pkg_name])
 
     log.status("Prepare cleaning of catkin workspace")
 
@@ -133,7 +262,7 @@ def updateAndCleanPackages(packages, catkin_ws, packages_dir):
 
     if changed_packages:
         log.info('Resolve downstream packages of newly added or removed packages.')
-        changed_packages_downstream_deps = getRecursiveDownstreamDependenciesFromNames(changed_packages, packages_dir)
+        changed_packages_downstream_deps = getRecursiveDownstreamDependenciesFromNames(changed_packages, package_index)
         existing_changed_packages_downstream_deps = (set(changed_packages_downstream_deps.keys()) & existing_packages)
         packages_to_clean = set(packages_to_clean | existing_changed_packages_downstream_deps)
         log.info('Resolved {} downstream packages of newly added or removed packages'.format(
@@ -146,60 +275,54 @@ def updateAndCleanPackages(packages, catkin_ws, packages_dir):
         log.status("Clean catkin workspace")
         log.info('Resolved {} packages to clean'.format(len(packages_to_clean)))
         log.packages(packages_to_clean)
-        catkin_ws.cleanPackages(list(packages_to_clean))
+        catkin_ws.cleanPackages(list(packages_to_clean), trash_dir)
 
     # Update symbolic links
     log.status('Update symbolic links')
-    for package_name in (removed_packages | moved_packages):
-        os.unlink(os.path.join(catkin_ws.sourceSpace(), package_name))
-
-    for package_name in (added_packages | moved_packages):
-        package = packages[package_name]
-        os.symlink(os.path.relpath(os.path.dirname(package.filename), catkin_ws.sourceSpace()),
-                   catkin_ws.sourceSpace() + "/" + package.name)
+    if removed_packages or added_packages or moved_packages:
+        if manifest.other_entries:
+            log.warn('The catkin source space contains entries that are not symbolic links [{}]. Updating the links '
+                     'in place.'.format(', '.join(manifest.other_entries)))
+            replaceSymlinks(source_space, manifest.links, links, in_place=True)
+        elif not replaceSymlinks(source_space, manifest.links, links):
+            log.info('Atomic directory exchange is not supported, updated the links in place.')
+    manifest.links = links
+    if manifest_file is not None:
+        manifest.save(manifest_file, source_space)
 
 
 ###########################
 ### File diff utils     ###
 ###########################
 
+@timing.timed()
 def getDiffToBaseBranch(repo, base_branch):
     """
-    Returns a list of changed files by comparing the current repository state against a 'base_branch'.
+    Returns the changes of the current repository state compared to a 'base_branch'.
     This includes untracked and unstaged changes.
 
     :param repo: Git repository
     :type repo: git.Repo
     :param base_branch: Branch against which the current state should be compared
     :type base_branch: str
-    :returns: A list of edited files (all files in git diff)
-    :rtype: list of str
+    :returns: The classified changes, 'files()' returns a list of all edited files
+    :rtype: GitChangeSet
     """
     log.info('Looking up diff to base branch {}.'.format(base_branch))
-    base_branch_commit = repo.commit(base_branch)
-    diffPaths = [item.a_path for item in repo.index.diff(base_branch_commit)] + \
-                [item.a_path for item in repo.index.diff(None)] + repo.untracked_files
-    git_root = repo.git.rev_parse("--show-toplevel")
-    diffPaths = [git_root + "/" + s for s in diffPaths]
-    return diffPaths
+    return GitChangeSet(os.path.realpath(repo.working_tree_dir), base_branch)
 
 
-def warnIfDeletedHeaders(repo, base_branch):
+def warnIfDeletedHeaders(change_set):
     """
-    Warn the user about changed headerfiles that were deleted in the current repo state but are present in the 'base_branch'.
+    Warn the user about header files that were deleted in the current repo state but are present in the base branch.
     This also includes unstaged changes.
 
-    :param repo: Git repository
-    :type repo: git.Repo
-    :param base_branch: Branch against which the current state should be compared
-    :type base_branch: str
+    :param change_set: Changes compared to the base branch
+    :type change_set: GitChangeSet
     """
     log.info(
-        'Checking diff to base branch {} for deleted headers.'.format(base_branch))
-    # Check uncommited files
-    headers = listHeadersInDiff(repo.index.diff(None), 'D')
-    # Check commited files (Check for added files -> direction of the diff is different)
-    headers = headers + listHeadersInDiff(repo.index.diff(repo.commit(base_branch)), 'A')
+        'Checking diff to base branch {} for deleted headers.'.format(change_set.base_branch))
+    headers = listHeaders(change_set.removedFiles())
 
     if headers:
         log.warn(
@@ -207,23 +330,17 @@ def warnIfDeletedHeaders(repo, base_branch):
         log.info('{}'.format("\n".join(headers)))
 
 
-def listHeadersInDiff(diff, change_type):
+def listHeaders(files):
     """
-    Returns a list of all header files in 'diff' that have the give 'change_type'
-    :param diff: Git diff to analyze
+    Returns a list of all header files in 'files'
 
-    :type diff: git.diff.DiffIndex
-    :param change_type: Change type see git.diff.DiffIndex.change_type for options
-    :type change_type: str
+    :param files: Files to filter
+    :type files: list(str)
     :returns: A list of header files
     :rtype: list(str)
     """
-    headers = []
     header_file_regex = re.compile('^.*(\.tpp|\.h|\.hh|\.hpp)$')
-    for item in diff.iter_change_type(change_type):
-        if header_file_regex.match(item.a_path):
-            headers.append(item.a_path)
-    return headers
+    return [file for file in files if header_file_regex.match(file)]
 
 
 ###########################
@@ -239,182 +356,127 @@ def getPackages(dir):
     :returns: A dictiornary of catkin packages
     :rtype: dict(str,catkin_pkg.Package)
     """
+    from catkin_pkg.packages import find_packages
     return find_packages(dir, exclude_subspaces=True, warnings=[])
 
 
-def getPackagePath(dir, package_name):
-    """
-    Returns the path of the package with name 'package_name'
-
-    :param dir: Directory in which catkin package is located
-    :type dir: str
-    :returns: Package path of package with name 'package_name'
-    :rtype: catkin_pkg.Package
-    """
-    return [pkg_path for pkg_path, p in getPackages(dir).items() if p.name == package_name]
-
-
-def getAllPackagesFromDirectory(package_dir):
-    """
-    Get dictionary of catkin packages from a directory.
-
-    :param package_dir: Directory in which packages are searched.
-    :type package_dir: str
-    :return: dict(str,catkin_pkg.Package)
-    """
-    packages = dict()
-    catkin_packages = getPackages(package_dir)
-    for path, catkin_package in catkin_packages.items():
-        packages[catkin_package.name] = catkin_package
-
-    return packages
-
-
-def getPackagesFromFileList(files, package_dir):
+@timing.timed()
+def getPackagesFromFileList(files, package_index):
     """
     Get dictionary of catkin packages from a list of file names.
 
     :param files: List of files
     :type files: list(str)
-    :param package_dir: Directory in which packages are searched.
-    :type package_dir: str
-    :returns: All catkin packages found in directory 'package_dir' for which a file is in 'files'
+    :param package_index: Index of the packages in the source directory.
+    :type package_index: PackageIndex
+    :returns: All catkin packages in 'package_index' for which a file is in 'files'
     :rtype: dict(str,catkin_pkg.Package)
     """
     log.info('Resolve packages from diff.')
     packages = dict()
-    catkin_packages = getPackages(package_dir)
     for file in files:
-        for path, catkin_package in catkin_packages.items():
-            if file.startswith(os.path.dirname(os.path.abspath(os.path.realpath(catkin_package["filename"]))) + '/'):
-                packages[catkin_package.name] = catkin_package
+        package = package_index.packageFromFile(file)
+        if package is not None:
+            packages[package.name] = package
 
     return packages
 
 
-def getPackagesFromPackageNames(package_names, package_dir):
+def getPackagesFromPackageNames(package_names, package_index):
     """
     Get set of catkin packages from a list of package names.
 
     :param package_names: List of package names.
     :type package_names: list(str)
-    :param package_dir: Directory in which packages are searched.
-    :type package_dir: str
-    :returns: All catkin packages found in directory 'package_dir' contained in 'package_names'
+    :param package_index: Index of the packages in the source directory.
+    :type package_index: PackageIndex
+    :returns: All catkin packages in 'package_index' contained in 'package_names'
     :rtype: dict(str,catkin_pkg.Package)
     """
     packages = dict()
-    workspace_packages = getPackages(package_dir)
 
-    if not workspace_packages:
+    if not len(package_index):
         log.error(
-            "Directory {} does not contain any catkin packages.".format(package_dir))
+            "Directory {} does not contain any catkin packages.".format(package_index.package_dir))
 
     for package_name in package_names:
-        found_packages = [pkg for path, pkg in workspace_packages.items() if pkg.name == package_name]
-        if not found_packages:
-            log.warn("Package {} is not present in directory {}. Skipping it.".format(package_name, package_dir))
+        package = package_index.package(package_name)
+        if package is None:
+            log.warn("Package {} is not present in directory {}. Skipping it.".format(package_name,
+                                                                                       package_index.package_dir))
             continue
-        packages[found_packages[0].name] = found_packages[0]
+        packages[package.name] = package
 
     return packages
 
 
-def assertCyclicDependency(packages):
-    """
-    Check if result of topological_order has found a cyclic dependency.
-
-    :param packages: Dict of packages.
-    :type packages: dict(str, catkin_pkg.Package)
+def getRecursiveDownstreamDependenciesFromNames(package_names, package_index):
     """
-    if packages:
-        last_package = packages[-1]
-        if not last_package[0]:
-            log.error("Cyclic dependency detected. Involved packages: {}".format(last_package[1]))
-
-
-def getRecursiveDownstreamDependenciesFromNames(package_names, package_dir):
-    """
-    Get all downstream dependencies of 'package_names' that are contained in 'package_dir'
+    Get all downstream dependencies of 'package_names' that are contained in 'package_index'
 
     :param packages: List of package names.
     :type packages: list(str)
-    :param package_dir: Directory in which downstream dependencies are searched.
-    :type package_dir: str
+    :param package_index: Index of the packages in which downstream dependencies are searched.
+    :type package_index: PackageIndex
     :returns: A dict of packages containing the downstream dependencies.
     :rtype: dict(str,catkin_pkg.Package)
     """
-    dependencies = dict()
-    workspace_packages = topological_order(package_dir)
-    assertCyclicDependency(workspace_packages)
-
-    for package_name in package_names:
-        build_deps = [p for dp, p in get_recursive_build_dependents_in_workspace(package_name, workspace_packages)]
-        for build_dep in build_deps:
-            dependencies[build_dep.name] = build_dep
-
-    return dependencies
+    dependencies = package_index.dependencyGraph().downstream(package_names)
+    return dict((name, package_index.package(name)) for name in dependencies)
 
 
-def getRecursiveDownstreamDependencies(packages, package_dir):
+@timing.timed()
+def getRecursiveDownstreamDependencies(packages, package_index):
     """
-    Get all downstream dependencies of 'packages' that are contained in 'package_dir'
+    Get all downstream dependencies of 'packages' that are contained in 'package_index'
 
     :param packages: Dict of packages.
     :type packages: dict(str, catkin_pkg.Package)
-    :param package_dir: Directory in which downstream dependencies are searched.
-    :type package_dir: str
+    :param package_index: Index of the packages in which downstream dependencies are searched.
+    :type package_index: PackageIndex
     :returns: A dict of packages containing the downstream dependencies.
     :rtype: dict(str,catkin_pkg.Package)
     """
-    return getRecursiveDownstreamDependenciesFromNames(packages.keys(), package_dir)
+    return getRecursiveDownstreamDependenciesFromNames(packages.keys(), package_index)
 
 
-# TODO(ghottiger) Using run and build depend, write wrapper for caktin_pkg to select deps.
-def getRecursiveUpstreamDependencies(packages, package_dir):
+@timing.timed()
+def getRecursiveUpstreamDependencies(packages, package_index):
     """
-    Get all upstream dependencies of 'packages' that are contained in 'package_dir'
+    Get all upstream dependencies of 'packages' that are contained in 'package_index'
 
     :param packages: Dict of packages.
     :type packages: dict(str, catkin_pkg.Package)
-    :param package_dir: Directory in which upstream dependencies are searched.
-    :type package_dir: str
+    :param package_index: Index of the packages in which upstream dependencies are searched.
+    :type package_index: PackageIndex
     :returns: A dictionary of packages containing the upstream dependencies.
     :rtype: dict(str,catkin_pkg.Package)
     """
-    dependencies = dict()
-    workspace_packages = topological_order(package_dir)
-    assertCyclicDependency(workspace_packages)
+    dependencies = package_index.dependencyGraph().upstream(packages.keys())
+    return dict((name, package_index.package(name)) for name in dependencies)
 
-    for package_name, package in packages.items():
-        build_deps = [p for dp, p in get_recursive_build_depends_in_workspace(package, workspace_packages)]
-        for build_dep in build_deps:
-            dependencies[build_dep.name] = build_dep
 
-    return dependencies
-
-
-def getNotInstalledUpstreamDependencies(packages, package_dir, installed_package_dir):
+@timing.timed()
+def getNotInstalledUpstreamDependencies(packages, package_index, installed_packages):
     """
-    Get upstream dependencies of 'packages' that are not installed in 'installed_package_dir'
+    Get upstream dependencies of 'packages' that are not installed in the underlays
 
     :param packages: Dict of packages.
     :type packages: dict(str, catkin_pkg.Package)
-    :param package_dir: Directory in which upstream dependencies are searched.
-    :type package_dir: str
-    :param installed_package_dir: Directory in which a part of the upstream dependencies are installed.
-    :type installed_package_dir: str
+    :param package_index: Index of the packages in which upstream dependencies are searched.
+    :type package_index: PackageIndex
+    :param installed_packages: Index of the packages installed in the underlays.
+    :type installed_packages: InstalledPackageIndex
     :returns: A set of packages containing the upstream dependencies that are not installed
     :rtype: dict(str,catkin_pkg.Package)
     """
-    workspace_upstream_dependencies = getRecursiveUpstreamDependencies(packages, package_dir)
-    installed_packages = getPackages(installed_package_dir)
-    dependencies = {k: workspace_upstream_dependencies[k]
-                    for k in set(workspace_upstream_dependencies) - set(installed_packages)}
-    return dependencies
+    # The upstream closure is memoized by the dependency graph, it is not resolved again
+    upstream_dependencies = package_index.dependencyGraph().upstream(packages.keys())
+    return dict((name, package_index.package(name)) for name in installed_packages.missing(upstream_dependencies))
 
 
-def getFilteredPackages(packages, filter_packages, filter_packages_tree):
+@timing.timed()
+def getFilteredPackages(packages, filter_packages, package_index):
     """
     Filter 'packages'.
 
@@ -422,18 +484,14 @@ def getFilteredPackages(packages, filter_packages, filter_packages_tree):
     :type packages: dict(str,catkin_pkg.Package)
     :param filter_packages: Packages to filter for.
     :type filter_packages: list(str)
-    :param filter_packages_tree: Upstream dependencies of the filter_packages.
-    :type filter_packages_tree: dict(str,catkin_pkg.Package)
+    :param package_index: Index of the packages in which the upstream dependencies of the filter packages are searched.
+    :type package_index: PackageIndex
     :returns: Dictionary of the filtered packages.
     :rtype: dict(str,catkin_pkg.Package)
     """
-
-    filtered_packages_names = set(packages.keys()) & set(filter_packages_tree.keys())
-    filtered_packages = dict((k, packages[k]) for k in filtered_packages_names)
-    for pkg in filter_packages:
-        if pkg in packages.keys():
-            filtered_packages[pkg] = packages[pkg]
-    return filtered_packages
+    filter_packages_tree = package_index.dependencyGraph().upstream(filter_packages)
+    filtered_packages_names = set(packages.keys()) & (filter_packages_tree | set(filter_packages))
+    return dict((k, packages[k]) for k in filtered_packages_names)
 
 
 ############################
@@ -442,7 +500,7 @@ def getFilteredPackages(packages, filter_packages, filter_packages_tree):
 
 def updateFileFromTemplate(template_file, output_file, substitutions):
     """
-    Filter 'packages' for the
+    Expand a template and write the result to 'output_file' if its content changed.
 
     :param template_file: Path of the template file.
     :type template_file: str
@@ -450,14 +508,14 @@ def updateFileFromTemplate(template_file, output_file, substitutions):
     :type output_file: str
     :param substitutions: Substitutions to apply.
     :type substitutions: dict(str,str)
+    :returns: True, if 'output_file' was written
+    :rtype: bool
     """
 
     # Expand template
+    import em
     with open(template_file, 'r') as fh:
         result = em.expand(fh.read(), **substitutions)
 
     # Write the result
-    with open(output_file, 'w+') as f:
-        content = f.read()
-        if content != result:
-            f.write(result)
+    return writeFileIfChanged(output_file, result)
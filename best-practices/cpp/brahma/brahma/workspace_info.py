@@ -0,0 +1,135 @@
+#!/usr/bin/python3
+
+# Author:       Gabriel Hottiger
+# Affiliation:  ANYbotics
+
+# Precomputed answers of 'brahma info'. The shell integration calls 'brahma info' on every use, hence this module
+# must only depend on the standard library and must not touch catkin or git.
+
+import json
+import os
+import sys
+
+WORKSPACE_INFO_FILE = "info.json"
+
+# Properties that can be queried with 'brahma info'
+properties = ['source_dir', 'catkin_dir', 'source_file', 'compiler_cache']
+
+
+def findWorkspacePath(dir):
+    """
+    Searches parent directories for ".brahma" folder.
+
+    :param dir: Directory for which to deduce the workspace.
+    :type dir: str
+    :returns: Root path of the workspace of which 'dir' is part of, 'None' if 'dir' is not part of a workspace
+    :rtype: str
+    """
+    path = os.path.abspath(os.path.realpath(dir))
+    while path != "/":
+        if os.path.isdir(path + "/.brahma"):
+            return path
+        path = os.path.dirname(path)
+    return None
+
+
+def writeWorkspaceInfo(paths, catkin_ws):
+    """
+    Write the answers to all 'brahma info' properties. The info is invalidated if the workspace paths or the catkin
+    profile change.
+
+    :param paths: Relevant workspace paths
+    :type paths: BrahmaWorkspacePaths
+    :param catkin_ws: Loaded catkin workspace handle
+    :type catkin_ws: CatkinWorkspace
+    """
+    info = {
+        'source_dir': paths.source,
+        'catkin_dir': paths.catkin,
+        'source_file': {'bash': catkin_ws.sourceFile(False), 'zsh': catkin_ws.sourceFile(True)},
+        'compiler_cache': _compilerLauncher(catkin_ws.cmakeArgs()),
+        'dependencies': dict((file, _mtime(file)) for file in _dependencies(paths.workspace, paths.catkin)),
+    }
+    info_file = paths.infoFile()
+    with open(info_file + '.tmp', 'w') as f:
+        json.dump(info, f)
+    os.replace(info_file + '.tmp', info_file)
+
+
+def readWorkspaceInfo(workspace_path):
+    """
+    :param workspace_path: Root path of the workspace
+    :type workspace_path: str
+    :returns: Workspace info written by 'writeWorkspaceInfo', 'None' if it is missing or outdated
+    :rtype: dict
+    """
+    try:
+        with open(os.path.join(workspace_path, '.brahma', WORKSPACE_INFO_FILE), 'r') as f:
+            info = json.load(f)
+        if all(_mtime(file) == mtime for file, mtime in info['dependencies'].items()) and \
+                all(property in info for property in properties):
+            return info
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    return None
+
+
+def infoProperty(info, property):
+    """
+    :param info: Workspace info
+    :type info: dict
+    :param property: One of 'properties'
+    :type property: str
+    :returns: Value of the property
+    :rtype: str
+    """
+    if property == properties[2]:  # source file
+        shell = os.environ.get('SHELL')
+        return info[property]['zsh' if shell and shell.endswith("zsh") else 'bash']
+    return info[property]
+
+
+def printInfo(argv):
+    """
+    Answer 'brahma info' from the workspace info without loading the workspace.
+
+    :param argv: Arguments of the info verb
+    :type argv: list(str)
+    :returns: True, if the info was printed, False if the regular info verb has to answer
+    :rtype: bool
+    """
+    positionals = [arg for arg in argv if arg not in ('--quiet', '-q', '--trace')]
+    if any(arg.startswith('-') for arg in positionals) or not 1 <= len(positionals) <= 2 or \
+            positionals[0] not in properties:
+        return False
+    workspace_path = findWorkspacePath(positionals[1] if len(positionals) > 1 else os.getcwd())
+    info = readWorkspaceInfo(workspace_path) if workspace_path else None
+    if info is None:
+        return False
+    print(infoProperty(info, positionals[0]))
+    sys.stdout.flush()
+    return True
+
+
+def _dependencies(workspace_path, catkin_path):
+    # Workspace paths, active catkin profile and catkin profile configurations
+    profiles_path = os.path.join(catkin_path, '.catkin_tools', 'profiles')
+    profiles = os.listdir(profiles_path) if os.path.isdir(profiles_path) else []
+    return [os.path.join(workspace_path, '.brahma', 'paths.yaml'), os.path.join(profiles_path, 'profiles.yaml')] + \
+           [os.path.join(profiles_path, profile, 'config.yaml') for profile in sorted(profiles)
+            if os.path.isdir(os.path.join(profiles_path, profile))]
+
+
+def _compilerLauncher(cmake_args):
+    # Name of the compiler cache brahma launches the C++ compiler with (e.g. 'env;CCACHE_DIR=...;/usr/bin/ccache')
+    for cmake_arg in cmake_args:
+        if cmake_arg.startswith('-DCMAKE_CXX_COMPILER_LAUNCHER=env;') and '_DIR=' in cmake_arg.split(';')[1]:
+            return os.path.basename(cmake_arg.split(';')[-1])
+    return 'none'
+
+
+def _mtime(file):
+    try:
+        return os.stat(file).st_mtime_ns
+    except OSError:
+        return None
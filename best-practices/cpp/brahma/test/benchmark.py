@@ -0,0 +1,259 @@
+#!/usr/bin/python3
+
+"""
+Benchmark of 'brahma create' and 'brahma update' on synthetic workspaces.
+
+The packages of a synthetic workspace are spread over local remote repositories and depend on each other in a random
+DAG. Every scale is created once and then updated for a series of scenarios. The duration of every step and of its
+phases is written to a JSON file, which can be compared with the results of another commit:
+
+    python3 -m test.benchmark --packages 100 1000 5000 --output benchmark.json
+    python3 -m test.benchmark --packages 1000 --compare benchmark.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+import brahma.brahma_create as brahma_create
+import brahma.brahma_update as brahma_update
+import brahma.log as log
+import brahma.timing as timing
+from testing_infrastructure.repositories.LocalRemote import LocalRemote
+from testing_infrastructure.repositories.Repository import Repository
+from .conftest import BrahmaTestWorkspace, default_brahma_ws
+
+# Bump if the layout of the result file changes
+RESULT_VERSION = 1
+
+PACKAGE_XML = """<?xml version="1.0"?>
+<package format="2">
+  <name>{name}</name>
+  <version>0.0.0</version>
+  <description>Synthetic benchmark package</description>
+  <maintainer email="benchmark@example.com">benchmark</maintainer>
+  <license>BSD</license>
+  <buildtool_depend>catkin</buildtool_depend>
+{dependencies}</package>
+"""
+
+CMAKE_LISTS = """cmake_minimum_required(VERSION 3.0.2)
+project({name})
+find_package(catkin REQUIRED{components})
+catkin_package()
+"""
+
+
+class SyntheticWorkspace:
+    """
+    Shape of a synthetic workspace.
+    """
+    __slots__ = ["packages", "repositories", "max_dependencies", "shape", "diff_size", "seed"]
+
+    def __init__(self, packages: int, repositories: int, max_dependencies: int, shape: str, diff_size: int,
+                 seed: int):
+        self.packages = packages
+        self.repositories = repositories
+        self.max_dependencies = max_dependencies
+        self.shape = shape
+        self.diff_size = diff_size
+        self.seed = seed
+
+    def parameters(self) -> Dict[str, object]:
+        return dict((name, getattr(self, name)) for name in self.__slots__)
+
+
+def generate_dependency_dag(workspace: SyntheticWorkspace, rng: random.Random) -> Dict[str, List[str]]:
+    """
+    Generate the dependencies of the packages. Packages only depend on packages with a lower index, which makes the
+    graph acyclic.
+
+    'uniform' picks the dependencies among all lower packages, which gives a shallow graph with large downstream sets.
+    'layered' picks them among the previous tenth of the packages, which gives a deep graph like a layered software
+    stack.
+    """
+    names = ['pkg_{:05d}'.format(index) for index in range(workspace.packages)]
+    window = max(1, workspace.packages // 10)
+    dag = dict()
+    for index, name in enumerate(names):
+        candidates = names[:index] if workspace.shape == 'uniform' else names[max(0, index - window):index]
+        count = min(len(candidates), rng.randint(0, workspace.max_dependencies))
+        dag[name] = sorted(rng.sample(candidates, count))
+    return dag
+
+
+def write_package(directory: Path, name: str, dependencies: List[str]) -> None:
+    directory.mkdir(parents=True)
+    (directory / 'package.xml').write_text(PACKAGE_XML.format(
+        name=name, dependencies=''.join('  <depend>{}</depend>\n'.format(dependency) for dependency in dependencies)))
+    (directory / 'CMakeLists.txt').write_text(CMAKE_LISTS.format(
+        name=name, components=' COMPONENTS ' + ' '.join(dependencies) if dependencies else ''))
+    (directory / 'src').mkdir()
+    (directory / 'src' / (name + '.cpp')).write_text('int {}() {{ return 0; }}\n'.format(name))
+
+
+def git(*args: str, cwd: Path) -> None:
+    subprocess.run(['git', '-c', 'user.name=benchmark', '-c', 'user.email=benchmark@example.com'] + list(args),
+                   cwd=str(cwd), check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def create_remotes(path: Path, dag: Dict[str, List[str]], workspace: SyntheticWorkspace,
+                   rng: random.Random) -> Tuple[Dict[str, str], Dict[str, List[str]]]:
+    """
+    Create the local remote repositories and push the packages to their master branch.
+
+    :returns: URL and package names per repository name
+    """
+    packages = dict(('repo_{:03d}'.format(index), []) for index in range(workspace.repositories))
+    for name in dag:
+        packages[rng.choice(list(packages))].append(name)
+    urls = dict()
+    for repository, package_names in packages.items():
+        remote = LocalRemote(name=repository, path=path)
+        urls[repository] = str(remote.url)
+        clone = path / 'clones' / repository
+        git('clone', '-q', str(remote.url), str(clone), cwd=path)
+        for name in package_names:
+            write_package(clone / name, name, dag[name])
+        git('add', '-A', cwd=clone)
+        git('commit', '-qm', 'Add synthetic packages', '--allow-empty', cwd=clone)
+        git('push', '-q', 'origin', 'HEAD:master', cwd=clone)
+    return urls, packages
+
+
+def timed_step(step: Callable[[], None]) -> Dict[str, object]:
+    """
+    Run a brahma step and collect its duration and the durations of its phases.
+    """
+    timing.reset()
+    start = time.perf_counter()
+    step()
+    total = time.perf_counter() - start
+    timing.endPhases()
+    phase_rows, call_rows = timing.summary()
+    return {'total': total,
+            'phases': dict((name, seconds) for level, name, count, seconds in phase_rows if level == timing.TITLE),
+            'calls': dict((name, seconds) for name, count, seconds in call_rows)}
+
+
+def run_benchmark(path: Path, workspace: SyntheticWorkspace) -> Dict[str, object]:
+    """
+    Create a synthetic workspace and time 'brahma create' and the update scenarios:
+
+    - update_clean: first update, all repositories on their base branch
+    - update_diff: 'diff_size' packages changed on feature branches
+    - update_noop: nothing changed since the last update
+    - update_forced: same as update_diff, ignoring the state of the last update
+    """
+    rng = random.Random(workspace.seed)
+    dag = generate_dependency_dag(workspace, rng)
+    urls, packages = create_remotes(path, dag, workspace, rng)
+
+    brahma_ws: BrahmaTestWorkspace = default_brahma_ws(path)
+    for repository in packages:
+        brahma_ws.add_repository([repository, urls[repository], 'master'])
+    brahma_ws.set_default_create_args()
+    steps = dict()
+    steps['create'] = timed_step(lambda: brahma_create.run(brahma_ws.paths, brahma_ws.settings, brahma_ws.args))
+
+    brahma_ws.set_default_update_args()
+    steps['update_clean'] = timed_step(lambda: brahma_update.run(brahma_ws.paths, brahma_ws.settings, brahma_ws.args))
+
+    # Change packages on feature branches
+    changed = rng.sample(sorted(dag), min(workspace.diff_size, len(dag)))
+    source = Path(brahma_ws.paths.source)
+    for repository, package_names in packages.items():
+        changed_packages = sorted(set(package_names) & set(changed))
+        if changed_packages:
+            repo = Repository(name=repository, path=source)
+            repo.checkout(ref='benchmark/diff', new=True)
+            for name in changed_packages:
+                repo.commit_new(rel_path=Path(name) / 'src' / 'changed.cpp')
+    steps['update_diff'] = timed_step(lambda: brahma_update.run(brahma_ws.paths, brahma_ws.settings, brahma_ws.args))
+    steps['update_noop'] = timed_step(lambda: brahma_update.run(brahma_ws.paths, brahma_ws.settings, brahma_ws.args))
+    brahma_ws.args.force = True
+    steps['update_forced'] = timed_step(lambda: brahma_update.run(brahma_ws.paths, brahma_ws.settings,
+                                                                  brahma_ws.args))
+
+    linked_packages = len(list(Path(brahma_ws.paths.catkinSource()).iterdir()))
+    return {'workspace': workspace.parameters(), 'linked_packages': linked_packages, 'steps': steps}
+
+
+def current_commit() -> str:
+    result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=str(Path(__file__).parent),
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True)
+    return result.stdout.strip() or None
+
+
+def compare(results: Dict[str, object], baseline: Dict[str, object]) -> None:
+    """
+    Print the step durations of 'results' next to the ones of 'baseline' for the scales both contain.
+    """
+    baseline_runs = dict((run['workspace']['packages'], run) for run in baseline['runs'])
+    print('{:>8} {:<14} {:>10} {:>10} {:>8}'.format('packages', 'step', baseline['commit'] or 'baseline',
+                                                   results['commit'] or 'current', 'ratio'))
+    for run in results['runs']:
+        baseline_run = baseline_runs.get(run['workspace']['packages'])
+        if baseline_run is None:
+            continue
+        for step, result in run['steps'].items():
+            baseline_total = baseline_run['steps'].get(step, {}).get('total')
+            if baseline_total:
+                print('{:>8} {:<14} {:>9.3f}s {:>9.3f}s {:>7.2f}x'.format(
+                    run['workspace']['packages'], step, baseline_total, result['total'],
+                    result['total'] / baseline_total))
+
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description='Benchmark brahma create and update on synthetic workspaces.')
+    parser.add_argument('--packages', type=int, nargs='+', default=[100, 1000, 5000],
+                        help='Package counts of the synthetic workspaces.')
+    parser.add_argument('--repositories', type=int, default=20, help='Number of repositories.')
+    parser.add_argument('--max-dependencies', type=int, default=5, help='Maximum dependencies per package.')
+    parser.add_argument('--shape', choices=['uniform', 'layered'], default='layered',
+                        help='Shape of the dependency DAG.')
+    parser.add_argument('--diff-size', type=int, default=10, help='Number of changed packages.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the random workspace generator.')
+    parser.add_argument('--output', type=Path, help='JSON file the results are written to.')
+    parser.add_argument('--compare', type=Path, help='JSON file of a previous run to compare with.')
+    args = parser.parse_args(argv)
+
+    results = {'version': RESULT_VERSION, 'commit': current_commit(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+               'python': platform.python_version(), 'runs': []}
+    for package_count in args.packages:
+        workspace = SyntheticWorkspace(package_count, min(args.repositories, package_count), args.max_dependencies,
+                                       args.shape, args.diff_size, args.seed)
+        with tempfile.TemporaryDirectory(prefix='brahma_benchmark_') as directory:
+            log_handler = logging.FileHandler(str(Path(directory) / 'brahma.log'))
+            log.logger.addHandler(log_handler)
+            log.logger.setLevel(logging.DEBUG)
+            cwd = os.getcwd()
+            try:
+                run = run_benchmark(Path(directory), workspace)
+            finally:
+                # The update changes into the workspace, which is removed with the temporary directory
+                os.chdir(cwd)
+                log.logger.removeHandler(log_handler)
+                log_handler.close()
+        results['runs'].append(run)
+        print('{:>6} packages: '.format(package_count) +
+              ', '.join('{} {:.3f}s'.format(step, result['total']) for step, result in run['steps'].items()),
+              file=sys.stderr)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2, sort_keys=True))
+    if args.compare:
+        compare(results, json.loads(args.compare.read_text()))
+
+
+if __name__ == '__main__':
+    main()
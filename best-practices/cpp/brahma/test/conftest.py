@@ -1,6 +1,7 @@
 import argparse
 from pathlib import Path
 import pytest
+import subprocess
 from typing import List
 
 import brahma.BrahmaWorkspacePaths as BrahmaWorkspacePaths
@@ -8,6 +9,37 @@ import brahma.BrahmaWorkspaceSettings as BrahmaWorkspaceSettings
 from testing_infrastructure.repositories.LocalRemote import LocalRemote
 from testing_infrastructure.repositories import Repository
 
+PACKAGE_XML = """<?xml version="1.0"?>
+<package format="2">
+  <name>{name}</name>
+  <version>0.0.0</version>
+  <description>Test package</description>
+  <maintainer email="test@example.com">test</maintainer>
+  <license>BSD</license>
+  <buildtool_depend>catkin</buildtool_depend>
+{dependencies}</package>
+"""
+
+
+def write_package(directory: Path, name: str, dependencies: List[str] = (), depend_tag: str = 'depend') -> Path:
+    """
+    Write the manifest of a catkin package to 'directory'.
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / 'package.xml').write_text(PACKAGE_XML.format(
+        name=name,
+        dependencies=''.join('  <{0}>{1}</{0}>\n'.format(depend_tag, dependency) for dependency in dependencies)))
+    return directory
+
+
+def commit_all(repo_path: Path, message: str = 'Update') -> None:
+    """
+    Commit all changes of the git repository at 'repo_path'.
+    """
+    for args in [['add', '-A'], ['commit', '-q', '-m', message]]:
+        subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + args, cwd=str(repo_path),
+                       check=True)
+
 
 class BrahmaTestWorkspace:
     """
@@ -41,6 +73,10 @@ class BrahmaTestWorkspace:
         self.args.config = "default"
         self.args.force = False
         self.args.repository = self.repositories
+        self.args.jobs = None
+        self.args.depth = None
+        self.args.filter = None
+        self.args.single_branch = False
 
     def set_default_update_args(self) -> None:
         """
@@ -49,6 +85,8 @@ class BrahmaTestWorkspace:
         self.args = argparse.Namespace()
         self.args.pull = False
         self.args.pull_and_merge = False
+        self.args.jobs = None
+        self.args.force = False
 
 
 def default_brahma_ws(path: Path) -> BrahmaTestWorkspace:
@@ -1,12 +1,20 @@
 #!/usr/bin/python3
 
+import logging
+import os
+import subprocess
+import time
 from pathlib import Path
+from typing import Dict, List
+
+import pytest
 
 import brahma.brahma_create as brahma_create
 import brahma.brahma_update as brahma_update
+from brahma.BrahmaWorkspaceSettings import BrahmaWorkspaceSettings
 from testing_infrastructure.repositories.Repository import Repository
 from testing_infrastructure.utils import commit_default_package
-from .conftest import BrahmaTestWorkspace
+from .conftest import BrahmaTestWorkspace, commit_all, write_package
 
 
 def test_basic(brahma_ws_with_repo: BrahmaTestWorkspace) -> None:
@@ -34,3 +42,150 @@ def test_basic(brahma_ws_with_repo: BrahmaTestWorkspace) -> None:
                       args=brahma_ws_with_repo.args)
     # Ensure that the package was added to the catkin workspace.
     assert (Path(brahma_ws_with_repo.paths.catkinSource()) / "package_a").exists()
+
+
+def create_workspace(brahma_ws: BrahmaTestWorkspace, packages: Dict[str, List[str]]) -> Path:
+    """
+    Create the workspace, commit 'packages' (name to dependencies) to the master branch and check out a feature branch.
+    No IDE project files are generated.
+    """
+    brahma_ws.set_default_create_args()
+    brahma_create.run(paths=brahma_ws.paths, settings=brahma_ws.settings, args=brahma_ws.args)
+    change_settings(brahma_ws, ide='none')
+    repo_path = Path(brahma_ws.paths.source) / 'repo'
+    for name, dependencies in packages.items():
+        write_package(repo_path / name, name, dependencies)
+        (repo_path / name / 'CMakeLists.txt').write_text('')
+    commit_all(repo_path, 'Add packages')
+    subprocess.run(['git', 'checkout', '-q', '-b', 'feature'], cwd=str(repo_path), check=True)
+    return repo_path
+
+
+def update(brahma_ws: BrahmaTestWorkspace, force: bool = False) -> None:
+    brahma_ws.set_default_update_args()
+    brahma_ws.args.force = force
+    brahma_update.run(paths=brahma_ws.paths, settings=brahma_ws.settings, args=brahma_ws.args)
+
+
+def change_settings(brahma_ws: BrahmaTestWorkspace, **changes) -> None:
+    settings = BrahmaWorkspaceSettings()
+    settings.load(brahma_ws.paths.workspace)
+    for key, value in changes.items():
+        setattr(settings, key, value)
+    settings.save(brahma_ws.paths.workspace)
+
+
+def linked_packages(brahma_ws: BrahmaTestWorkspace) -> List[str]:
+    return sorted(os.listdir(brahma_ws.paths.catkinSource()))
+
+
+def write_build_logs(brahma_ws: BrahmaTestWorkspace, package: str, seconds: float) -> None:
+    log_dir = Path(brahma_ws.paths.catkin) / 'logs' / package
+    log_dir.mkdir(parents=True, exist_ok=True)
+    end = time.time()
+    for stage, mtime in [('mkdir', end - seconds), ('cmake', end - seconds / 2), ('make', end)]:
+        log_file = log_dir / 'build.{}.000.log'.format(stage)
+        log_file.write_text('')
+        os.utime(str(log_file), (mtime, mtime))
+
+
+def test_build_budget_with_filter_packages(brahma_ws_with_repo: BrahmaTestWorkspace) -> None:
+    # package_a <- package_b <- package_c, package_a <- package_d
+    repo_path = create_workspace(brahma_ws_with_repo, {'package_a': [], 'package_b': ['package_a'],
+                                                       'package_c': ['package_b'], 'package_d': ['package_a']})
+    for package, seconds in [('package_b', 60), ('package_c', 600), ('package_d', 30)]:
+        write_build_logs(brahma_ws_with_repo, package, seconds)
+    change_settings(brahma_ws_with_repo, filter_packages=['package_c'], only_filter_downstream_packages=True,
+                    downstream_build_budget=2)
+
+    (repo_path / 'package_a' / 'source.cpp').write_text('')
+    commit_all(repo_path)
+    update(brahma_ws_with_repo)
+    # The filter tree comes first within the budget, package_c exceeds it and package_d is filtered
+    assert linked_packages(brahma_ws_with_repo) == ['package_a', 'package_b']
+
+    change_settings(brahma_ws_with_repo, downstream_build_budget=0)
+    update(brahma_ws_with_repo)
+    assert linked_packages(brahma_ws_with_repo) == ['package_a', 'package_b', 'package_c']
+
+
+def is_up_to_date(brahma_ws: BrahmaTestWorkspace, caplog: pytest.LogCaptureFixture, force: bool = False) -> bool:
+    """
+    Update the workspace and return whether the update was skipped as up to date.
+    """
+    caplog.clear()
+    with caplog.at_level(logging.INFO, logger='brahma'):
+        update(brahma_ws, force)
+    return 'Workspace is up to date' in caplog.text
+
+
+@pytest.fixture
+def updated_ws(brahma_ws_with_repo: BrahmaTestWorkspace, caplog: pytest.LogCaptureFixture) -> BrahmaTestWorkspace:
+    """
+    Fixture of an updated workspace with a committed change to package_a of the feature branch.
+    """
+    repo_path = create_workspace(brahma_ws_with_repo, {'package_a': [], 'package_b': ['package_a'], 'package_c': []})
+    (repo_path / 'package_a' / 'source.cpp').write_text('1')
+    commit_all(repo_path)
+    assert not is_up_to_date(brahma_ws_with_repo, caplog)
+    assert linked_packages(brahma_ws_with_repo) == ['package_a', 'package_b']
+    return brahma_ws_with_repo
+
+
+def test_unchanged_workspace_is_up_to_date(updated_ws: BrahmaTestWorkspace, caplog: pytest.LogCaptureFixture) -> None:
+    assert is_up_to_date(updated_ws, caplog)
+    assert is_up_to_date(updated_ws, caplog)
+    assert linked_packages(updated_ws) == ['package_a', 'package_b']
+    # A forced update resolves the packages again
+    assert not is_up_to_date(updated_ws, caplog, force=True)
+    assert linked_packages(updated_ws) == ['package_a', 'package_b']
+
+
+def test_commit_forces_update(updated_ws: BrahmaTestWorkspace, caplog: pytest.LogCaptureFixture) -> None:
+    repo_path = Path(updated_ws.paths.source) / 'repo'
+    (repo_path / 'package_c' / 'source.cpp').write_text('1')
+    commit_all(repo_path)
+    assert not is_up_to_date(updated_ws, caplog)
+    assert linked_packages(updated_ws) == ['package_a', 'package_b', 'package_c']
+    assert is_up_to_date(updated_ws, caplog)
+
+
+def test_dirty_file_forces_update(updated_ws: BrahmaTestWorkspace, caplog: pytest.LogCaptureFixture) -> None:
+    source_file = Path(updated_ws.paths.source) / 'repo' / 'package_c' / 'source.cpp'
+    source_file.write_text('1')
+    # Untracked files are part of the diff
+    assert not is_up_to_date(updated_ws, caplog)
+    assert linked_packages(updated_ws) == ['package_a', 'package_b', 'package_c']
+    assert is_up_to_date(updated_ws, caplog)
+
+    # Editing a file that is already changed does not change the git status
+    stat = source_file.stat()
+    source_file.write_text('22')
+    os.utime(str(source_file), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert not is_up_to_date(updated_ws, caplog)
+
+
+def test_untracked_package_forces_update(updated_ws: BrahmaTestWorkspace, caplog: pytest.LogCaptureFixture) -> None:
+    write_package(Path(updated_ws.paths.source) / 'repo' / 'package_e', 'package_e', ['package_a'])
+    assert not is_up_to_date(updated_ws, caplog)
+    assert linked_packages(updated_ws) == ['package_a', 'package_b', 'package_e']
+
+
+def test_package_outside_of_repositories_forces_update(updated_ws: BrahmaTestWorkspace,
+                                                       caplog: pytest.LogCaptureFixture) -> None:
+    write_package(Path(updated_ws.paths.source) / 'package_e', 'package_e', ['package_a'])
+    assert not is_up_to_date(updated_ws, caplog)
+    assert linked_packages(updated_ws) == ['package_a', 'package_b', 'package_e']
+
+
+def test_settings_change_forces_update(updated_ws: BrahmaTestWorkspace, caplog: pytest.LogCaptureFixture) -> None:
+    change_settings(updated_ws, include_downstream_dependencies=False)
+    assert not is_up_to_date(updated_ws, caplog)
+    assert linked_packages(updated_ws) == ['package_a']
+    assert is_up_to_date(updated_ws, caplog)
+
+
+def test_deleted_link_forces_update(updated_ws: BrahmaTestWorkspace, caplog: pytest.LogCaptureFixture) -> None:
+    os.unlink(os.path.join(updated_ws.paths.catkinSource(), 'package_b'))
+    assert not is_up_to_date(updated_ws, caplog)
+    assert linked_packages(updated_ws) == ['package_a', 'package_b']
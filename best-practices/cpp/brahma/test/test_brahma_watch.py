@@ -0,0 +1,121 @@
+#!/usr/bin/python3
+
+import os
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, Set
+
+import pytest
+
+import brahma.brahma_watch as brahma_watch
+from brahma.BrahmaWorkspacePaths import BrahmaWorkspacePaths
+from brahma.WorkspaceModel import WorkspaceModel
+from .conftest import commit_all, write_package
+
+
+@pytest.fixture
+def paths(tmp_path: Path) -> BrahmaWorkspacePaths:
+    """
+    Workspace with a repository holding package 'a' and a hidden directory in the source tree.
+    """
+    paths = BrahmaWorkspacePaths(str(tmp_path))
+    os.makedirs(paths.configurationDirectory())
+    os.makedirs(os.path.join(paths.catkin, '.catkin_tools', 'profiles', 'default'))
+    repo = Path(paths.source) / 'repo'
+    write_package(repo / 'a', 'a')
+    (Path(paths.source) / '.hidden').mkdir()
+    subprocess.run(['git', 'init', '-q', str(repo)], check=True)
+    commit_all(repo)
+    return paths
+
+
+def changed(model: WorkspaceModel, paths: BrahmaWorkspacePaths) -> Set[str]:
+    """
+    Entries reported to the watch, an entry is reported once per event (e.g. creation and write).
+    """
+    return set(brahma_watch._takeChanges(model, paths))
+
+
+@pytest.fixture
+def model(paths: BrahmaWorkspacePaths) -> Iterator[WorkspaceModel]:
+    model = WorkspaceModel(paths, ['.*'])
+    assert model.isWatching()
+    yield model
+    model.close()
+
+
+def test_changes_of_repositories_are_reported(paths: BrahmaWorkspacePaths, model: WorkspaceModel) -> None:
+    repo = Path(paths.source) / 'repo'
+    assert changed(model, paths) == set()
+
+    (repo / 'a' / 'source.cpp').write_text('int main() {}\n')
+    assert changed(model, paths) == {str(repo / 'a' / 'source.cpp')}
+
+    # New packages are watched
+    write_package(repo / 'b', 'b')
+    assert str(repo / 'b') in changed(model, paths)
+    (repo / 'b' / 'source.cpp').write_text('int main() {}\n')
+    assert changed(model, paths) == {str(repo / 'b' / 'source.cpp')}
+
+    # Commits change the refs
+    commit_all(repo)
+    changes = changed(model, paths)
+    assert any(os.path.dirname(change).startswith(str(repo / '.git' / 'refs' / 'heads')) for change in changes)
+
+
+def test_writes_of_the_update_are_ignored(paths: BrahmaWorkspacePaths, model: WorkspaceModel) -> None:
+    repo = Path(paths.source) / 'repo'
+
+    # The update writes the IDE project files to the root of the source directory
+    (Path(paths.source) / 'CMakeLists.txt').write_text('project(workspace)\n')
+    (Path(paths.source) / '.clang-format').write_text('BasedOnStyle: Google\n')
+    # Git refreshes the index when the update reads the status, by renaming the lock file
+    index = repo / '.git' / 'index'
+    (repo / '.git' / 'index.lock').write_bytes(index.read_bytes())
+    os.replace(str(repo / '.git' / 'index.lock'), str(index))
+    subprocess.run(['git', 'status', '--porcelain'], cwd=str(repo), stdout=subprocess.DEVNULL, check=True)
+    assert changed(model, paths) == set()
+
+    # Changes next to the ignored ones are still reported
+    (repo / 'a' / 'source.cpp').write_text('int main() {}\n')
+    (Path(paths.source) / 'CMakeLists.txt').write_text('project(workspace)\n')
+    assert changed(model, paths) == {str(repo / 'a' / 'source.cpp')}
+
+
+def test_pruned_directories_are_not_watched(paths: BrahmaWorkspacePaths, model: WorkspaceModel) -> None:
+    hidden = Path(paths.source) / '.hidden'
+    assert str(hidden) not in model.watchedDirectories()
+    assert str(Path(paths.source) / 'repo' / 'a') in model.watchedDirectories()
+    (hidden / 'file').write_text('')
+    assert changed(model, paths) == set()
+
+    # Pruned directories that appear later are not watched either
+    build = Path(paths.source) / 'repo' / '.build'
+    build.mkdir()
+    assert changed(model, paths) == {str(build)}
+    (build / 'file').write_text('')
+    assert changed(model, paths) == set()
+
+
+def test_changes_are_debounced(paths: BrahmaWorkspacePaths, model: WorkspaceModel) -> None:
+    package = Path(paths.source) / 'repo' / 'a'
+
+    # Changes collected during the last update are returned after the quiet period
+    (package / 'collected.cpp').write_text('')
+    assert set(brahma_watch.waitForChanges(model, paths, 0.05)) == {str(package / 'collected.cpp')}
+
+    def writeFiles() -> None:
+        for index in range(3):
+            time.sleep(0.1)
+            (package / 'file{}.cpp'.format(index)).write_text('')
+
+    writer = threading.Thread(target=writeFiles)
+    writer.start()
+    start = time.perf_counter()
+    changes = brahma_watch.waitForChanges(model, paths, 0.5)
+    writer.join()
+    # A single batch, returned once nothing changed for the debounce period after the last change
+    assert set(changes) == {str(package / 'file{}.cpp'.format(index)) for index in range(3)}
+    assert time.perf_counter() - start >= 0.8
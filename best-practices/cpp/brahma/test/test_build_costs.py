@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+
+import os
+from pathlib import Path
+from typing import List, Tuple
+
+import pytest
+
+import brahma.build_costs as build_costs
+from brahma.PackageIndex import PackageIndex
+from .conftest import write_package
+
+
+def write_logs(log_dir: Path, stages: List[Tuple[str, int, float]]) -> None:
+    log_dir.mkdir(parents=True, exist_ok=True)
+    for stage, index, mtime in stages:
+        log_file = log_dir / 'build.{}.{:03d}.log'.format(stage, index)
+        log_file.write_text('')
+        os.utime(str(log_file), (mtime, mtime))
+
+
+def full_build(index: int, start: float, duration: float) -> List[Tuple[str, int, float]]:
+    return [('mkdir', index, start), ('cmake', index, start + 1.0), ('make', index, start + duration - 1.0),
+            ('install', index, start + duration)]
+
+
+def test_read_build_duration_of_full_build(tmp_path: Path) -> None:
+    write_logs(tmp_path, full_build(0, 1000.0, 300.0))
+    assert build_costs.readBuildDuration(str(tmp_path)) == pytest.approx(300.0)
+
+
+def test_read_build_duration_ignores_incremental_builds(tmp_path: Path) -> None:
+    # Incremental builds skip 'cmake', the indices of the stages differ afterwards
+    write_logs(tmp_path, full_build(0, 1000.0, 100.0) + full_build(1, 2000.0, 300.0) +
+               [('mkdir', 2, 3000.0), ('make', 2, 3005.0), ('install', 2, 3006.0),
+                ('mkdir', 3, 4000.0), ('make', 3, 4002.0), ('install', 3, 4003.0)])
+    assert build_costs.readBuildDuration(str(tmp_path)) == pytest.approx(300.0)
+
+
+def test_read_build_duration_without_full_build(tmp_path: Path) -> None:
+    write_logs(tmp_path, [('mkdir', 0, 1000.0), ('make', 0, 1005.0), ('install', 0, 1006.0)])
+    assert build_costs.readBuildDuration(str(tmp_path)) is None
+    assert build_costs.readBuildDuration(str(tmp_path / 'missing')) is None
+
+
+def test_update_build_costs(tmp_path: Path) -> None:
+    cost_file = str(tmp_path / 'build_costs.json')
+    log_space = tmp_path / 'logs'
+    write_logs(log_space / 'pkg_a', full_build(0, 1000.0, 60.0))
+    write_logs(log_space / 'pkg_b', [('mkdir', 0, 1000.0), ('make', 0, 1005.0)])
+    assert build_costs.updateBuildCosts(cost_file, str(log_space)) == {'pkg_a': pytest.approx(60.0)}
+    # Costs of removed logs are kept
+    for log_file in (log_space / 'pkg_a').iterdir():
+        log_file.unlink()
+    assert build_costs.updateBuildCosts(cost_file, str(log_space)) == {'pkg_a': pytest.approx(60.0)}
+
+
+def test_select_within_budget_prefers_critical_path(tmp_path: Path) -> None:
+    # changed <- a <- b <- c is the critical path, changed <- d and changed <- e are cheap leaves
+    write_package(tmp_path / 'changed', 'changed')
+    write_package(tmp_path / 'a', 'a', ['changed'])
+    write_package(tmp_path / 'b', 'b', ['a'])
+    write_package(tmp_path / 'c', 'c', ['b'])
+    write_package(tmp_path / 'd', 'd', ['changed'])
+    write_package(tmp_path / 'e', 'e', ['changed'])
+    package_index = PackageIndex()
+    package_index.load(str(tmp_path))
+    graph = package_index.dependencyGraph()
+    candidates = {'a', 'b', 'c', 'd', 'e'}
+    costs = {'a': 10.0, 'b': 10.0, 'c': 10.0, 'd': 15.0, 'e': 5.0}
+
+    assert build_costs.selectWithinBudget(candidates, ['changed'], set(), costs, 30.0, graph) == \
+        ({'a', 'b', 'c'}, 30.0)
+    # The remaining budget is filled with packages off the critical path
+    assert build_costs.selectWithinBudget(candidates, ['changed'], set(), costs, 40.0, graph) == \
+        ({'a', 'b', 'c', 'e'}, 35.0)
+    # Priority packages come first
+    assert build_costs.selectWithinBudget(candidates, ['changed'], {'d'}, costs, 30.0, graph) == \
+        ({'a', 'd', 'e'}, 30.0)
+    # A package is only selected together with its dependencies
+    selected, _ = build_costs.selectWithinBudget(candidates, ['changed'], {'c'}, costs, 25.0, graph)
+    assert selected == {'a', 'b', 'e'}
@@ -0,0 +1,114 @@
+#!/usr/bin/python3
+
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+import brahma.trash as trash
+from brahma.CatkinWorkspace import CatkinWorkspace
+
+
+def catkin_workspace(tmp_path: Path, merge_devel: bool = False, install: bool = False) -> CatkinWorkspace:
+    """
+    Catkin workspace with a minimal context, catkin itself is not initialized.
+    """
+    catkin_ws = CatkinWorkspace()
+    catkin_ws.context = SimpleNamespace(build_space_abs=str(tmp_path / 'build'),
+                                        install_space_abs=str(tmp_path / 'install'), merge_devel=merge_devel,
+                                        install=install)
+    return catkin_ws
+
+
+@pytest.fixture
+def catkin_clean(monkeypatch: pytest.MonkeyPatch) -> List[List[str]]:
+    """
+    Replace 'catkin clean', which leaves the build spaces in place. Records the build spaces present when it is run.
+    """
+    calls = []
+
+    def clean_packages(context: SimpleNamespace, packages: List[str], *args) -> None:
+        calls.append(sorted(package for package in packages if (Path(context.build_space_abs) / package).exists()))
+
+    monkeypatch.setattr('catkin_tools.verbs.catkin_clean.clean.clean_packages', clean_packages)
+    monkeypatch.setattr(trash, 'startReaper', lambda trash_dir: calls.append(['reaper', trash_dir]))
+    return calls
+
+
+def make_build_spaces(tmp_path: Path, packages: List[str]) -> None:
+    for package in packages:
+        (tmp_path / 'build' / package).mkdir(parents=True)
+        (tmp_path / 'build' / package / 'Makefile').write_text('')
+
+
+def test_clean_packages_moves_build_spaces_to_trash(tmp_path: Path, catkin_clean: List[List[str]]) -> None:
+    make_build_spaces(tmp_path, ['pkg_a', 'pkg_b', 'pkg_c'])
+    trash_dir = str(tmp_path / 'trash')
+    catkin_workspace(tmp_path).cleanPackages(['pkg_a', 'pkg_b'], trash_dir)
+    # The build spaces are moved before catkin cleans the packages
+    assert catkin_clean == [[], ['reaper', trash_dir]]
+    assert sorted(path.name for path in (tmp_path / 'build').iterdir()) == ['pkg_c']
+    assert len(list((tmp_path / 'trash').iterdir())) == 2
+
+
+def test_clean_packages_with_merged_devel_space(tmp_path: Path, catkin_clean: List[List[str]]) -> None:
+    make_build_spaces(tmp_path, ['pkg_a', 'pkg_b'])
+    trash_dir = str(tmp_path / 'trash')
+    catkin_workspace(tmp_path, merge_devel=True).cleanPackages(['pkg_a'], trash_dir)
+    # The merged devel space is cleaned with the build space, which is only moved to the trash afterwards
+    assert catkin_clean == [['pkg_a'], ['reaper', trash_dir]]
+    assert sorted(path.name for path in (tmp_path / 'build').iterdir()) == ['pkg_b']
+    assert len(list((tmp_path / 'trash').iterdir())) == 1
+
+
+def test_clean_packages_without_trash(tmp_path: Path, catkin_clean: List[List[str]]) -> None:
+    make_build_spaces(tmp_path, ['pkg_a', 'pkg_b'])
+    catkin_workspace(tmp_path).cleanPackages(['pkg_a', 'pkg_missing'], None)
+    assert catkin_clean == [['pkg_a']]
+    assert sorted(path.name for path in (tmp_path / 'build').iterdir()) == ['pkg_b']
+    assert not (tmp_path / 'trash').exists()
+
+
+def install_files(tmp_path: Path, package: str, files: List[Path]) -> None:
+    """
+    Create 'files' and list them in the install manifest of 'package'.
+    """
+    for file in files:
+        file.parent.mkdir(parents=True, exist_ok=True)
+        file.write_text(package)
+    (tmp_path / 'build' / package).mkdir(parents=True, exist_ok=True)
+    (tmp_path / 'build' / package / 'install_manifest.txt').write_text(''.join('{}\n'.format(file) for file in files))
+
+
+def test_clean_installed_files(tmp_path: Path) -> None:
+    install = tmp_path / 'install'
+    install_files(tmp_path, 'pkg_a', [install / 'lib' / 'libpkg_a.so', install / 'include' / 'pkg_a' / 'a.h',
+                                      install / 'include' / 'pkg_a' / 'detail' / 'b.h',
+                                      install / 'share' / 'pkg_a' / 'package.xml', install / 'share' / 'shared.txt'])
+    install_files(tmp_path, 'pkg_b', [install / 'lib' / 'libpkg_b.so', install / 'include' / 'pkg_b' / 'b.h'])
+    install_files(tmp_path, 'pkg_c', [install / 'lib' / 'libpkg_c.so'])
+    catkin_workspace(tmp_path, install=True).cleanInstalledFiles(['pkg_a', 'pkg_b', 'pkg_missing'], jobs=2)
+
+    remaining = sorted(str(path.relative_to(install)) for path in install.rglob('*'))
+    # Emptied directories are pruned, the top level directories of the install space are kept
+    assert remaining == ['include', 'lib', 'lib/libpkg_c.so', 'share']
+
+
+def test_clean_installed_files_refuses_paths_outside_of_install_space(tmp_path: Path) -> None:
+    install = tmp_path / 'install'
+    outside = tmp_path / 'outside' / 'file.txt'
+    other_install = tmp_path / 'install_other' / 'lib' / 'libpkg_a.so'
+    install_files(tmp_path, 'pkg_a', [install / 'lib' / 'libpkg_a.so', install / 'setup.bash', outside, other_install])
+    # Links resolving to files outside of the install space
+    (install / 'lib' / 'link.so').symlink_to(outside)
+    with open(str(tmp_path / 'build' / 'pkg_a' / 'install_manifest.txt'), 'a') as manifest:
+        manifest.write('{}\n{}\n'.format(install / 'lib' / 'link.so', install / 'lib' / '..' / '..' / 'outside' /
+                                         'file.txt'))
+    catkin_workspace(tmp_path, install=True).cleanInstalledFiles(['pkg_a'])
+
+    # Only files in subdirectories of the install space are removed
+    assert not (install / 'lib' / 'libpkg_a.so').exists()
+    assert (install / 'setup.bash').exists()
+    assert outside.exists()
+    assert other_install.exists()
@@ -0,0 +1,56 @@
+#!/usr/bin/python3
+
+from pathlib import Path
+
+import pytest
+
+import brahma.compiler_cache as compiler_cache
+import brahma.workspace_info as workspace_info
+from brahma.BrahmaWorkspaceSettings import BrahmaWorkspaceSettings
+
+
+@pytest.fixture
+def settings(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> BrahmaWorkspaceSettings:
+    monkeypatch.setattr(compiler_cache.shutil, 'which', lambda name: '/usr/bin/' + name)
+    settings = BrahmaWorkspaceSettings()
+    settings.compiler_cache_dir = str(tmp_path / 'cache')
+    return settings
+
+
+@pytest.mark.parametrize('cache', ['ccache', 'sccache'])
+def test_launcher_cmake_args(settings: BrahmaWorkspaceSettings, cache: str) -> None:
+    settings.compiler_cache = cache
+    cmake_args = compiler_cache.launcherCMakeArgs(settings)
+    assert [arg.split('=', 1)[0] for arg in cmake_args] == ['-DCMAKE_C_COMPILER_LAUNCHER',
+                                                            '-DCMAKE_CXX_COMPILER_LAUNCHER']
+    assert all(compiler_cache.isLauncherCMakeArg(arg) for arg in cmake_args)
+    assert workspace_info._compilerLauncher(cmake_args) == cache
+
+    settings.compiler_cache = 'none'
+    assert compiler_cache.launcherCMakeArgs(settings) == []
+
+
+@pytest.mark.parametrize('cmake_arg', ['-DCMAKE_CXX_COMPILER_LAUNCHER=ccache',
+                                       '-DCMAKE_C_COMPILER_LAUNCHER:STRING=/usr/bin/distcc',
+                                       '-DCMAKE_CXX_COMPILER_LAUNCHER=env;CCACHE_SLOPPINESS=time_macros;ccache'])
+def test_launchers_of_the_user_are_kept(cmake_arg: str) -> None:
+    assert compiler_cache.setsCompilerLauncher(cmake_arg)
+    assert not compiler_cache.isLauncherCMakeArg(cmake_arg)
+    assert workspace_info._compilerLauncher([cmake_arg]) == 'none'
+
+
+def test_other_cmake_args() -> None:
+    assert not compiler_cache.setsCompilerLauncher('-DCMAKE_BUILD_TYPE=RelWithDebInfo')
+    assert not compiler_cache.isLauncherCMakeArg('-DCMAKE_BUILD_TYPE=RelWithDebInfo')
+
+
+def test_configure_cache_keeps_other_entries(settings: BrahmaWorkspaceSettings, tmp_path: Path) -> None:
+    settings.compiler_cache = 'ccache'
+    config_file = tmp_path / 'cache' / compiler_cache.CCACHE_CONFIG_FILE
+    config_file.parent.mkdir()
+    config_file.write_text('sloppiness = time_macros\nmax_size = 5G\n')
+    compiler_cache.configureCache(settings)
+    lines = config_file.read_text().splitlines()
+    assert lines[0] == 'sloppiness = time_macros'
+    assert 'max_size = 20G' in lines
+    assert 'max_size = 5G' not in lines
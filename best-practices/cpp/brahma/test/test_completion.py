@@ -0,0 +1,90 @@
+#!/usr/bin/python3
+
+import functools
+from pathlib import Path
+from typing import List
+
+import pytest
+
+import brahma.completion as completion
+import brahma.main as main
+
+
+def read_words(cache_dir: Path, name: str) -> List[str]:
+    return (cache_dir / name).read_text().split()
+
+
+@pytest.fixture
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    """
+    Completion cache used by main.updateCompletionCache.
+    """
+    cache_dir = tmp_path / 'completion'
+    monkeypatch.setattr(completion, 'isCompletionCacheUpToDate',
+                        functools.partial(completion.isCompletionCacheUpToDate, cache_dir=str(cache_dir)))
+    monkeypatch.setattr(completion, 'writeCompletionCache',
+                        functools.partial(completion.writeCompletionCache, cache_dir=str(cache_dir)))
+    return cache_dir
+
+
+def test_write_completion_cache(cache_dir: Path) -> None:
+    main.updateCompletionCache(main.setupMainParser())
+
+    assert read_words(cache_dir, 'verbs') == main.verbs
+    assert read_words(cache_dir, 'brahma.options') == ['--help']
+    for verb in main.verbs:
+        options = read_words(cache_dir, verb + '.options')
+        assert options == sorted(options)
+        assert '--help' in options
+        # The common arguments are completed for all verbs with a module
+        assert verb == 'setup' or {'--quiet', '--trace'} <= set(options)
+    assert {'--force', '--pull', '--jobs'} <= set(read_words(cache_dir, 'update.options'))
+    assert {'--stop'} <= set(read_words(cache_dir, 'serve.options'))
+
+    # Only options taking package names complete them
+    assert read_words(cache_dir, 'clean.package_options') == ['--packages']
+    assert read_words(cache_dir, 'update.package_options') == []
+    assert (cache_dir / 'setup.package_options').read_text() == '\n'
+
+    assert completion.isCompletionCacheUpToDate()
+    assert (cache_dir / completion.COMPLETION_STAMP_FILE).read_text() == completion.completionStamp()
+
+
+def test_completion_cache_is_regenerated_after_installing(cache_dir: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    assert not completion.isCompletionCacheUpToDate()
+    main.updateCompletionCache(main.setupMainParser())
+    assert completion.isCompletionCacheUpToDate()
+
+    # An up to date cache is not written again, unless forced by 'brahma setup'
+    (cache_dir / 'verbs').write_text('outdated\n')
+    main.updateCompletionCache(main.setupMainParser())
+    assert read_words(cache_dir, 'verbs') == ['outdated']
+    main.updateCompletionCache(main.setupMainParser(), force=True)
+    assert read_words(cache_dir, 'verbs') == main.verbs
+
+    # Installing or updating brahma changes the modules and thereby the stamp
+    (cache_dir / 'verbs').write_text('outdated\n')
+    stamp = completion.completionStamp()
+    monkeypatch.setattr(completion, 'completionStamp', lambda: stamp + ' installed')
+    assert not completion.isCompletionCacheUpToDate()
+    main.updateCompletionCache(main.setupMainParser())
+    assert read_words(cache_dir, 'verbs') == main.verbs
+    assert completion.isCompletionCacheUpToDate()
+
+    # A partially written cache is written again
+    (cache_dir / completion.COMPLETION_STAMP_FILE).unlink()
+    assert not completion.isCompletionCacheUpToDate()
+
+
+def test_completion_stamp_covers_the_modules() -> None:
+    stamp = completion.completionStamp()
+    assert stamp == completion.completionStamp()
+    assert 'main.py:' in stamp and 'completion.py:' in stamp
+
+
+def test_unwritable_completion_cache(tmp_path: Path) -> None:
+    # The cache is optional, failing to write it is not an error
+    blocked = tmp_path / 'file'
+    blocked.write_text('')
+    assert not completion.writeCompletionCache(main.setupMainParser(), dict(), cache_dir=str(blocked / 'completion'))
+    assert not completion.isCompletionCacheUpToDate(cache_dir=str(blocked / 'completion'))
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+
+from pathlib import Path
+
+import pytest
+
+from brahma.PackageIndex import PackageIndex
+from .conftest import write_package
+
+
+def load_graph(path: Path):
+    package_index = PackageIndex()
+    package_index.load(str(path))
+    return package_index.dependencyGraph()
+
+
+def test_upstream_and_downstream_closure(tmp_path: Path) -> None:
+    # a <- b <- c <- d, a <- e, f is independent
+    write_package(tmp_path / 'a', 'a')
+    write_package(tmp_path / 'b', 'b', ['a'])
+    write_package(tmp_path / 'c', 'c', ['b'])
+    write_package(tmp_path / 'd', 'd', ['c', 'roscpp'])
+    write_package(tmp_path / 'e', 'e', ['a'])
+    write_package(tmp_path / 'f', 'f')
+    graph = load_graph(tmp_path)
+
+    assert graph.dependencies('d') == {'c'}
+    assert graph.dependents('a') == {'b', 'e'}
+    assert graph.upstream(['d']) == {'a', 'b', 'c'}
+    assert graph.upstream(['c', 'e']) == {'a', 'b'}
+    assert graph.downstream(['a']) == {'b', 'c', 'd', 'e'}
+    assert graph.downstream(['c']) == {'d'}
+    # The packages themselves are only part of the closure if another requested package depends on them
+    assert graph.downstream(['a', 'b']) == {'b', 'c', 'd', 'e'}
+    assert graph.upstream(['f']) == set()
+    # Packages that are not part of the graph are ignored
+    assert graph.upstream(['unknown']) == set()
+    order = graph.topologicalOrder()
+    assert sorted(order) == ['a', 'b', 'c', 'd', 'e', 'f']
+    assert all(order.index(dependency) < order.index(name) for name in order for dependency in graph.dependencies(name))
+
+
+@pytest.mark.parametrize('depend_tag', ['build_depend', 'buildtool_depend', 'test_depend', 'exec_depend',
+                                        'build_export_depend', 'depend'])
+def test_followed_dependency_types(tmp_path: Path, depend_tag: str) -> None:
+    write_package(tmp_path / 'a', 'a')
+    write_package(tmp_path / 'b', 'b', ['a'], depend_tag)
+    graph = load_graph(tmp_path)
+    assert graph.upstream(['b']) == {'a'}
+    assert graph.downstream(['a']) == {'b'}
+
+
+def test_ignored_dependency_types(tmp_path: Path) -> None:
+    write_package(tmp_path / 'a', 'a')
+    write_package(tmp_path / 'b', 'b', ['a'], 'doc_depend')
+    graph = load_graph(tmp_path)
+    assert graph.upstream(['b']) == set()
+    assert graph.downstream(['a']) == set()
+
+
+def test_cyclic_dependency(tmp_path: Path) -> None:
+    # b and c depend on each other, d depends on the cycle
+    write_package(tmp_path / 'a', 'a')
+    write_package(tmp_path / 'b', 'b', ['a', 'c'])
+    write_package(tmp_path / 'c', 'c', ['b'])
+    write_package(tmp_path / 'd', 'd', ['c'])
+    graph = load_graph(tmp_path)
+    with pytest.raises(SystemExit, match='Cyclic dependency detected. Involved packages: b, c, d'):
+        graph.topologicalOrder()
+    with pytest.raises(SystemExit, match='Cyclic dependency detected'):
+        graph.downstream(['a'])
+    with pytest.raises(SystemExit, match='Cyclic dependency detected'):
+        graph.upstream(['d'])
@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+
+import os
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from brahma.PackageIndex import PackageIndex
+from brahma.diff_ignore import IGNORE_FILE, filterIgnoredFiles, matchIgnoreRules
+from .conftest import write_package
+
+
+def ignored(relative_path: str, *patterns: str) -> bool:
+    return matchIgnoreRules(relative_path.replace('/', os.sep), [(pattern, 'test') for pattern in patterns]) is not None
+
+
+@pytest.mark.parametrize('pattern, relative_path, expected', [
+    # Patterns without '/' match at any level
+    ('*.md', 'README.md', True),
+    ('*.md', 'doc/api/index.md', True),
+    ('doc', 'doc/index.rst', True),
+    ('doc', 'src/doc/index.rst', True),
+    ('doc', 'src/documentation.cpp', False),
+    # Leading and inner '/' anchor the pattern to the package directory
+    ('/README.md', 'README.md', True),
+    ('/README.md', 'doc/README.md', False),
+    ('launch/*.launch', 'launch/robot.launch', True),
+    ('launch/*.launch', 'config/launch/robot.launch', False),
+    # '*' and '?' do not match '/'
+    ('launch/*.launch', 'launch/sub/robot.launch', False),
+    ('src/?.cpp', 'src/a.cpp', True),
+    ('src/?.cpp', 'src/ab.cpp', False),
+    # '**' matches any number of directories
+    ('**/test', 'test/test_a.cpp', True),
+    ('**/test', 'src/deep/test/test_a.cpp', True),
+    ('doc/**', 'doc/api/index.md', True),
+    ('src/**/generated.h', 'src/generated.h', True),
+    ('src/**/generated.h', 'src/a/b/generated.h', True),
+    ('src/**/generated.h', 'include/generated.h', False),
+    # A trailing '/' only matches directories
+    ('doc/', 'doc/index.rst', True),
+    ('doc/', 'src/doc', False),
+    # Character sets and escapes
+    ('[!a]*.txt', 'b.txt', True),
+    ('[!a]*.txt', 'a.txt', False),
+    ('\\#notes', '#notes', True),
+])
+def test_match_pattern(pattern: str, relative_path: str, expected: bool) -> None:
+    assert ignored(relative_path, pattern) == expected
+
+
+def test_negation() -> None:
+    # The last matching pattern wins
+    assert not ignored('README.md', '*.md', '!README.md')
+    assert ignored('README.md', '!README.md', '*.md')
+    assert not ignored('doc/index.rst', 'doc', '!doc')
+    # Files of an ignored directory can not be included again
+    assert ignored('doc/index.rst', 'doc', '!doc/index.rst')
+    assert not ignored('doc/index.rst', 'doc/*', '!doc/index.rst')
+
+
+def test_filter_ignored_files(tmp_path: Path) -> None:
+    write_package(tmp_path / 'pkg_a', 'pkg_a')
+    write_package(tmp_path / 'pkg_b', 'pkg_b')
+    (tmp_path / 'pkg_b' / IGNORE_FILE).write_text('# Keep the generated documentation\n\n!doc/\n*.rviz\n')
+    package_index = PackageIndex()
+    package_index.load(str(tmp_path))
+
+    def filter_files(files: List[str]):
+        return filterIgnoredFiles([str(tmp_path / file) for file in files], package_index, ['*.md', 'doc/'])
+
+    kept_files, ignored_files = filter_files(['pkg_a/README.md', 'pkg_a/doc/index.rst', 'pkg_a/src/a.cpp',
+                                              'pkg_b/README.md', 'pkg_b/doc/index.rst', 'pkg_b/config/view.rviz',
+                                              'pkg_b/' + IGNORE_FILE, 'README.md'])
+    assert kept_files == [str(tmp_path / 'pkg_a' / 'src' / 'a.cpp'), str(tmp_path / 'pkg_b' / 'doc' / 'index.rst'),
+                          str(tmp_path / 'README.md')]
+    assert ignored_files == {
+        str(tmp_path / 'pkg_a' / 'README.md'): ('*.md', 'settings'),
+        str(tmp_path / 'pkg_a' / 'doc' / 'index.rst'): ('doc/', 'settings'),
+        str(tmp_path / 'pkg_b' / 'README.md'): ('*.md', 'settings'),
+        str(tmp_path / 'pkg_b' / 'config' / 'view.rviz'): ('*.rviz', os.path.join('pkg_b', IGNORE_FILE)),
+        str(tmp_path / 'pkg_b' / IGNORE_FILE): (IGNORE_FILE, 'brahma'),
+    }
@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from brahma.GitChangeSet import GitChangeSet, _parseNameStatus
+
+
+def git(repo: Path, *args: str) -> None:
+    subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(args), cwd=str(repo),
+                   check=True, stdout=subprocess.DEVNULL)
+
+
+def test_parse_name_status() -> None:
+    output = 'M\0src/modified.cpp\0R087\0src/old.cpp\0src/new.cpp\0C100\0src/original.h\0src/copy.h\0' \
+             'A\0dir with spaces/added.txt\0D\0deleted\nnewline.txt\0'
+    assert list(_parseNameStatus(output.split('\0')[:-1])) == [
+        ('M', ['src/modified.cpp']),
+        ('R', ['src/old.cpp', 'src/new.cpp']),
+        ('C', ['src/original.h', 'src/copy.h']),
+        ('A', ['dir with spaces/added.txt']),
+        ('D', ['deleted\nnewline.txt']),
+    ]
+
+
+def test_parse_name_status_empty() -> None:
+    assert list(_parseNameStatus([])) == []
+
+
+def test_change_set(tmp_path: Path) -> None:
+    repo = tmp_path / 'repo'
+    repo.mkdir()
+    git(repo, 'init', '-q', '-b', 'master')
+    (repo / '.gitignore').write_text('*.o\n')
+    for name in ['modified.cpp', 'deleted.cpp', 'renamed.cpp']:
+        (repo / name).write_text('{}\n'.format(name) * 20)
+    git(repo, 'add', '-A')
+    git(repo, 'commit', '-qm', 'initial')
+
+    (repo / 'modified.cpp').write_text('changed\n')
+    (repo / 'deleted.cpp').unlink()
+    git(repo, 'mv', 'renamed.cpp', 'new name.cpp')
+    (repo / 'staged.cpp').write_text('staged\n')
+    git(repo, 'add', 'staged.cpp')
+    (repo / 'untracked dir').mkdir()
+    (repo / 'untracked dir' / 'untracked.cpp').write_text('untracked\n')
+    (repo / 'ignored.o').write_text('ignored\n')
+
+    change_set = GitChangeSet(str(repo), 'master')
+    assert change_set.added == {'staged.cpp'}
+    assert change_set.modified == {'modified.cpp'}
+    assert change_set.deleted == {'deleted.cpp'}
+    assert change_set.renamed == {'new name.cpp': 'renamed.cpp'}
+    assert change_set.untracked == {'untracked dir/untracked.cpp'}
+    assert change_set.removedFiles() == ['deleted.cpp', 'renamed.cpp']
+    assert len(change_set) == 5
+
+
+def test_change_set_unknown_base_branch(tmp_path: Path) -> None:
+    git(tmp_path, 'init', '-q', '-b', 'master')
+    git(tmp_path, 'commit', '-q', '--allow-empty', '-m', 'initial')
+    with pytest.raises(SystemExit, match='Could not resolve diff'):
+        GitChangeSet(str(tmp_path), 'missing')
@@ -0,0 +1,51 @@
+#!/usr/bin/python3
+
+import os
+import subprocess
+import sys
+from typing import Dict
+
+import pytest
+
+# Packages that take longer to import than most brahma commands need to run. Only the verbs using them may import them.
+HEAVY_PACKAGES = ['catkin_pkg', 'catkin_tools', 'em', 'git', 'yaml']
+
+BRAHMA_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module: str) -> Dict[str, int]:
+    """
+    Import 'module' in a fresh interpreter with '-X importtime'.
+
+    :returns: Cumulative import time in microseconds of every imported module
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import ' + module], cwd=BRAHMA_ROOT,
+                            env=dict(os.environ, PYTHONPATH=BRAHMA_ROOT), stderr=subprocess.PIPE,
+                            universal_newlines=True, check=True)
+    times = dict()
+    for line in result.stderr.splitlines():
+        fields = line.split('|')
+        if line.startswith('import time:') and len(fields) == 3 and fields[1].strip().isdigit():
+            times[fields[2].strip()] = int(fields[1])
+    return times
+
+
+def heavy_imports(times: Dict[str, int]) -> Dict[str, int]:
+    return dict((name, time) for name, time in times.items() if name.split('.')[0] in HEAVY_PACKAGES)
+
+
+def test_main_imports_no_heavy_packages() -> None:
+    # 'brahma --help' and the argument parsing of every verb only need the main module.
+    times = import_times('brahma.main')
+    assert 'brahma.main' in times
+    assert heavy_imports(times) == {}
+    assert not any(name.startswith('brahma.brahma_') for name in times)
+
+
+@pytest.mark.parametrize('verb', ['create', 'init', 'config', 'update', 'info', 'clean', 'gc', 'serve', 'watch',
+                                  'cache'])
+def test_verb_module_imports_no_heavy_packages(verb: str) -> None:
+    # Verbs import catkin and git in the functions that use them, 'brahma <verb> --help' does not load them.
+    times = import_times('brahma.brahma_' + verb)
+    assert 'brahma.brahma_' + verb in times
+    assert heavy_imports(times) == {}
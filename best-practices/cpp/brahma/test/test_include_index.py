@@ -0,0 +1,111 @@
+#!/usr/bin/python3
+
+import os
+from pathlib import Path
+from typing import Iterable, List
+
+import pytest
+
+from brahma.IncludeIndex import IncludeIndex
+from brahma.PackageIndex import PackageIndex
+from brahma.brahma_update import limitDownstreamToIncludingPackages
+from .conftest import write_package
+
+
+@pytest.fixture
+def package_index(tmp_path: Path) -> PackageIndex:
+    # core <- user_a (includes the core header), core <- user_b (includes nothing of core), user_a <- user_c
+    core = write_package(tmp_path / 'core', 'core')
+    (core / 'include' / 'core').mkdir(parents=True)
+    (core / 'include' / 'core' / 'core.hpp').write_text('#pragma once\n#include "detail.hpp"\n')
+    (core / 'include' / 'core' / 'detail.hpp').write_text('#pragma once\n')
+    (core / 'include' / 'core' / 'other.hpp').write_text('#pragma once\n')
+    (core / 'src').mkdir()
+    (core / 'src' / 'core.cpp').write_text('#include <core/core.hpp>\n')
+    (core / 'CMakeLists.txt').write_text('')
+    user_a = write_package(tmp_path / 'user_a', 'user_a', ['core'])
+    (user_a / 'include' / 'user_a').mkdir(parents=True)
+    (user_a / 'include' / 'user_a' / 'user_a.hpp').write_text('#include <core/core.hpp>\n#include <vector>\n')
+    user_b = write_package(tmp_path / 'user_b', 'user_b', ['core'])
+    (user_b / 'src').mkdir()
+    (user_b / 'src' / 'user_b.cpp').write_text('#include <core/other.hpp>\n')
+    user_c = write_package(tmp_path / 'user_c', 'user_c', ['user_a'])
+    (user_c / 'src').mkdir()
+    (user_c / 'src' / 'user_c.cpp').write_text('  #  include "user_a/user_a.hpp"\n')
+    package_index = PackageIndex()
+    package_index.load(str(tmp_path))
+    return package_index
+
+
+def limit(package_index: PackageIndex, files: List[str], tmp_path: Path, unknown: Iterable[str] = ()) -> List[str]:
+    downstream = dict((name, package_index.package(name)) for name in ['user_a', 'user_b', 'user_c'])
+    changed = {'core': package_index.package('core')}
+    limited = limitDownstreamToIncludingPackages(downstream, changed, [str(tmp_path / file) for file in files],
+                                                 set(unknown), package_index, str(tmp_path / 'include_cache.pickle'))
+    return sorted(limited.keys())
+
+
+def test_including_files(package_index: PackageIndex, tmp_path: Path) -> None:
+    include_index = IncludeIndex()
+    include_index.load(package_index, ['core', 'user_a', 'user_b', 'user_c'])
+    detail = str(tmp_path / 'core' / 'include' / 'core' / 'detail.hpp')
+    # Quoted includes are resolved relative to the including file, includes of system headers are not resolved
+    assert include_index.includingFiles([detail]) == {
+        str(tmp_path / 'core' / 'include' / 'core' / 'core.hpp'), str(tmp_path / 'core' / 'src' / 'core.cpp'),
+        str(tmp_path / 'user_a' / 'include' / 'user_a' / 'user_a.hpp'),
+        str(tmp_path / 'user_c' / 'src' / 'user_c.cpp')}
+    assert include_index.includingPackages([detail]) == {'core', 'user_a', 'user_c'}
+    assert include_index.includingPackages([str(tmp_path / 'core' / 'include' / 'core' / 'other.hpp')]) == {'user_b'}
+
+
+def test_changed_exported_header(package_index: PackageIndex, tmp_path: Path) -> None:
+    assert limit(package_index, ['core/include/core/detail.hpp'], tmp_path) == ['user_a', 'user_c']
+    assert limit(package_index, ['core/include/core/other.hpp'], tmp_path) == ['user_b']
+
+
+def test_changed_source_file(package_index: PackageIndex, tmp_path: Path) -> None:
+    assert limit(package_index, ['core/src/core.cpp'], tmp_path) == []
+
+
+@pytest.mark.parametrize('file', ['core/CMakeLists.txt', 'core/package.xml', 'core/msg/Message.msg',
+                                  'core/include/core/removed.hpp'])
+def test_interface_change_keeps_all_downstream_packages(package_index: PackageIndex, tmp_path: Path,
+                                                        file: str) -> None:
+    assert limit(package_index, ['core/src/core.cpp', file], tmp_path) == ['user_a', 'user_b', 'user_c']
+
+
+def test_unknown_changes_keep_all_downstream_packages(package_index: PackageIndex, tmp_path: Path) -> None:
+    assert limit(package_index, [], tmp_path, {'core'}) == ['user_a', 'user_b', 'user_c']
+
+
+def test_include_cache(package_index: PackageIndex, tmp_path: Path) -> None:
+    cache_file = str(tmp_path / 'include_cache.pickle')
+    packages = ['core', 'user_a', 'user_b', 'user_c']
+    other_hpp = str(tmp_path / 'core' / 'include' / 'core' / 'other.hpp')
+
+    def load() -> IncludeIndex:
+        include_index = IncludeIndex()
+        include_index.load(package_index, packages, cache_file)
+        return include_index
+
+    assert load().parsed_files == 7
+    assert load().parsed_files == 0
+
+    # A changed file is parsed again
+    user_c_cpp = tmp_path / 'user_c' / 'src' / 'user_c.cpp'
+    user_c_cpp.write_text('#include <core/other.hpp>\n')
+    include_index = load()
+    assert include_index.parsed_files == 1
+    assert include_index.includingPackages([other_hpp]) == {'user_b', 'user_c'}
+
+    # Same size, changed modification time
+    stat = os.stat(str(user_c_cpp))
+    user_c_cpp.write_text('#include <core/core.hpp>\n')
+    os.utime(str(user_c_cpp), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    include_index = load()
+    assert include_index.parsed_files == 1
+    assert include_index.includingPackages([other_hpp]) == {'user_b'}
+
+    # Invalid caches are ignored
+    Path(cache_file).write_bytes(b'not a pickle')
+    assert load().parsed_files == 7
@@ -0,0 +1,132 @@
+#!/usr/bin/python3
+
+import os
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+import brahma.utils as utils
+from brahma.LinkManifest import LinkManifest
+
+
+def read_links(source_space: Path) -> Dict[str, str]:
+    return dict((entry.name, os.readlink(str(entry))) for entry in source_space.iterdir())
+
+
+@pytest.fixture
+def source_space(tmp_path: Path) -> Path:
+    for name in ['pkg_a', 'pkg_b', 'pkg_c']:
+        (tmp_path / 'repo' / name).mkdir(parents=True)
+    source_space = tmp_path / 'catkin_ws' / 'src'
+    source_space.mkdir(parents=True)
+    return source_space
+
+
+def test_link_manifest(source_space: Path, tmp_path: Path) -> None:
+    manifest_file = str(tmp_path / 'links.json')
+    (source_space / 'pkg_a').symlink_to('../../repo/pkg_a')
+    (source_space / 'CMakeLists.txt').write_text('')
+
+    manifest = LinkManifest()
+    assert not manifest.load(manifest_file, str(source_space))
+    assert manifest.links == {'pkg_a': '../../repo/pkg_a'}
+    assert manifest.other_entries == ['CMakeLists.txt']
+    manifest.save(manifest_file, str(source_space))
+
+    manifest = LinkManifest()
+    assert manifest.load(manifest_file, str(source_space))
+    assert manifest.links == {'pkg_a': '../../repo/pkg_a'}
+
+    # Links added or removed outside of brahma invalidate the manifest
+    (source_space / 'pkg_b').symlink_to('../../repo/pkg_b')
+    manifest = LinkManifest()
+    assert not manifest.load(manifest_file, str(source_space))
+    assert manifest.links == {'pkg_a': '../../repo/pkg_a', 'pkg_b': '../../repo/pkg_b'}
+    manifest.save(manifest_file, str(source_space))
+    (source_space / 'pkg_a').unlink()
+    manifest = LinkManifest()
+    assert not manifest.load(manifest_file, str(source_space))
+    assert manifest.links == {'pkg_b': '../../repo/pkg_b'}
+
+
+def test_link_manifest_of_other_source_space(source_space: Path, tmp_path: Path) -> None:
+    manifest_file = str(tmp_path / 'links.json')
+    LinkManifest().save(manifest_file, str(source_space))
+    other_source_space = tmp_path / 'other'
+    other_source_space.mkdir()
+    assert not LinkManifest().load(manifest_file, str(other_source_space))
+    assert not LinkManifest().load(None, str(source_space))
+
+
+@pytest.mark.parametrize('in_place', [False, True])
+def test_replace_symlinks(source_space: Path, in_place: bool) -> None:
+    current_links = {'pkg_a': '../../repo/pkg_a', 'pkg_b': '../../repo/pkg_b'}
+    for name, target in current_links.items():
+        (source_space / name).symlink_to(target)
+    new_links = {'pkg_b': '../../repo/pkg_b', 'pkg_c': '../../repo/pkg_c'}
+
+    swapped = utils.replaceSymlinks(str(source_space), current_links, new_links, in_place=in_place)
+    if in_place:
+        assert not swapped
+    assert read_links(source_space) == new_links
+    assert sorted(os.listdir(str(source_space.parent))) == ['src']
+
+
+def test_replace_symlinks_without_exchange(source_space: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(utils, 'exchangePaths', lambda path_a, path_b: False)
+    current_links = {'pkg_a': '../../repo/pkg_a', 'pkg_b': '../../repo/pkg_b'}
+    for name, target in current_links.items():
+        (source_space / name).symlink_to(target)
+    inode = source_space.stat().st_ino
+    new_links = {'pkg_a': '../../repo/pkg_c', 'pkg_b': '../../repo/pkg_b'}
+
+    assert not utils.replaceSymlinks(str(source_space), current_links, new_links)
+    assert read_links(source_space) == new_links
+    # Updated in place, the staging directory is removed
+    assert source_space.stat().st_ino == inode
+    assert sorted(os.listdir(str(source_space.parent))) == ['src']
+
+
+def test_replace_symlinks_removes_stale_staging_directory(source_space: Path) -> None:
+    staging_dir = source_space.parent / '.src.staging'
+    staging_dir.mkdir()
+    (staging_dir / 'pkg_a').symlink_to('../../repo/pkg_a')
+    (staging_dir / 'stale').symlink_to('../../repo/stale')
+    new_links = {'pkg_b': '../../repo/pkg_b'}
+
+    utils.replaceSymlinks(str(source_space), dict(), new_links)
+    assert read_links(source_space) == new_links
+    assert not os.path.lexists(str(staging_dir))
+
+
+def test_replace_symlinks_removes_staging_directory_on_error(source_space: Path,
+                                                             monkeypatch: pytest.MonkeyPatch) -> None:
+    def exchange_paths(path_a: str, path_b: str) -> bool:
+        raise OSError('exchange failed')
+
+    monkeypatch.setattr(utils, 'exchangePaths', exchange_paths)
+    with pytest.raises(OSError, match='exchange failed'):
+        utils.replaceSymlinks(str(source_space), dict(), {'pkg_a': '../../repo/pkg_a'})
+    assert sorted(os.listdir(str(source_space.parent))) == ['src']
+    assert read_links(source_space) == dict()
+
+
+def test_exchange_paths(tmp_path: Path) -> None:
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'a' / 'file_a').write_text('')
+    (tmp_path / 'b').mkdir()
+    if not utils.exchangePaths(str(tmp_path / 'a'), str(tmp_path / 'b')):
+        pytest.skip('renameat2 with RENAME_EXCHANGE is not supported')
+    assert os.listdir(str(tmp_path / 'a')) == []
+    assert os.listdir(str(tmp_path / 'b')) == ['file_a']
+
+
+def test_exchange_paths_of_missing_path(tmp_path: Path) -> None:
+    (tmp_path / 'a').mkdir()
+    try:
+        exchanged = utils.exchangePaths(str(tmp_path / 'a'), str(tmp_path / 'missing'))
+    except FileNotFoundError:
+        return
+    # Only if the system does not support the exchange
+    assert not exchanged
@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+
+import os
+from pathlib import Path
+
+from brahma.PackageIndex import PackageIndex
+from .conftest import write_package
+
+
+def test_manifest_cache(tmp_path: Path) -> None:
+    write_package(tmp_path / 'source' / 'pkg_a', 'pkg_a')
+    pkg_b = write_package(tmp_path / 'source' / 'pkg_b', 'pkg_b', ['pkg_a'])
+    manifest = pkg_b / 'package.xml'
+    cache_file = str(tmp_path / 'package_cache.pickle')
+
+    def load() -> PackageIndex:
+        package_index = PackageIndex()
+        package_index.load(str(tmp_path / 'source'), cache_file)
+        return package_index
+
+    assert load().parsed_manifests == 2
+    assert load().parsed_manifests == 0
+
+    # Changed content and size
+    write_package(pkg_b, 'pkg_b', ['pkg_a', 'roscpp'])
+    package_index = load()
+    assert package_index.parsed_manifests == 1
+    assert [dependency.name for dependency in package_index.package('pkg_b').build_depends] == ['pkg_a', 'roscpp']
+
+    # Same size, changed modification time
+    stat = os.stat(str(manifest))
+    os.utime(str(manifest), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert load().parsed_manifests == 1
+
+    # Same size and modification time, replaced file (new inode)
+    stat = os.stat(str(manifest))
+    replacement = tmp_path / 'package.xml'
+    replacement.write_bytes(manifest.read_bytes())
+    os.utime(str(replacement), ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(str(replacement), str(manifest))
+    assert os.stat(str(manifest)).st_ino != stat.st_ino
+    assert load().parsed_manifests == 1
+
+    # Removed packages are dropped from the index and the cache
+    (tmp_path / 'source' / 'pkg_a' / 'package.xml').unlink()
+    package_index = load()
+    assert package_index.parsed_manifests == 0
+    assert 'pkg_a' not in package_index
+    assert load().parsed_manifests == 0
+
+
+def test_invalid_manifest_cache_is_ignored(tmp_path: Path) -> None:
+    write_package(tmp_path / 'source' / 'pkg_a', 'pkg_a')
+    cache_file = tmp_path / 'package_cache.pickle'
+    cache_file.write_bytes(b'not a pickle')
+    package_index = PackageIndex()
+    package_index.load(str(tmp_path / 'source'), str(cache_file))
+    assert package_index.parsed_manifests == 1
+    assert 'pkg_a' in package_index
@@ -0,0 +1,62 @@
+#!/usr/bin/python3
+
+import os
+from pathlib import Path
+
+from brahma.PackageIndex import PackageIndex
+from .conftest import write_package
+
+
+def test_package_from_file(tmp_path: Path) -> None:
+    write_package(tmp_path / 'repo' / 'pkg_a', 'pkg_a')
+    write_package(tmp_path / 'repo' / 'pkg_ab', 'pkg_ab')
+    write_package(tmp_path / 'repo' / 'stack' / 'pkg_b', 'pkg_b')
+    package_index = PackageIndex()
+    package_index.load(str(tmp_path))
+
+    def package_name(relative_path: str) -> str:
+        package = package_index.packageFromFile(str(tmp_path / relative_path))
+        return package.name if package is not None else None
+
+    assert package_name('repo/pkg_a/package.xml') == 'pkg_a'
+    assert package_name('repo/pkg_a/src/deep/nested/file.cpp') == 'pkg_a'
+    # A package name that is a prefix of another directory name does not own its files
+    assert package_name('repo/pkg_ab/include/pkg_ab/file.h') == 'pkg_ab'
+    assert package_name('repo/stack/pkg_b/src/file.cpp') == 'pkg_b'
+    # Files outside of any package
+    assert package_name('repo/stack/README.md') is None
+    assert package_name('repo/.gitlab-ci.yml') is None
+    assert package_name('other/file.cpp') is None
+
+
+def test_package_from_file_resolves_linked_package_directories(tmp_path: Path) -> None:
+    write_package(tmp_path / 'repo' / 'pkg_a', 'pkg_a')
+    (tmp_path / 'source').mkdir()
+    (tmp_path / 'source' / 'pkg_a').symlink_to(tmp_path / 'repo' / 'pkg_a')
+    package_index = PackageIndex()
+    package_index.load(str(tmp_path / 'source'))
+
+    # Diff files are reported with the real path of their repository
+    assert package_index.packageFromFile(str(tmp_path / 'repo' / 'pkg_a' / 'src' / 'file.cpp')).name == 'pkg_a'
+
+
+def test_fingerprint(tmp_path: Path) -> None:
+    manifest = write_package(tmp_path / 'source' / 'pkg_a', 'pkg_a') / 'package.xml'
+
+    def fingerprint() -> str:
+        package_index = PackageIndex()
+        package_index.load(str(tmp_path / 'source'))
+        return package_index.fingerprint()
+
+    initial = fingerprint()
+    assert fingerprint() == initial
+
+    # Changed manifest
+    stat = os.stat(str(manifest))
+    os.utime(str(manifest), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    changed = fingerprint()
+    assert changed != initial
+
+    # Added package
+    write_package(tmp_path / 'source' / 'pkg_b', 'pkg_b')
+    assert fingerprint() != changed
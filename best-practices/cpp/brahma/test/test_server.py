@@ -0,0 +1,116 @@
+#!/usr/bin/python3
+
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+
+import brahma.log as log
+import brahma.server as server
+from brahma.BrahmaWorkspacePaths import BrahmaWorkspacePaths
+
+
+class IdleModel:
+    """
+    Workspace model without a watch.
+    """
+
+    def isWatching(self) -> bool:
+        return False
+
+
+def run_command(argv: List[str]) -> int:
+    """
+    Verb of the test server, 'argv' is ['info', <action>].
+    """
+    action = argv[1]
+    print('out {} {}'.format(os.environ.get('BRAHMA_TEST_CLIENT'), os.getcwd()))
+    sys.stderr.write('err\n')
+    log.logger.addHandler(logging.StreamHandler())
+    os.environ['BRAHMA_TEST_VERB'] = action
+    os.chdir('/')
+    if action == 'exit':
+        sys.exit(3)
+    if action == 'error':
+        log.error('Failed')
+    if action == 'raise':
+        raise RuntimeError('Broken verb')
+    return 0
+
+
+@pytest.fixture
+def workspace(tmp_path: Path) -> Iterator[Path]:
+    """
+    Workspace served by 'run_command' in a thread of the test process.
+    """
+    os.makedirs(str(tmp_path / '.brahma'))
+    paths = BrahmaWorkspacePaths(str(tmp_path))
+    thread = threading.Thread(target=server.serve, args=(paths, IdleModel(), run_command))
+    thread.start()
+    while not os.path.exists(paths.serverSocket()):
+        time.sleep(0.01)
+    yield tmp_path
+    assert server.stop(str(tmp_path))
+    thread.join(10)
+    assert not thread.is_alive()
+    assert not os.path.exists(paths.serverSocket())
+
+
+def forward(workspace: Path, argv: List[str]) -> subprocess.CompletedProcess:
+    """
+    Forward a command line to the server from a client process.
+    """
+    client_dir = workspace / 'client'
+    client_dir.mkdir(exist_ok=True)
+    env = dict(os.environ, BRAHMA_TEST_CLIENT='client', PYTHONPATH=os.pathsep.join(sys.path))
+    code = 'import sys, brahma.server as s; sys.exit(s.forward(sys.argv[1], sys.argv[2:]))'
+    return subprocess.run([sys.executable, '-c', code, str(workspace)] + argv, cwd=str(client_dir), env=env,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, timeout=60)
+
+
+def test_forward_without_server(tmp_path: Path) -> None:
+    os.makedirs(str(tmp_path / '.brahma'))
+    assert server.forward(str(tmp_path), ['info']) is None
+    assert not server.stop(str(tmp_path))
+
+
+@pytest.mark.parametrize('action, exit_code, stderr', [
+    ('ok', 0, 'err\n'),
+    ('exit', 3, 'err\n'),
+    ('error', 1, 'Error: Failed\n'),
+    ('raise', 1, 'RuntimeError: Broken verb'),
+])
+def test_verb_runs_in_client_context(workspace: Path, action: str, exit_code: int, stderr: str) -> None:
+    saved_environment = dict(os.environ)
+    saved_cwd = os.getcwd()
+    saved_handlers = log.logger.handlers[:]
+
+    result = forward(workspace, ['info', action])
+    assert result.returncode == exit_code
+    # Output of the verb is relayed to the client, the verb sees its environment and working directory
+    assert result.stdout == 'out client {}\n'.format(workspace / 'client')
+    assert stderr in result.stderr
+
+    # The server process is restored
+    assert dict(os.environ) == saved_environment
+    assert os.getcwd() == saved_cwd
+    assert log.logger.handlers == saved_handlers
+    assert not isinstance(sys.stdout, server._ClientStream) and not isinstance(sys.stderr, server._ClientStream)
+
+
+def test_server_handles_consecutive_requests(workspace: Path) -> None:
+    for action, exit_code in [('raise', 1), ('ok', 0), ('exit', 3), ('ok', 0)]:
+        assert forward(workspace, ['info', action]).returncode == exit_code
+
+
+def test_server_refuses_verbs_that_are_not_forwarded(workspace: Path) -> None:
+    result = forward(workspace, ['clean', 'ok'])
+    assert result.returncode == 1
+    assert result.stdout == ''
+    assert "does not run 'clean'" in result.stderr
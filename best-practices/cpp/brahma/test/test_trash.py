@@ -0,0 +1,80 @@
+#!/usr/bin/python3
+
+import errno
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+import brahma.trash as trash
+
+
+def make_tree(path: Path) -> Path:
+    (path / 'sub').mkdir(parents=True)
+    (path / 'sub' / 'file.o').write_text('object')
+    (path / 'Makefile').write_text('all:')
+    return path
+
+
+def trash_entries(trash_dir: Path):
+    return sorted(entry for entry in os.listdir(str(trash_dir)) if entry != trash.TRASH_LOCK_FILE)
+
+
+def test_move_to_trash(tmp_path: Path) -> None:
+    trash_dir = tmp_path / 'trash'
+    build_space = make_tree(tmp_path / 'build' / 'pkg_a')
+    inode = build_space.stat().st_ino
+    assert trash.moveToTrash(str(build_space), str(trash_dir))
+    assert not build_space.exists()
+    entries = trash_entries(trash_dir)
+    assert len(entries) == 1 and entries[0].startswith('pkg_a.')
+    # Moved, not copied
+    assert (trash_dir / entries[0]).stat().st_ino == inode
+
+    # Entries of the same name do not collide
+    make_tree(tmp_path / 'build' / 'pkg_a')
+    assert trash.moveToTrash(str(tmp_path / 'build' / 'pkg_a'), str(trash_dir))
+    assert len(trash_entries(trash_dir)) == 2
+
+
+def test_move_to_trash_on_other_filesystem(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    def rename(source: str, destination: str) -> None:
+        raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+    monkeypatch.setattr(trash.os, 'rename', rename)
+    build_space = make_tree(tmp_path / 'build' / 'pkg_a')
+    assert not trash.moveToTrash(str(build_space), str(tmp_path / 'trash'))
+    # Deleted immediately instead
+    assert not build_space.exists()
+    assert trash_entries(tmp_path / 'trash') == []
+
+
+def test_move_to_trash_raises_other_errors(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError):
+        trash.moveToTrash(str(tmp_path / 'missing'), str(tmp_path / 'trash'))
+
+
+def test_empty_trash(tmp_path: Path) -> None:
+    trash_dir = tmp_path / 'trash'
+    assert trash.emptyTrash(str(trash_dir)) == 0
+
+    outside = make_tree(tmp_path / 'outside')
+    for name in ['pkg_a', 'pkg_b']:
+        trash.moveToTrash(str(make_tree(tmp_path / 'build' / name)), str(trash_dir))
+    (trash_dir / 'file').write_text('')
+    (trash_dir / 'link').symlink_to(outside)
+    assert trash.emptyTrash(str(trash_dir), jobs=2) == 4
+    assert trash_entries(trash_dir) == []
+    # Links are removed without deleting their target
+    assert (outside / 'sub' / 'file.o').exists()
+
+
+def test_reaper(tmp_path: Path) -> None:
+    trash_dir = tmp_path / 'trash'
+    trash.moveToTrash(str(make_tree(tmp_path / 'build' / 'pkg_a')), str(trash_dir))
+    trash.startReaper(str(trash_dir))
+    deadline = time.time() + 30.0
+    while trash_entries(trash_dir) and time.time() < deadline:
+        time.sleep(0.05)
+    assert trash_entries(trash_dir) == []
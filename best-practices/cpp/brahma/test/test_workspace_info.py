@@ -0,0 +1,88 @@
+#!/usr/bin/python3
+
+import os
+from pathlib import Path
+
+import pytest
+
+import brahma.brahma_create as brahma_create
+import brahma.brahma_info as brahma_info
+import brahma.workspace_info as workspace_info
+from brahma.BrahmaWorkspacePaths import BrahmaWorkspacePaths
+from .conftest import BrahmaTestWorkspace
+
+
+@pytest.fixture
+def created_ws(brahma_ws_with_repo: BrahmaTestWorkspace) -> BrahmaTestWorkspace:
+    brahma_ws_with_repo.set_default_create_args()
+    brahma_create.run(paths=brahma_ws_with_repo.paths, settings=brahma_ws_with_repo.settings,
+                      args=brahma_ws_with_repo.args)
+    return brahma_ws_with_repo
+
+
+def fast_info(brahma_ws: BrahmaTestWorkspace, property: str, capsys: pytest.CaptureFixture) -> str:
+    """
+    Answer 'brahma info <property>' from the workspace info, 'None' if the info verb has to answer.
+    """
+    capsys.readouterr()
+    if not workspace_info.printInfo([property, brahma_ws.paths.workspace]):
+        return None
+    return capsys.readouterr().out
+
+
+def slow_info(brahma_ws: BrahmaTestWorkspace, property: str, capsys: pytest.CaptureFixture) -> str:
+    """
+    Answer 'brahma info <property>' with the info verb.
+    """
+    brahma_ws.args = brahma_info.setup_parser().parse_args([property])
+    capsys.readouterr()
+    with pytest.raises(SystemExit):
+        brahma_info.run(paths=brahma_ws.paths, settings=brahma_ws.settings, args=brahma_ws.args)
+    return capsys.readouterr().out
+
+
+def test_fast_path_matches_info_verb(created_ws: BrahmaTestWorkspace, capsys: pytest.CaptureFixture,
+                                     monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv('SHELL', '/bin/bash')
+    fast_answers = dict((property, fast_info(created_ws, property, capsys)) for property in workspace_info.properties)
+    assert all(answer is not None for answer in fast_answers.values())
+
+    # The info verb loads the catkin workspace if the info is missing and writes it again
+    os.remove(created_ws.paths.infoFile())
+    assert fast_info(created_ws, 'source_dir', capsys) is None
+    for property in workspace_info.properties:
+        assert slow_info(created_ws, property, capsys) == fast_answers[property]
+        assert fast_info(created_ws, property, capsys) == fast_answers[property]
+
+    assert fast_answers['source_dir'] == created_ws.paths.source + '\n'
+    assert fast_answers['catkin_dir'] == created_ws.paths.catkin + '\n'
+    assert fast_answers['source_file'].endswith('setup.bash\n')
+    assert fast_answers['compiler_cache'] == 'none\n'
+    # The source file of the shell in use is printed
+    monkeypatch.setenv('SHELL', '/usr/bin/zsh')
+    assert fast_info(created_ws, 'source_file', capsys) == fast_answers['source_file'].replace('.bash', '.zsh')
+
+
+def test_fast_path_falls_back_to_info_verb(created_ws: BrahmaTestWorkspace, capsys: pytest.CaptureFixture) -> None:
+    assert fast_info(created_ws, 'catkin_dir', capsys) is not None
+    # Unknown properties, options and paths outside of a workspace are answered by the info verb
+    assert not workspace_info.printInfo(['unknown', created_ws.paths.workspace])
+    assert not workspace_info.printInfo(['catkin_dir', '--help'])
+    assert not workspace_info.printInfo([])
+    assert not workspace_info.printInfo(['catkin_dir', str(Path(created_ws.paths.workspace).parent)])
+
+    # The info is outdated if the workspace paths or the catkin profile change
+    BrahmaWorkspacePaths(created_ws.paths.workspace).save()
+    assert fast_info(created_ws, 'catkin_dir', capsys) is None
+    assert slow_info(created_ws, 'catkin_dir', capsys) == created_ws.paths.catkin + '\n'
+    profile_config = Path(created_ws.paths.catkin) / '.catkin_tools' / 'profiles' / 'default' / 'config.yaml'
+    for dependency in [Path(created_ws.paths.configurationFile()), profile_config]:
+        stat = dependency.stat()
+        os.utime(str(dependency), ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+        assert fast_info(created_ws, 'catkin_dir', capsys) is None
+        assert slow_info(created_ws, 'catkin_dir', capsys) == created_ws.paths.catkin + '\n'
+        assert fast_info(created_ws, 'catkin_dir', capsys) == created_ws.paths.catkin + '\n'
+
+    # Info files of older versions lack properties
+    Path(created_ws.paths.infoFile()).write_text('{"source_dir": "/", "dependencies": {}}')
+    assert fast_info(created_ws, 'source_dir', capsys) is None